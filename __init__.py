@@ -3,7 +3,7 @@ bl_info = {
 	"author": "Raf Colson",
 	"version": (0, 0, 2),
 	"blender": (2, 79, 2),
-	"location": "SpaceBar Search -> BGE-Tools: UV Scroll / UV Transform / LOD Sections",
+	"location": "SpaceBar Search -> BGE-Tools: UV Scroll / UV Transform / LOD Sections / LOD World",
 	"description": "Tools for the Blender Game Engine",
 	"warning": "Requires Blender version prior to 2.8",
 	"wiki_url": "https://github.com/rafcolson/bge-tools/wiki",
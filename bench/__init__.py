@@ -0,0 +1,6 @@
+from . import (
+	terrain,
+	run,
+	compare,
+	load
+)
@@ -0,0 +1,92 @@
+import argparse, json, sys
+from collections import OrderedDict
+from . import run, compare, load
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark LOD sections bakes on synthetic terrains")
+	subparsers = parser.add_subparsers(dest="command")
+	
+	parser_run = subparsers.add_parser("run", help="Run the benchmark cases and export the results")
+	parser_run.add_argument("output", help="Results JSON file")
+	parser_run.add_argument("--scales", nargs="+", default=list(run.SCALES.keys()), choices=list(run.SCALES.keys()))
+	parser_run.add_argument("--no-instances", action="store_true", help="Only bare terrains")
+	parser_run.add_argument("--blender", help="Blender executable, to bake with the operator instead of the core pipeline")
+	
+	parser_case = subparsers.add_parser("case", help="Run a single case, used by run")
+	parser_case.add_argument("case", help="Case as JSON")
+	parser_case.add_argument("result", help="Result JSON file")
+	parser_case.add_argument("--dir", required=True, help="Output directory of the bake")
+	
+	parser_compare = subparsers.add_parser("compare", help="Compare results against a baseline")
+	parser_compare.add_argument("baseline", help="Baseline results JSON file")
+	parser_compare.add_argument("results", help="Results JSON file")
+	parser_compare.add_argument("--threshold", type=float, default=compare.THRESHOLD, help="Relative increase flagged as a regression")
+	
+	parser_load = subparsers.add_parser("load", help="Compare the startup load time of the sections data formats")
+	parser_load.add_argument("--scales", nargs="+", default=list(run.SCALES.keys())[:2], choices=list(run.SCALES.keys()))
+	parser_load.add_argument("--repeat", type=int, default=load.REPEAT)
+	
+	parser_codecs = subparsers.add_parser("codecs", help="Compare size, write and decode time of the sections data codecs")
+	parser_codecs.add_argument("file", nargs="?", help="Sections data file of a bake, by default the synthetic cases are baked")
+	parser_codecs.add_argument("--scales", nargs="+", default=list(run.SCALES.keys())[:2], choices=list(run.SCALES.keys()))
+	parser_codecs.add_argument("--repeat", type=int, default=load.REPEAT)
+	
+	args = parser.parse_args(argv)
+	
+	if args.command == "run":
+		results = []
+		for case in run.get_cases(args.scales, (False,) if args.no_instances else (False, True)):
+			print("Running", case["name"], "...")
+			if args.blender:
+				result = run.run_case_blender(case, args.blender)
+			else:
+				result = run.run_case_process(case)
+			print(" ", result["wall"], "s,", round((result["peak_memory"] or 0) / 1048576, 1), "MB peak,", result["sections"], "sections")
+			results.append(result)
+		run.save(run.get_results(results), args.output)
+		print("Results exported to", args.output)
+		
+	elif args.command == "case":
+		result = run.run_case(json.loads(args.case, object_pairs_hook=OrderedDict), args.dir)
+		run.save(result, args.result)
+		
+	elif args.command == "compare":
+		baseline = run.load(args.baseline)
+		results = run.load(args.results)
+		for name in compare.get_missing(baseline, results):
+			print("warning: case", name, "missing from results")
+		regressions = compare.compare(baseline, results, args.threshold)
+		for d in regressions:
+			print("regression:", d["case"], d["metric"], d["baseline"], "->", d["value"], "(+" + str(round(d["change"] * 100, 1)) + "%)")
+		if regressions:
+			return 1
+		print("No regressions")
+		
+	elif args.command == "load":
+		for case in run.get_cases(args.scales, (True,)):
+			d = load.run_case(case, args.repeat)
+			print(d["name"])
+			print("  pickle       ", d["pickle"], "s,", d["pickle_size"], "bytes")
+			print("  binary index ", d["binary_index"], "s,", d["binary_size"], "bytes")
+			print("  binary all   ", d["binary_all"], "s")
+			for key in ("pickle_normals", "float_normals", "octahedral_normals"):
+				print("  " + key.ljust(19), d[key], "s,", d[key + "_size"], "bytes")
+			
+	elif args.command == "codecs":
+		if args.file:
+			l = [(args.file, load.get_codec_times(args.file, args.repeat))]
+		else:
+			l = [(d["name"], d["codecs"]) for d in (load.run_case(case, args.repeat) for case in run.get_cases(args.scales, (True,)))]
+		for name, codecs in l:
+			print(name)
+			for d in codecs:
+				print("  " + d["codec"].ljust(5), d["size"], "bytes, write", d["write"], "s, decode", d["decode_index"], "s, all", d["decode_all"], "s")
+				
+	else:
+		parser.print_help()
+		
+	return 0
+	
+if __name__ == "__main__":
+	sys.exit(main())
+	
@@ -0,0 +1,136 @@
+import bpy, addon_utils, os, sys, json, argparse
+from collections import OrderedDict
+from mathutils import Matrix
+
+# run by bench.run inside a background Blender: blender -b --factory-startup --python bench/blender.py -- <case> <result> --dir <dir>
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import trace, data
+from bench import terrain, run
+
+ADDON_NAME = "bge-tools"
+TERRAIN_CHILD_PROP = "_TERRAIN_CHILD"
+SECT_PROP = "BGE_TOOLS_LOD_SECTIONS"
+SECT = "_SECT"
+LOD = "_LOD"
+
+def get_args():
+	argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+	parser = argparse.ArgumentParser(prog="blender.py")
+	parser.add_argument("case")
+	parser.add_argument("result")
+	parser.add_argument("--dir", required=True)
+	return parser.parse_args(argv)
+	
+def clear_scene(scene):
+	for ob in list(scene.objects):
+		scene.objects.unlink(ob)
+		bpy.data.objects.remove(ob)
+		
+def add_object(scene, name, data=None):
+	ob = bpy.data.objects.new(name, data)
+	scene.objects.link(ob)
+	return ob
+	
+def add_terrain(scene, mesh):
+	me = bpy.data.meshes.new(mesh.name)
+	n = len(mesh.triangles)
+	me.vertices.add(len(mesh.vertices))
+	me.vertices.foreach_set("co", mesh.vertices.ravel())
+	me.loops.add(n * 3)
+	me.loops.foreach_set("vertex_index", mesh.triangles.ravel())
+	me.polygons.add(n)
+	me.polygons.foreach_set("loop_start", range(0, n * 3, 3))
+	me.polygons.foreach_set("loop_total", [3] * n)
+	me.update(calc_edges=True)
+	return add_object(scene, mesh.name, me)
+	
+def add_cube(scene, name):
+	bpy.ops.mesh.primitive_cube_add(radius=0.5)
+	ob = scene.objects.active
+	ob.name = ob.data.name = name
+	return ob
+	
+def add_particles(scene, ob, count, seed):
+
+	# hair particles rendered as a mesh object, emitted from the terrain faces
+	
+	dupli_object = add_cube(scene, terrain.PARTICLE_NAME)
+	dupli_object.layers = [i == 19 for i in range(20)]
+	scene.objects.active = ob
+	bpy.ops.object.particle_system_add()
+	ps = ob.particle_systems[-1]
+	ps.seed = seed
+	settings = ps.settings
+	settings.type = "HAIR"
+	settings.count = count
+	settings.emit_from = "FACE"
+	settings.use_emit_random = True
+	settings.render_type = "OBJECT"
+	settings.dupli_object = dupli_object
+	settings.size_random = 0.5
+	settings.use_rotations = True
+	settings.phase_factor_random = 2.0
+	
+def add_groups(scene, ob, instances):
+
+	# dupli group empties carrying game properties, parented to the terrain like the operator expects
+	
+	dupli_object = add_cube(scene, terrain.GROUP_NAME + "_mesh")
+	dupli_object.layers = [i == 19 for i in range(20)]
+	group = bpy.data.groups.new(terrain.GROUP_NAME)
+	group.objects.link(dupli_object)
+	for n, rows, properties in instances:
+		empty = add_object(scene, terrain.GROUP_NAME)
+		empty.dupli_type = "GROUP"
+		empty.dupli_group = group
+		empty.matrix_world = Matrix(rows)
+		empty.parent = ob
+		scene.objects.active = empty
+		bpy.ops.object.game_property_new(type="INT", name=TERRAIN_CHILD_PROP)
+		for name, value in properties.items():
+			bpy.ops.object.game_property_new(type="INT", name=name)
+			empty.game.properties[name].value = value
+			
+def main():
+	args = get_args()
+	case = json.loads(args.case, object_pairs_hook=OrderedDict)
+	addon_utils.enable(ADDON_NAME, default_set=True)
+	
+	scene = bpy.context.scene
+	clear_scene(scene)
+	
+	mesh, heights = terrain.get_terrain(case["triangles"], name=case["name"])
+	ob = add_terrain(scene, mesh)
+	instances = terrain.get_case_instances(mesh, heights, case["use_particles"], case["use_groups"])
+	if case["use_particles"]:
+		add_particles(scene, ob, sum(1 for l in instances if l[0] == terrain.PARTICLE_NAME), 0)
+	if case["use_groups"]:
+		add_groups(scene, ob, [l for l in instances if l[0] == terrain.GROUP_NAME])
+		
+	# the operator writes next to the blend file
+	
+	if not os.path.exists(args.dir):
+		os.makedirs(args.dir)
+	blend_path = os.path.join(args.dir, case["name"] + ".blend")
+	bpy.ops.wm.save_as_mainfile(filepath=blend_path)
+	
+	bpy.ops.object.select_all(action="DESELECT")
+	scene.objects.active = ob
+	ob.select = True
+	bpy.ops.bge_tools.lod_sections(prop_use_trace=True)
+	bpy.ops.wm.save_mainfile()
+	
+	with open(os.path.join(args.dir, trace.TRACE_DIR, ob.name + trace.EXTENSION), "r") as f:
+		stages = json.load(f)["otherData"]["stages"]
+		
+	data_path = data.get_file_path(args.dir, ob.name)
+	sections_name = ob.game.properties[SECT_PROP].value
+	sections = [o for o in scene.objects if o.name.startswith(sections_name + SECT) and LOD not in o.name]
+	output_size = run.get_size(os.path.join(args.dir, SECT_PROP)) + run.get_size(blend_path)
+	data_size = run.get_size(data_path) if os.path.exists(data_path) else 0
+	
+	run.save(run.get_result(case, "blender", stages, len(instances), len(sections), len(mesh), output_size, data_size), args.result)
+	
+main()
@@ -0,0 +1,44 @@
+THRESHOLD = 0.1
+
+# differences below these are noise, whatever the ratio
+
+MIN_SECONDS = 0.05
+MIN_BYTES = 1048576
+
+def get_metrics(result):
+	yield "wall", result["wall"], MIN_SECONDS
+	for name, wall in result["stages"].items():
+		yield "stage " + name, wall, MIN_SECONDS
+	if result.get("peak_memory") is not None:
+		yield "peak_memory", result["peak_memory"], MIN_BYTES
+	yield "output_size", result["output_size"], 1
+	yield "data_size", result["data_size"], 1
+	
+def compare(baseline, results, threshold=THRESHOLD):
+
+	# regressions of results against the baseline, matched by case name; lower is better for every metric
+	
+	base_cases = {r["name"] : r for r in baseline["cases"]}
+	l = []
+	for r in results["cases"]:
+		if r["name"] not in base_cases:
+			continue
+		base_metrics = {k : v for k, v, m in get_metrics(base_cases[r["name"]])}
+		for k, v, minimum in get_metrics(r):
+			b = base_metrics.get(k)
+			if b is None:
+				continue
+			if v - b >= minimum and v > b * (1 + threshold):
+				l.append({
+					"case" : r["name"],
+					"metric" : k,
+					"baseline" : b,
+					"value" : v,
+					"change" : (v - b) / b if b else float("inf"),
+				})
+	return l
+	
+def get_missing(baseline, results):
+	names = {r["name"] for r in results["cases"]}
+	return [r["name"] for r in baseline["cases"] if r["name"] not in names]
+	
@@ -0,0 +1,98 @@
+import os, time, pickle, shutil, tempfile
+from collections import OrderedDict
+from core import data
+from . import run
+
+REPEAT = 5
+
+def get_time(f, repeat=REPEAT):
+
+	# best of a few runs, the least disturbed by the rest of the system
+	
+	l = []
+	for i in range(repeat):
+		t = time.perf_counter()
+		f()
+		l.append(time.perf_counter() - t)
+	return round(min(l), 6)
+	
+def get_load_times(file_path, repeat=REPEAT):
+
+	# startup of the runtime: the whole pickle, against the index of the container or all of it
+	
+	pickle_path = os.path.splitext(file_path)[0] + data.PICKLE_EXTENSION
+	data.save_pickle(data.load(file_path), pickle_path)
+	
+	def open_index():
+		data.Reader(file_path).close()
+		
+	return OrderedDict([
+		("pickle", get_time(lambda: data.load_pickle(pickle_path), repeat)),
+		("binary_index", get_time(open_index, repeat)),
+		("binary_all", get_time(lambda: data.load(file_path), repeat)),
+		("pickle_size", os.path.getsize(pickle_path)),
+		("binary_size", os.path.getsize(file_path)),
+	])
+	
+def get_normals_times(file_path, repeat=REPEAT):
+
+	# normals alone: the former pickled dict with string keys, against float32 and octahedral arrays
+	
+	d = data.load(file_path)
+	former = pickle.dumps({ob_name : {str(list(k)) : v for k, v in nd.items()} for ob_name, nd in d[data.NORMALS].items()})
+	octahedral_path = os.path.splitext(file_path)[0] + "_octahedral" + data.EXTENSION
+	d[data.OCTAHEDRAL] = True
+	data.save(d, octahedral_path)
+	
+	def get_size(r):
+		return sum(count * (2 if typecode == "H" else 4) for (kind, owner, name), (typecode, offset, count) in r.entries.items() if kind in (data.NORMAL_KEYS, data.NORMAL_VALUES))
+		
+	def decode(r):
+		for kind, owner, name in r.entries:
+			if kind == data.NORMAL_KEYS:
+				r.get_normals(owner)
+				
+	l = [("pickle_normals", get_time(lambda: pickle.loads(former), repeat)), ("pickle_normals_size", len(former))]
+	for key, path in (("float_normals", file_path), ("octahedral_normals", octahedral_path)):
+		with data.Reader(path) as r:
+			l.append((key, get_time(lambda: decode(r), repeat)))
+			l.append((key + "_size", get_size(r)))
+	return OrderedDict(l)
+	
+def get_codec_times(file_path, repeat=REPEAT):
+
+	# per codec: size, write time, and the time to open the file and decode it as at game start, then all of it
+	
+	d = data.load(file_path)
+	l = []
+	for codec in data.get_codecs():
+		codec_path = os.path.splitext(file_path)[0] + "_" + codec + data.EXTENSION
+		
+		def open_index():
+			data.Reader(codec_path).close()
+			
+		l.append(OrderedDict([
+			("codec", codec),
+			("write", get_time(lambda: data.save(d, codec_path, codec), repeat)),
+			("size", os.path.getsize(codec_path)),
+			("decode_index", get_time(open_index, repeat)),
+			("decode_all", get_time(lambda: data.load(codec_path), repeat)),
+		]))
+		os.remove(codec_path)
+	return l
+	
+def run_case(case, repeat=REPEAT):
+	dir = tempfile.mkdtemp(prefix="bench_")
+	try:
+		run.run_case(case, dir)
+		file_path = data.get_file_path(dir, case["name"])
+		d = get_load_times(file_path, repeat)
+		d.update(get_normals_times(file_path, repeat))
+		d["codecs"] = get_codec_times(file_path, repeat)
+		d["name"] = case["name"]
+		d.move_to_end("name", last=False)
+		return d
+	finally:
+		shutil.rmtree(dir, ignore_errors=True)
+		
+		
\ No newline at end of file
@@ -0,0 +1,119 @@
+import os, sys, json, time, shutil, platform, subprocess, tempfile
+from collections import OrderedDict
+from core import bake, trace
+from . import terrain
+
+VERSION = 1
+
+SCALES = OrderedDict([
+	("small", 50000),
+	("medium", 500000),
+	("large", 5000000),
+])
+
+INSTANCES_SUFFIX = "_instances"
+
+def get_cases(scales=SCALES.keys(), use_instances=(False, True)):
+
+	# every scale as bare terrain, and with particles and group instances
+	
+	l = []
+	for scale in scales:
+		for b in use_instances:
+			l.append({
+				"name" : scale + (INSTANCES_SUFFIX if b else ""),
+				"scale" : scale,
+				"triangles" : SCALES[scale],
+				"use_particles" : b,
+				"use_groups" : b,
+			})
+	return l
+	
+def get_size(path):
+	if os.path.isfile(path):
+		return os.path.getsize(path)
+	size = 0
+	for root, dirs, files in os.walk(path):
+		for f in files:
+			size += os.path.getsize(os.path.join(root, f))
+	return size
+	
+def get_result(case, backend, stages, instances, sections, triangles, output_size, data_size):
+	return OrderedDict([
+		("name", case["name"]),
+		("backend", backend),
+		("triangles", triangles),
+		("instances", instances),
+		("sections", sections),
+		("wall", round(sum(d["wall"] for d in stages), 3)),
+		("stages", OrderedDict((d["name"], d["wall"]) for d in stages)),
+		("peak_memory", trace.get_peak_rss()),
+		("output_size", output_size),
+		("data_size", data_size),
+	])
+	
+def run_case(case, dir, settings=None):
+
+	# bakes one case with the core pipeline; the synthetic input is generated outside of the timed stages
+	
+	tracer = trace.Tracer("bench." + case["name"])
+	base, heights = terrain.get_terrain(case["triangles"], name=case["name"])
+	instances = terrain.get_case_instances(base, heights, case["use_particles"], case["use_groups"])
+	
+	with tracer:
+		result = bake.bake(base, case["name"], bake.Settings(**(settings or {})), instances, tracer)
+		with tracer.span("save"):
+			file_path = bake.save(result, dir)
+			
+	return get_result(case, "core", tracer.stages(), len(instances), len(result.sections), len(base), get_size(dir), get_size(file_path))
+	
+def run_case_process(case, args=()):
+
+	# each case in a process of its own, so peak memory is that of the case alone
+	
+	dir = tempfile.mkdtemp(prefix="bench_")
+	result_path = os.path.join(dir, "result.json")
+	try:
+		cmd = [sys.executable, "-m", "bench", "case", json.dumps(case), result_path, "--dir", os.path.join(dir, "out")] + list(args)
+		subprocess.check_call(cmd, stdout=subprocess.DEVNULL)
+		with open(result_path, "r") as f:
+			return json.load(f, object_pairs_hook=OrderedDict)
+	finally:
+		shutil.rmtree(dir, ignore_errors=True)
+		
+def run_case_blender(case, blender):
+
+	# the same case through the LOD Sections operator, in a background Blender with the add-on installed
+	
+	dir = tempfile.mkdtemp(prefix="bench_")
+	result_path = os.path.join(dir, "result.json")
+	script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blender.py")
+	try:
+		cmd = [blender, "-b", "--factory-startup", "--python", script, "--", json.dumps(case), result_path, "--dir", os.path.join(dir, "out")]
+		subprocess.check_call(cmd, stdout=subprocess.DEVNULL)
+		with open(result_path, "r") as f:
+			return json.load(f, object_pairs_hook=OrderedDict)
+	finally:
+		shutil.rmtree(dir, ignore_errors=True)
+		
+def get_results(results):
+	return OrderedDict([
+		("version", VERSION),
+		("created", time.strftime("%Y-%m-%dT%H:%M:%S")),
+		("python", platform.python_version()),
+		("platform", platform.platform()),
+		("machine", platform.machine()),
+		("cases", results),
+	])
+	
+def save(results, file_path):
+	dir = os.path.dirname(file_path)
+	if dir and not os.path.exists(dir):
+		os.makedirs(dir)
+	with open(file_path, "w") as f:
+		json.dump(results, f, indent="\t")
+		
+def load(file_path):
+	with open(file_path, "r") as f:
+		return json.load(f, object_pairs_hook=OrderedDict)
+		
@@ -0,0 +1,82 @@
+import math, numpy
+from core import io
+
+OCTAVES = 6
+PERSISTENCE = 0.5
+HEIGHT_FACTOR = 0.1
+
+PARTICLES_PER_TRIANGLE = 0.02
+GROUPS_PER_TRIANGLE = 0.002
+
+PARTICLE_NAME = "bench_particle"
+GROUP_NAME = "bench_group"
+
+def get_resolution(triangles):
+
+	# pixels per side of a square heightmap with about the given number of triangles, two per pixel quad
+	
+	return int(round(math.sqrt(triangles / 2))) + 1
+	
+def get_heights(resolution, seed=0, octaves=OCTAVES, persistence=PERSISTENCE):
+
+	# fractal value noise normalized to [0, 1]
+	
+	rng = numpy.random.RandomState(seed)
+	heights = numpy.zeros((resolution, resolution))
+	amplitude = 1.0
+	for o in range(octaves):
+		cells = 2 ** (o + 2)
+		values = rng.rand(cells + 1, cells + 1)
+		x = numpy.linspace(0, cells, resolution)
+		i = numpy.minimum(x.astype(int), cells - 1)
+		f = x - i
+		f = f * f * (3 - 2 * f)
+		fx = f.reshape(1, -1)
+		fy = f.reshape(-1, 1)
+		a = values[numpy.ix_(i, i)]
+		b = values[numpy.ix_(i, i + 1)]
+		c = values[numpy.ix_(i + 1, i)]
+		d = values[numpy.ix_(i + 1, i + 1)]
+		heights += amplitude * ((a * (1 - fx) + b * fx) * (1 - fy) + (c * (1 - fx) + d * fx) * fy)
+		amplitude *= persistence
+	heights -= heights.min()
+	return heights / (heights.max() or 1)
+	
+def get_terrain(triangles, seed=0, name="bench"):
+	resolution = get_resolution(triangles)
+	heights = get_heights(resolution, seed)
+	return io.get_heightmap_mesh(heights, (1, 1, resolution * HEIGHT_FACTOR), name), heights
+	
+def get_instances(terrain, heights, count, name, properties=None, seed=0):
+
+	# [name, 4 x 4 matrix rows, properties] on the terrain surface, with random rotation around z and scale
+	
+	rng = numpy.random.RandomState(seed)
+	bb_min, bb_max = terrain.bounds()
+	h, w = heights.shape
+	l = []
+	for k in range(count):
+		x = bb_min[0] + rng.rand() * (bb_max[0] - bb_min[0])
+		y = bb_min[1] + rng.rand() * (bb_max[1] - bb_min[1])
+		i = int(round((x - bb_min[0]) / max(bb_max[0] - bb_min[0], 1) * (w - 1)))
+		j = int(round((bb_max[1] - y) / max(bb_max[1] - bb_min[1], 1) * (h - 1)))
+		z = float(heights[j, i]) * w * HEIGHT_FACTOR
+		yaw = rng.rand() * 2 * math.pi
+		s = 0.5 + rng.rand()
+		c = math.cos(yaw) * s
+		si = math.sin(yaw) * s
+		rows = [[c, -si, 0.0, x], [si, c, 0.0, y], [0.0, 0.0, s, z], [0.0, 0.0, 0.0, 1.0]]
+		l.append([name, rows, dict(properties or {})])
+	return l
+	
+def get_case_instances(terrain, heights, use_particles=True, use_groups=True, seed=0):
+
+	# particles come without properties, groups with one, like dupli groups carrying game properties
+	
+	l = []
+	if use_particles:
+		l.extend(get_instances(terrain, heights, int(len(terrain) * PARTICLES_PER_TRIANGLE), PARTICLE_NAME, None, seed))
+	if use_groups:
+		l.extend(get_instances(terrain, heights, int(len(terrain) * GROUPS_PER_TRIANGLE), GROUP_NAME, {"bench" : 1}, seed + 1))
+	return l
+	
@@ -0,0 +1,12 @@
+from . import (
+	trace,
+	grid,
+	estimate,
+	mesh,
+	io,
+	data,
+	pvs,
+	scatter,
+	world,
+	bake
+)
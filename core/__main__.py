@@ -0,0 +1,70 @@
+import argparse, json, os
+from . import bake, data, io, trace
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog="python -m core", description="Bake LOD sections without Blender")
+	parser.add_argument("input", help="OBJ, PLY or 16 bit heightmap PNG / RAW file")
+	parser.add_argument("output", help="Output directory")
+	parser.add_argument("--name", help="Terrain object name, defaults to the input file name")
+	parser.add_argument("--number", type=int, nargs=2, help="Number of sections")
+	parser.add_argument("--size", type=float, nargs=2, default=(32, 32), help="Section size")
+	parser.add_argument("--number-mode", default="use_even_numbers", choices=["use_automatic_numbering", "use_even_numbers", "use_odd_numbers"])
+	parser.add_argument("--lod-number", type=int, default=4, help="Number of lod levels, 0 to disable")
+	parser.add_argument("--lod-decimate-factor", type=float, default=0.25)
+	parser.add_argument("--lod-selector", action="store_true", help="Select lod levels in the runtime instead of the engine")
+	parser.add_argument("--no-physics", action="store_true")
+	parser.add_argument("--approx-num-digits", type=int, default=2, help="Digits of exported normals, -1 for no approximation")
+	parser.add_argument("--octahedral", action="store_true", help="Encode exported normals in 2 x 16 bits; only saves size, the keys stay and decoding is slower")
+	parser.add_argument("--lazy-normals", action="store_true", help="Copy normals the first time a section shows them instead of before play")
+	parser.add_argument("--codec", default=data.CODEC_NONE, choices=data.get_codecs(), help="Compression of the sections data")
+	parser.add_argument("--prefix", default=bake.PREF)
+	parser.add_argument("--instances", help="JSON list of [name, 4 x 4 matrix rows, properties]")
+	parser.add_argument("--heightmap-scale", type=float, nargs=3, default=(1, 1, 1), help="Units per pixel in x and y, height in z")
+	parser.add_argument("--heightmap-dimensions", type=int, nargs=2, default=(0, 0), help="Width and height of a RAW heightmap")
+	parser.add_argument("--trace", help="Export a Chrome trace-event JSON file")
+	args = parser.parse_args(argv)
+	
+	kwargs = {}
+	if os.path.splitext(args.input)[1].lower() in io.HEIGHTMAP_EXTENSIONS:
+		kwargs = {"scale" : args.heightmap_scale, "width" : args.heightmap_dimensions[0], "height" : args.heightmap_dimensions[1]}
+		
+	settings = bake.Settings(
+		number_or_size="generate_by_number" if args.number else "generate_by_size",
+		number=args.number or (8, 8),
+		size=args.size,
+		number_mode=args.number_mode,
+		use_lod=args.lod_number > 0,
+		lod_number=max(args.lod_number, 1),
+		lod_decimate_factor=args.lod_decimate_factor,
+		use_lod_selector=args.lod_selector,
+		lod_use_physics=not args.no_physics,
+		use_approx=args.approx_num_digits != -1,
+		approx_num_digits=max(args.approx_num_digits, 0),
+		use_octahedral=args.octahedral,
+		use_lazy_normals=args.lazy_normals,
+		prefix=args.prefix
+	)
+	
+	instances = []
+	if args.instances:
+		with open(args.instances) as f:
+			instances = json.load(f)
+			
+	tracer = trace.Tracer("core.bake", track_memory=bool(args.trace))
+	with tracer:
+		with tracer.span("read"):
+			base = io.read(args.input, **kwargs)
+		result = bake.bake(base, args.name or base.name, settings, instances, tracer)
+		with tracer.span("save"):
+			file_path = bake.save(result, args.output, args.codec)
+			
+	print(tracer.timed("Finished generating ", len(result.sections), " (", round(result.size[0], 1), " X ", round(result.size[1], 1), ") sections in"))
+	for line in tracer.summary():
+		print(line)
+	print("Data exported to", file_path)
+	if args.trace:
+		print("Trace exported to", tracer.export(os.path.dirname(os.path.abspath(args.trace)), os.path.splitext(os.path.basename(args.trace))[0]))
+		
+if __name__ == "__main__":
+	main()
+	
\ No newline at end of file
@@ -0,0 +1,178 @@
+import os
+from collections import OrderedDict
+from . import grid, mesh, data, io, trace
+
+PREF = "_"
+SECT = "_SECT"
+LOD = "_LOD"
+PHYS = "_PHYS"
+
+class Settings:
+
+	# mirrors the properties of the LOD Sections operator
+	
+	def __init__(self, **kwargs):
+		self.number_or_size = "generate_by_size"
+		self.number = (8, 8)
+		self.size = (32, 32)
+		self.number_mode = "use_even_numbers"
+		self.use_lod = True
+		self.lod_number = 4
+		self.lod_decimate_factor = 0.25
+		self.lod_use_custom_profile = True
+		self.lod_distance_initial = 48
+		self.lod_distance_factor = 0.75
+		self.lod_use_physics = True
+		self.use_approx = True
+		self.approx_num_digits = 2
+		self.use_octahedral = False
+		self.use_lazy_normals = False
+		self.use_lod_selector = False
+		self.prefix = PREF
+		for k, v in kwargs.items():
+			if not hasattr(self, k):
+				raise AttributeError(k)
+			setattr(self, k, v)
+			
+class Result:
+
+	def __init__(self, name):
+		self.name = name
+		self.number = None
+		self.size = None
+		self.dimensions = None
+		self.points = OrderedDict()
+		self.sections = OrderedDict()
+		self.lods = OrderedDict()
+		self.lod_distances = []
+		self.physics = OrderedDict()
+		self.instances = {}
+		self.normals = {}
+		self.normal_indices = {}
+		self.vertex_array_lengths = {}
+		self.data = None
+		
+	def meshes(self):
+		for sect_name, sect in self.sections.items():
+			yield sect
+			for sect_lod in self.lods.get(sect_name, []):
+				yield sect_lod
+			if sect_name in self.physics:
+				yield self.physics[sect_name]
+				
+def bake(base, name, settings=None, instances=(), tracer=None):
+
+	# base: terrain mesh in the local space of the terrain object
+	# instances: (source object name, 4 x 4 matrix rows, properties) in the same space
+	
+	settings = settings or Settings()
+	tracer = tracer or trace.NullTracer()
+	result = Result(name)
+	sections_name = settings.prefix + name
+	
+	with tracer.span("create_bases"):
+		base = mesh.remove_doubles(base)
+		tracer.count(trace.TRIANGLES, len(base))
+		
+	with tracer.span("collect_data"):
+		result.dimensions = [float(f) for f in base.dimensions()[:2]]
+		result.number, result.size = grid.get_grid(result.dimensions, (0, 0), settings.number_or_size, settings.number, settings.size, settings.number_mode)
+		result.points = grid.get_points(result.number, result.size)
+		points_keys = list(result.points.keys())
+		
+	with tracer.span("generate_sections"):
+		lines_x = grid.get_lines(result.number, result.size, 0)
+		lines_y = grid.get_lines(result.number, result.size, 1)
+		base = mesh.multisect(base, lines_x, lines_y)
+		base_normals = mesh.vertex_normals(base)
+		tracer.count(trace.TRIANGLES, len(base))
+		borders = {}
+		
+		for cell, (sect, used) in sorted(mesh.separate(base, result.number, result.size).items()):
+			id = points_keys[cell]
+			x, y = result.points[id]
+			sect = sect.translated((-x, -y, 0), sections_name + SECT + id)
+			result.sections[sect.name] = sect
+			borders[sect.name] = mesh.boundary_vertices(sect), base_normals[used]
+			
+	with tracer.span("generate_lod"):
+		if settings.use_lod:
+			ratios = grid.get_lod_ratios(settings.lod_number, settings.lod_decimate_factor)
+			result.lod_distances = grid.get_lod_distances(
+				settings.lod_number,
+				result.size,
+				settings.lod_use_custom_profile,
+				settings.lod_distance_initial,
+				settings.lod_distance_factor
+			)
+			for sect_name, sect in result.sections.items():
+				locked = borders[sect_name][0]
+				l = []
+				for i, ratio in enumerate(ratios):
+					sect_lod = mesh.decimate(sect, ratio, locked, sect_name + LOD + grid.get_id(i + 1, "_", 1))
+					tracer.count(trace.TRIANGLES, len(sect_lod))
+					l.append(sect_lod)
+				result.lods[sect_name] = l
+				
+	with tracer.span("map_lod_objects"):
+		for n, rows, properties in instances:
+			id = grid.get_point_id((rows[0][3], rows[1][3]), result.number, result.size)
+			if id is None:
+				print("warning:", n, "at", [rows[0][3], rows[1][3], rows[2][3]], "not within bounds")
+				continue
+			data.add_instance(result.instances, sections_name + SECT + id, n, rows, properties)
+			
+	with tracer.span("generate_physics"):
+		if settings.use_lod and settings.lod_use_physics:
+			for sect_name, sect in result.sections.items():
+				result.physics[sect_name] = sect.copy(sect_name + PHYS)
+				
+	with tracer.span("export_data"):
+		approx_ndigits = settings.approx_num_digits if settings.use_approx and not settings.use_octahedral else -1
+		for sect_name, sect in result.sections.items():
+			border, normals = borders[sect_name]
+			d = data.get_normals(sect.vertices[border], normals[border], approx_ndigits)
+			result.normals[sect_name] = d
+			result.normal_indices[sect_name] = data.get_normal_indices(sect.triangles, sect.vertices, border, d)
+			result.vertex_array_lengths[sect_name] = data.get_vertex_array_lengths(sect.triangles, len(sect.vertices))
+			
+			# lod levels keep their border vertices in place, so they share the normals of the section
+			
+			for sect_lod in result.lods.get(sect_name, [])[:-1]:
+				lod_border = mesh.boundary_vertices(sect_lod)
+				ids = (data.get_normal_id(co) for co in sect_lod.vertices[lod_border])
+				result.normals[sect_lod.name] = lod_d = {id : d[id] for id in ids if id in d}
+				result.normal_indices[sect_lod.name] = data.get_normal_indices(sect_lod.triangles, sect_lod.vertices, lod_border, lod_d)
+				result.vertex_array_lengths[sect_lod.name] = data.get_vertex_array_lengths(sect_lod.triangles, len(sect_lod.vertices))
+				
+		result.data = data.get_data(
+			result.size,
+			result.number,
+			result.dimensions,
+			settings.lod_number,
+			result.points,
+			result.instances,
+			result.normals,
+			use_octahedral=settings.use_octahedral,
+			normal_indices=result.normal_indices,
+			lazy_normals=settings.use_lazy_normals,
+			lod_distances=result.lod_distances,
+			lod_selector=settings.use_lod and settings.use_lod_selector,
+			vertex_array_lengths=result.vertex_array_lengths
+		)
+		
+	return result
+	
+def save(result, dir, codec=data.CODEC_NONE):
+
+	# meshes as obj files, the sections data where the runtime expects it relative to the blend file
+	
+	if not os.path.exists(dir):
+		os.makedirs(dir)
+	for m in result.meshes():
+		if len(m):
+			io.write_obj(m, os.path.join(dir, m.name + ".obj"))
+	file_path = data.get_file_path(dir, result.name)
+	data.save(result.data, file_path, codec)
+	return file_path
+	
\ No newline at end of file
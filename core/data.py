@@ -0,0 +1,415 @@
+import os, io, json, lzma, mmap, pickle, struct, zlib, numpy
+from collections import OrderedDict
+
+try:
+	import lz4.frame
+except ImportError:
+	lz4 = None
+
+DATA_DIR = "BGE_TOOLS_LOD_SECTIONS"
+EXTENSION = ".bin"
+PICKLE_EXTENSION = ".txt"
+
+SIZE = "SIZE"
+NUMBER = "NUMBER"
+DIMENSIONS = "DIMENSIONS"
+LOD_SIZE = "LOD_SIZE"
+POINTS = "POINTS"
+INSTANCES = "INSTANCES"
+PROPERTIES = "PROPERTIES"
+NORMALS = "NORMALS"
+NORMAL_INDICES = "NORMAL_INDICES"
+VERTEX_ARRAY_LENGTHS = "VERTEX_ARRAY_LENGTHS"
+PVS = "PVS"
+SCATTER = "SCATTER"
+SCATTER_RESOLUTION = "SCATTER_RESOLUTION"
+OCTAHEDRAL = "OCTAHEDRAL"
+STREAMING = "STREAMING"
+LAZY_NORMALS = "LAZY_NORMALS"
+LOD_DISTANCES = "LOD_DISTANCES"
+LOD_SELECTOR = "LOD_SELECTOR"
+
+META_KEYS = (SIZE, NUMBER, DIMENSIONS, LOD_SIZE, POINTS, PROPERTIES, PVS, SCATTER, SCATTER_RESOLUTION, OCTAHEDRAL, STREAMING, LAZY_NORMALS, LOD_DISTANCES, LOD_SELECTOR)
+
+# streamed sections: one library per section, loaded within the load distance of the camera and freed beyond the unload distance
+
+STREAM_SUFFIX = "_STREAM"
+LIBRARY_EXTENSION = ".blend"
+STREAM_DISTANCE = 256.0
+STREAM_MARGIN = 64.0
+
+LOAD_DISTANCE = "load_distance"
+UNLOAD_DISTANCE = "unload_distance"
+
+# container: header, json meta, index table, then the typed arrays, each aligned, little endian
+# header: magic, version, codec, meta size, number of index entries, size of the rest once decompressed
+# index entry: kind, typecode, owner size, name size, offset, number of items, followed by owner and name in utf-8
+# offsets are those of the uncompressed file, everything after the header is compressed as a whole
+
+MAGIC = b"BGESECT\x00"
+VERSION = 2
+ALIGNMENT = 16
+HEADER = struct.Struct("<8sHHIIQ")
+ENTRY = struct.Struct("<BcHH2xQQ")
+
+# owner is the object for normals, the section for instances, named by the instanced object
+
+NORMAL_KEYS = 0
+NORMAL_VALUES = 1
+TRANSFORMS = 2
+PROPERTY_IDS = 3
+NORMAL_INDEX_IDS = 4
+ARRAY_LENGTHS = 5
+
+TYPECODES = {"f" : "<f4", "i" : "<i4", "H" : "<u2"}
+
+# codecs by id, as stored in the header; lz4 only if installed
+
+CODEC_NONE = "none"
+CODEC_ZLIB = "zlib"
+CODEC_LZMA = "lzma"
+CODEC_LZ4 = "lz4"
+CODECS = (CODEC_NONE, CODEC_ZLIB, CODEC_LZMA, CODEC_LZ4)
+
+ZLIB_LEVEL = 6
+
+# octahedral normals: 2 x 16 bits per normal, at most 0.004 degrees off once decoded and normalized;
+# a size only option, the int32 keys stay as the runtime falls back on them when the vertex arrays are not as predicted,
+# so a normal takes 12 bytes instead of 20, and decoding costs more than reading float32
+
+OCTAHEDRAL_SCALE = 32767.5
+
+def get_data(size, number, dimensions, lod_size, points, instances, normals, pvs=None, scatter=None, scatter_resolution=0, use_octahedral=False, streaming=None, normal_indices=None, lazy_normals=False, lod_distances=None, lod_selector=False, vertex_array_lengths=None):
+	instances, properties = pack_instances(instances)
+	return {
+		SIZE : list(size),
+		NUMBER : list(number),
+		DIMENSIONS : list(dimensions),
+		LOD_SIZE : lod_size,
+		POINTS : points,
+		INSTANCES : instances,
+		PROPERTIES : properties,
+		NORMALS : normals,
+		NORMAL_INDICES : normal_indices if normal_indices is not None else {},
+		VERTEX_ARRAY_LENGTHS : vertex_array_lengths if vertex_array_lengths is not None else {},
+		PVS : pvs or {},
+		SCATTER : scatter or {},
+		SCATTER_RESOLUTION : scatter_resolution,
+		OCTAHEDRAL : use_octahedral,
+		STREAMING : streaming,
+		LAZY_NORMALS : lazy_normals,
+		LOD_DISTANCES : lod_distances or [],
+		LOD_SELECTOR : lod_selector,
+	}
+	
+def get_streaming(load_distance=STREAM_DISTANCE, unload_margin=STREAM_MARGIN):
+	return {LOAD_DISTANCE : load_distance, UNLOAD_DISTANCE : load_distance + unload_margin}
+	
+def get_library_path(name, owner_name, suffix=STREAM_SUFFIX):
+
+	# relative to the directory of the blend file, next to the sections data; streamed sections by default, world tiles by suffix
+	
+	return "//" + DATA_DIR + "/" + name + suffix + "/" + owner_name + LIBRARY_EXTENSION
+	
+def add_instance(instances, sect_name, name, rows, properties):
+	if sect_name not in instances:
+		instances[sect_name] = {}
+	d = instances[sect_name]
+	if name not in d:
+		d[name] = []
+	d[name].append([[list(v) for v in rows], properties])
+	
+def pack_instances(instances):
+
+	# per section and object: the top three rows of every transform as float32 bytes, 12 per instance,
+	# and int32 bytes indexing a table of the distinct property dicts
+	
+	table = []
+	ids = {}
+	packed = {}
+	for sect_name, d in instances.items():
+		packed[sect_name] = dp = {}
+		for n, nl in d.items():
+			transforms = numpy.array([rows[:3] for rows, properties in nl], dtype="<f4").reshape(-1, 12)
+			l = []
+			for rows, properties in nl:
+				key = tuple(sorted(properties.items()))
+				if key not in ids:
+					ids[key] = len(table)
+					table.append(properties)
+				l.append(ids[key])
+			dp[n] = [transforms.tobytes(), numpy.array(l, dtype="<i4").tobytes()]
+	return packed, table
+	
+def unpack_instances(packed, table):
+	instances = {}
+	for sect_name, d in packed.items():
+		instances[sect_name] = du = {}
+		for n, (transforms, properties) in d.items():
+			a = numpy.frombuffer(transforms, "<f4").reshape(-1, 3, 4).astype(float)
+			du[n] = [[a[k].tolist() + [[0.0, 0.0, 0.0, 1.0]], table[i]] for k, i in enumerate(numpy.frombuffer(properties, "<i4"))]
+	return instances
+	
+def get_normal_id(co):
+	return (round(float(co[0])), round(float(co[1])))
+	
+def get_normals(vertices, normals, approx_ndigits=-1):
+
+	# normals keyed by the rounded local xy of their vertex, as looked up by the runtime
+	
+	d = {}
+	for co, no in zip(vertices, normals):
+		no = [float(f) for f in no]
+		if approx_ndigits != -1:
+			no = [round(f, approx_ndigits) for f in no]
+		d[get_normal_id(co)] = no
+	return d
+	
+def get_vertex_array_ids(triangles, num_vertices):
+
+	# index of every vertex in the vertex array of the game engine, which adds vertices as triangles first use them, -1 if unused
+	
+	flat = numpy.asarray(triangles).reshape(-1)
+	ids = numpy.full(num_vertices, -1, dtype=numpy.int64)
+	if not len(flat):
+		return ids
+	unique, first = numpy.unique(flat, return_index=True)
+	ids[unique[numpy.argsort(first)]] = numpy.arange(len(unique))
+	return ids
+	
+def get_vertex_array_lengths(triangles, num_vertices):
+
+	# number of vertices in the vertex array of every material, for a mesh of a single material
+	
+	return [int((get_vertex_array_ids(triangles, num_vertices) != -1).sum())]
+	
+def get_normal_indices(triangles, vertices, mask, normals):
+
+	# (material id, vertex id, normal key) of the masked vertices with a normal, for a mesh of a single material
+	
+	ids = get_vertex_array_ids(triangles, len(vertices))
+	l = []
+	for i in numpy.flatnonzero(mask):
+		key = get_normal_id(vertices[i])
+		if ids[i] != -1 and key in normals:
+			l.append((0, int(ids[i]), key))
+	return l
+	
+def get_file_path(root, name):
+	return os.path.join(root, DATA_DIR, name + EXTENSION)
+	
+def encode_octahedral(normals):
+
+	# projects onto the octahedron, folds the lower half over the upper one and quantizes to uint16
+	
+	n = numpy.asarray(normals, dtype=numpy.float64).reshape(-1, 3)
+	n = n / numpy.maximum(numpy.abs(n).sum(axis=1, keepdims=True), 1e-30)
+	x, y, z = n[:, 0], n[:, 1], n[:, 2]
+	u = numpy.where(z < 0, (1 - numpy.abs(y)) * numpy.where(x >= 0, 1.0, -1.0), x)
+	v = numpy.where(z < 0, (1 - numpy.abs(x)) * numpy.where(y >= 0, 1.0, -1.0), y)
+	return numpy.round((numpy.stack([u, v], axis=1) + 1) * OCTAHEDRAL_SCALE).clip(0, 65535).astype("<u2")
+	
+def decode_octahedral(encoded):
+	e = numpy.asarray(encoded, dtype=numpy.float64).reshape(-1, 2) / OCTAHEDRAL_SCALE - 1
+	x, y = e[:, 0], e[:, 1]
+	z = 1 - numpy.abs(x) - numpy.abs(y)
+	t = numpy.maximum(-z, 0)
+	n = numpy.stack([x - numpy.where(x >= 0, t, -t), y - numpy.where(y >= 0, t, -t), z], axis=1)
+	return n / numpy.linalg.norm(n, axis=1, keepdims=True)
+	
+def get_normals_size(normals, use_octahedral=False, normal_indices=None):
+
+	# bytes taken by normals in the container, two int32 keys and three float32 or two uint16 values each,
+	# and three int32 per normal index
+	
+	return len(normals) * (2 * 4 + (2 * 2 if use_octahedral else 3 * 4)) + len(normal_indices or ()) * 3 * 4
+	
+def get_json_value(o):
+	if hasattr(o, "tolist"):
+		return o.tolist()
+	return list(o)
+	
+def get_arrays(data):
+
+	# (kind, owner, name, typecode, array) for every typed array of the container
+	
+	for ob_name, d in data[NORMALS].items():
+		yield NORMAL_KEYS, ob_name, "", "i", numpy.array(list(d.keys()), dtype="<i4").reshape(-1)
+		if ob_name in data.get(NORMAL_INDICES, {}):
+			ids = {key : i for i, key in enumerate(d)}
+			l = [(mat_id, vert_id, ids[key]) for mat_id, vert_id, key in data[NORMAL_INDICES][ob_name] if key in ids]
+			yield NORMAL_INDEX_IDS, ob_name, "", "i", numpy.array(l, dtype="<i4").reshape(-1)
+		if ob_name in data.get(VERTEX_ARRAY_LENGTHS, {}):
+			yield ARRAY_LENGTHS, ob_name, "", "i", numpy.array(data[VERTEX_ARRAY_LENGTHS][ob_name], dtype="<i4")
+		if data.get(OCTAHEDRAL):
+			yield NORMAL_VALUES, ob_name, "", "H", encode_octahedral(list(d.values())).reshape(-1)
+		else:
+			yield NORMAL_VALUES, ob_name, "", "f", numpy.array(list(d.values()), dtype="<f4").reshape(-1)
+	for sect_name, d in data[INSTANCES].items():
+		for n, (transforms, properties) in d.items():
+			yield TRANSFORMS, sect_name, n, "f", numpy.frombuffer(transforms, "<f4")
+			yield PROPERTY_IDS, sect_name, n, "i", numpy.frombuffer(properties, "<i4")
+			
+def get_aligned(offset):
+	return -(-offset // ALIGNMENT) * ALIGNMENT
+	
+def get_codecs():
+	return [codec for codec in CODECS if codec != CODEC_LZ4 or lz4 is not None]
+	
+def compress(body, codec):
+	if codec == CODEC_ZLIB:
+		return zlib.compress(body, ZLIB_LEVEL)
+	if codec == CODEC_LZMA:
+		return lzma.compress(body)
+	if codec == CODEC_LZ4:
+		return lz4.frame.compress(body)
+	return body
+	
+def decompress(body, codec):
+	if codec == CODEC_ZLIB:
+		return zlib.decompress(body)
+	if codec == CODEC_LZMA:
+		return lzma.decompress(body)
+	if codec == CODEC_LZ4:
+		return lz4.frame.decompress(body)
+	return body
+	
+def write(file_path, b):
+
+	# through a temporary file replacing the former one at once, a failed export never leaves a partial file
+	
+	dir = os.path.dirname(file_path)
+	if dir and not os.path.exists(dir):
+		os.makedirs(dir)
+	tmp_path = file_path + ".tmp"
+	try:
+		with open(tmp_path, "wb") as f:
+			f.write(b)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp_path, file_path)
+	finally:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+			
+def save(data, file_path, codec=CODEC_NONE):
+	meta = json.dumps(OrderedDict((k, data.get(k)) for k in META_KEYS), default=get_json_value).encode()
+	arrays = list(get_arrays(data))
+	
+	entries = []
+	offset = HEADER.size + len(meta) + sum(ENTRY.size + len(owner.encode()) + len(name.encode()) for kind, owner, name, typecode, a in arrays)
+	offsets = []
+	for kind, owner, name, typecode, a in arrays:
+		offset = get_aligned(offset)
+		owner, name = owner.encode(), name.encode()
+		entries.append(ENTRY.pack(kind, typecode.encode(), len(owner), len(name), offset, len(a)) + owner + name)
+		offsets.append(offset)
+		offset += a.nbytes
+		
+	if codec not in get_codecs():
+		raise ValueError("Unsupported codec: " + codec)
+		
+	f = io.BytesIO()
+	f.write(meta)
+	f.write(b"".join(entries))
+	for offset, (kind, owner, name, typecode, a) in zip(offsets, arrays):
+		f.write(bytes(offset - HEADER.size - f.tell()))
+		f.write(a.tobytes())
+	body = f.getvalue()
+	
+	write(file_path, HEADER.pack(MAGIC, VERSION, CODECS.index(codec), len(meta), len(entries), len(body)) + compress(body, codec))
+	
+			
+class Reader:
+
+	# random access to a container, through a read only memory map without copies when uncompressed
+	
+	def __init__(self, file_path):
+		with open(file_path, "rb") as f:
+			magic, version, codec_id, meta_size, num_entries, body_size = HEADER.unpack(f.read(HEADER.size))
+			if magic != MAGIC:
+				raise ValueError("Not a sections data file: " + file_path)
+			if version != VERSION:
+				raise ValueError("Unsupported sections data version: " + str(version))
+			self.codec = CODECS[codec_id]
+			if self.codec == CODEC_NONE:
+				self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+			else:
+				if self.codec not in get_codecs():
+					raise ValueError("Unsupported codec: " + self.codec)
+				self.buffer = bytes(HEADER.size) + decompress(f.read(), self.codec)
+		offset = HEADER.size
+		self.meta = json.loads(self.buffer[offset:offset + meta_size].decode(), object_pairs_hook=OrderedDict)
+		offset += meta_size
+		self.entries = OrderedDict()
+		for i in range(num_entries):
+			kind, typecode, owner_size, name_size, array_offset, count = ENTRY.unpack_from(self.buffer, offset)
+			offset += ENTRY.size
+			owner = self.buffer[offset:offset + owner_size].decode()
+			offset += owner_size
+			name = self.buffer[offset:offset + name_size].decode()
+			offset += name_size
+			self.entries[kind, owner, name] = typecode.decode(), array_offset, count
+			
+	def get_array(self, kind, owner, name=""):
+		typecode, offset, count = self.entries[kind, owner, name]
+		return numpy.frombuffer(self.buffer, TYPECODES[typecode], count, offset)
+		
+	def get_normals(self, ob_name):
+		keys = self.get_array(NORMAL_KEYS, ob_name).reshape(-1, 2).tolist()
+		values = self.get_array(NORMAL_VALUES, ob_name)
+		if self.entries[NORMAL_VALUES, ob_name, ""][0] == "H":
+			values = decode_octahedral(values).tolist()
+		else:
+			values = values.reshape(-1, 3).tolist()
+		return {tuple(k) : v for k, v in zip(keys, values)}
+		
+	def get_normal_indices(self, ob_name):
+		keys = self.get_array(NORMAL_KEYS, ob_name).reshape(-1, 2).tolist()
+		return [(mat_id, vert_id, tuple(keys[i])) for mat_id, vert_id, i in self.get_array(NORMAL_INDEX_IDS, ob_name).reshape(-1, 3).tolist()]
+		
+	def get_vertex_array_lengths(self, ob_name):
+		return self.get_array(ARRAY_LENGTHS, ob_name).tolist()
+		
+	def close(self):
+		if isinstance(self.buffer, mmap.mmap):
+			self.buffer.close()
+		
+	def __enter__(self):
+		return self
+		
+	def __exit__(self, *args):
+		self.close()
+		
+def load(file_path):
+	with Reader(file_path) as r:
+		data = dict(r.meta)
+		data[NORMALS] = {}
+		data[NORMAL_INDICES] = {}
+		data[VERTEX_ARRAY_LENGTHS] = {}
+		data[INSTANCES] = {}
+		for kind, owner, name in r.entries:
+			if kind == NORMAL_KEYS:
+				data[NORMALS][owner] = r.get_normals(owner)
+			elif kind == NORMAL_INDEX_IDS:
+				data[NORMAL_INDICES][owner] = r.get_normal_indices(owner)
+			elif kind == ARRAY_LENGTHS:
+				data[VERTEX_ARRAY_LENGTHS][owner] = r.get_vertex_array_lengths(owner)
+			elif kind == TRANSFORMS:
+				data[INSTANCES].setdefault(owner, {})[name] = [r.get_array(TRANSFORMS, owner, name).tobytes(), r.get_array(PROPERTY_IDS, owner, name).tobytes()]
+		return data
+		
+# the former pickled format, kept to compare against
+
+def save_pickle(data, file_path):
+	dir = os.path.dirname(file_path)
+	if dir and not os.path.exists(dir):
+		os.makedirs(dir)
+	with open(file_path, "wb") as f:
+		pickle.dump(data, f)
+		
+def load_pickle(file_path):
+	with open(file_path, "rb") as f:
+		return pickle.load(f)
+		
+		
\ No newline at end of file
@@ -0,0 +1,99 @@
+import math, numpy
+from collections import OrderedDict
+from . import grid
+
+AUTO_SIZE_MIN = 1.0
+AUTO_SIZE_STEP = 0.9
+AUTO_SIZE_MAX_ITERATIONS = 64
+AUTO_SIZE_NUMBER_MAX = 64
+
+# rough calibration constants used by the estimate
+
+EST_BYTES_PER_TRIANGLE = 96
+EST_BYTES_PER_NORMAL = 48
+EST_BYTES_PER_INSTANCE = 176
+EST_SECONDS_PER_TRIANGLE = 0.00002
+EST_SECONDS_PER_SECTION = 0.05
+
+def get_cell_counts(co, weights, number, size):
+	if not len(co):
+		return numpy.zeros(int(number[0] * number[1]))
+	n_x, n_y = int(number[0]), int(number[1])
+	i = numpy.floor(co[:, 0] / size[0] + 0.5 * n_x).astype(int)
+	j = numpy.floor(co[:, 1] / size[1] + 0.5 * n_y).astype(int)
+	inside = (i >= 0) & (i < n_x) & (j >= 0) & (j < n_y)
+	return numpy.bincount(j[inside] * n_x + i[inside], weights[inside], n_x * n_y)
+	
+def get_min_size(dimensions, location, number_mode, number_max=AUTO_SIZE_NUMBER_MAX):
+
+	# smallest size whose grid has at most number_max sections along each axis, odd or even numbering may add one
+	
+	n = number_max if number_mode == "use_automatic_numbering" else number_max - 1
+	s = max(dimensions[0] / max(n - abs(location[0]), 1), dimensions[1] / max(n - abs(location[1]), 1), AUTO_SIZE_MIN)
+	while max(grid.get_grid(dimensions, location, "generate_by_size", None, (s, s), number_mode)[0]) > number_max:
+		s *= 1 + 1e-6
+	return s
+	
+def get_auto_size(centers, triangles, dimensions, location, number_mode, budget):
+
+	# start from the size that spreads the triangles evenly, then shrink until the densest section fits the budget
+	# returns the size and whether it fits; if none does, the smallest size that keeps the grid within bounds
+	
+	def fits(s):
+		number, size = grid.get_grid(dimensions, location, "generate_by_size", None, (s, s), number_mode)
+		counts = get_cell_counts(centers, triangles, number, size)
+		return not len(counts) or counts.max() <= budget
+		
+	s_min = get_min_size(dimensions, location, number_mode)
+	total = triangles.sum()
+	area = max(dimensions[0] * dimensions[1], AUTO_SIZE_MIN ** 2)
+	s = max(math.sqrt(area * budget / max(total, 1)), AUTO_SIZE_MIN)
+	s = max(min(s, max(dimensions[0], dimensions[1], AUTO_SIZE_MIN)), s_min)
+	
+	for i in range(AUTO_SIZE_MAX_ITERATIONS):
+		if fits(s):
+			return s, True
+		if s <= s_min:
+			return s, False
+		s = max(s * AUTO_SIZE_STEP, s_min)
+		
+	return s_min, fits(s_min)
+	
+def get_estimate(centers, triangles, instances, number, size, use_lod, lod_number, lod_decimate_factor):
+
+	counts = get_cell_counts(centers, triangles, number, size)
+	cells = counts > 0
+	num_sections = int(cells.sum())
+	num_instances = int(len(instances))
+	instance_counts = get_cell_counts(instances, numpy.ones(num_instances), number, size)
+	tris = counts[cells]
+	
+	ratios = [1.0]
+	if use_lod:
+		ratios += grid.get_lod_ratios(lod_number, lod_decimate_factor)
+		
+	lod_triangles = [int(round(tris.sum() * r)) for r in ratios]
+	
+	# only border vertices are exported with normals; they are kept by every lod level
+	
+	border = 4 * numpy.sqrt(tris * 0.5)
+	num_normals = int(border.sum()) * (len(ratios) - 1 if use_lod else 1)
+	file_size = num_normals * EST_BYTES_PER_NORMAL + num_instances * EST_BYTES_PER_INSTANCE
+	memory = int(tris.sum() * (3 + sum(ratios))) * EST_BYTES_PER_TRIANGLE + file_size
+	bake_time = tris.sum() * (2 + len(ratios)) * EST_SECONDS_PER_TRIANGLE + num_sections * len(ratios) * EST_SECONDS_PER_SECTION
+	
+	estimate = OrderedDict()
+	estimate["number"] = [int(number[0]), int(number[1])]
+	estimate["size"] = [round(size[0], 3), round(size[1], 3)]
+	estimate["sections"] = num_sections
+	estimate["instances"] = num_instances
+	estimate["instances_per_section_max"] = int(instance_counts.max()) if num_instances and len(instance_counts) else 0
+	estimate["triangles_per_section_max"] = int(tris.max()) if num_sections else 0
+	estimate["triangles_per_section_mean"] = int(tris.mean()) if num_sections else 0
+	estimate["triangles_per_lod_level"] = lod_triangles
+	estimate["file_size"] = int(file_size)
+	estimate["memory"] = int(memory)
+	estimate["bake_time"] = round(float(bake_time), 1)
+	return estimate
+	
+	
\ No newline at end of file
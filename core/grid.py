@@ -0,0 +1,85 @@
+import math
+from collections import OrderedDict
+
+def get_id(n, prefix=".", num_digits=4):
+	d = str(n)
+	return prefix + "0" * (num_digits - len(d)) + d
+	
+def get_num_digits(number):
+	return len(str(int(number[0] * number[1])))
+	
+def get_grid(dimensions, location, number_or_size, number, size, number_mode):
+	if number_or_size == "generate_by_number":
+		n_x, n_y = number
+		return [n_x, n_y], [dimensions[0] / n_x, dimensions[1] / n_y]
+		
+	n_x = math.ceil(abs(location[0]) + dimensions[0] / size[0])
+	n_y = math.ceil(abs(location[1]) + dimensions[1] / size[1])
+	
+	if number_mode != "use_automatic_numbering":
+		i = 0 if number_mode == "use_even_numbers" else 1
+		n_x = n_x + 1 - i if n_x % 2 else n_x + i
+		n_y = n_y + 1 - i if n_y % 2 else n_y + i
+		
+	return [n_x, n_y], [size[0], size[1]]
+	
+def get_points(number, size):
+
+	# section centers by id, row by row, centered on the origin
+	
+	ndigits = get_num_digits(number)
+	points = OrderedDict()
+	n = 1
+	for j in range(int(number[1])):
+		y = 0.5 * size[1] * (2 * j + 1 - number[1])
+		for i in range(int(number[0])):
+			x = 0.5 * size[0] * (2 * i + 1 - number[0])
+			points[get_id(n, "", ndigits)] = [x, y]
+			n += 1
+	return points
+	
+def get_cell(co, number, size):
+	i = math.floor(co[0] / size[0] + 0.5 * number[0])
+	j = math.floor(co[1] / size[1] + 0.5 * number[1])
+	if 0 <= i < number[0] and 0 <= j < number[1]:
+		return int(i), int(j)
+	return None
+	
+def get_point_id(co, number, size):
+
+	# id of the section containing the given location, None if out of bounds
+	
+	cell = get_cell(co, number, size)
+	if cell is None:
+		return None
+	i, j = cell
+	return get_id(1 + j * int(number[0]) + i, "", get_num_digits(number))
+	
+def get_lines(number, size, axis):
+	return [(i - 0.5 * number[axis]) * size[axis] for i in range(int(number[axis]) + 1)]
+	
+def get_lod_ratios(lod_number, lod_decimate_factor):
+
+	# decimate collapse ratio per lod level; the last level is an empty placeholder
+	
+	return [lod_decimate_factor / i for i in range(1, lod_number)] + [0.0]
+	
+def get_table_incremented(v, f, n):
+	x = v / (f + 1)
+	y = 2 * f
+	l = [x * i + math.sqrt(y * x) * pow(y * i, 2) for i in range(1, n + 1)]
+	z = l[0] / v
+	l = [round(l[i] / z) for i in range(n)]
+	return l
+	
+def get_lod_distances(lod_number, size, use_custom_profile=True, distance_initial=48, distance_factor=0.75):
+	if use_custom_profile:
+		lod_dist_init = distance_initial
+		lod_dist_fact = distance_factor
+	else:
+		lod_dist_init = max(size[0], size[1])
+		lod_dist_fact = 0.5
+	d = get_table_incremented(lod_dist_init, lod_dist_fact, lod_number + 1)
+	return [f - lod_dist_init for f in d]
+	
+	
\ No newline at end of file
@@ -0,0 +1,265 @@
+import os, struct, zlib, numpy
+from .mesh import Mesh, triangulate
+
+ERR_MSG_UNSUPPORTED_FORMAT = "Unsupported file format: "
+ERR_MSG_UNSUPPORTED_PNG = "Unsupported PNG, expected 8 or 16 bit grayscale or RGB(A): "
+ERR_MSG_UNSUPPORTED_PLY = "Unsupported PLY: "
+ERR_MSG_TRUNCATED_PLY = "PLY header ends without end_header: "
+ERR_MSG_RAW_SIZE = "RAW heightmap size does not match: "
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHANNELS = {0 : 1, 2 : 3, 4 : 2, 6 : 4}
+
+PLY_TYPES = {
+	"char" : "i1", "int8" : "i1",
+	"uchar" : "u1", "uint8" : "u1",
+	"short" : "i2", "int16" : "i2",
+	"ushort" : "u2", "uint16" : "u2",
+	"int" : "i4", "int32" : "i4",
+	"uint" : "u4", "uint32" : "u4",
+	"float" : "f4", "float32" : "f4",
+	"double" : "f8", "float64" : "f8",
+}
+
+HEIGHTMAP_EXTENSIONS = (".png", ".raw", ".r16")
+
+# mesh files
+
+def read_obj(file_path):
+	vertices = []
+	polygons = []
+	with open(file_path, "r") as f:
+		for line in f:
+			if line.startswith("v "):
+				vertices.append([float(s) for s in line.split()[1:4]])
+			elif line.startswith("f "):
+				poly = []
+				for s in line.split()[1:]:
+					i = int(s.split("/")[0])
+					poly.append(i - 1 if i > 0 else len(vertices) + i)
+				polygons.append(poly)
+	name = os.path.splitext(os.path.basename(file_path))[0]
+	return Mesh(vertices, triangulate(polygons), name)
+	
+def write_obj(mesh, file_path):
+	with open(file_path, "w") as f:
+		f.write("o " + mesh.name + "\n")
+		numpy.savetxt(f, mesh.vertices, "v %.6f %.6f %.6f")
+		numpy.savetxt(f, mesh.triangles + 1, "f %d %d %d")
+			
+def read_ply(file_path):
+
+	# ascii and binary little or big endian; vertex x, y, z and a face vertex index list are used
+	
+	with open(file_path, "rb") as f:
+		if f.readline().strip() != b"ply":
+			raise ValueError(ERR_MSG_UNSUPPORTED_PLY + file_path)
+		fmt = None
+		elements = []
+		while True:
+			line = f.readline()
+			if not line:
+				raise ValueError(ERR_MSG_TRUNCATED_PLY + file_path)
+			words = line.decode("ascii").split()
+			if not words:
+				continue
+			if words[0] == "format":
+				fmt = words[1]
+			elif words[0] == "element":
+				elements.append([words[1], int(words[2]), []])
+			elif words[0] == "property":
+				elements[-1][2].append(words[1:])
+			elif words[0] == "end_header":
+				break
+		body = f.read()
+		
+	if fmt == "ascii":
+		return read_ply_ascii(file_path, elements, body)
+	if fmt in ("binary_little_endian", "binary_big_endian"):
+		return read_ply_binary(file_path, elements, body, "<" if fmt == "binary_little_endian" else ">")
+	raise ValueError(ERR_MSG_UNSUPPORTED_PLY + file_path)
+	
+def read_ply_ascii(file_path, elements, body):
+	lines = iter(body.decode("ascii").splitlines())
+	vertices = []
+	polygons = []
+	for name, count, properties in elements:
+		names = [p[-1] for p in properties]
+		for i in range(count):
+			values = next(lines).split()
+			if name == "vertex":
+				vertices.append([float(values[names.index(a)]) for a in "xyz"])
+			elif name == "face":
+				n = int(values[0])
+				polygons.append([int(s) for s in values[1:n + 1]])
+	return Mesh(vertices, triangulate(polygons), os.path.splitext(os.path.basename(file_path))[0])
+	
+def read_ply_binary(file_path, elements, body, endian):
+	offset = 0
+	vertices = []
+	triangles = []
+	for name, count, properties in elements:
+	
+		if all(p[0] != "list" for p in properties):
+			dtype = numpy.dtype([(p[-1], endian + PLY_TYPES[p[0]]) for p in properties])
+			a = numpy.frombuffer(body, dtype, count, offset)
+			offset += dtype.itemsize * count
+			if name == "vertex":
+				vertices = numpy.stack([a[k].astype(numpy.float64) for k in "xyz"], axis=1)
+			continue
+			
+		if name != "face" or len(properties) != 1:
+			raise ValueError(ERR_MSG_UNSUPPORTED_PLY + file_path)
+			
+		# try all triangles at once, fall back to reading polygon by polygon
+		
+		count_type = endian + PLY_TYPES[properties[0][1]]
+		index_type = endian + PLY_TYPES[properties[0][2]]
+		dtype = numpy.dtype([("n", count_type), ("i", index_type, 3)])
+		if offset + dtype.itemsize * count <= len(body):
+			a = numpy.frombuffer(body, dtype, count, offset)
+			if numpy.all(a["n"] == 3):
+				triangles = a["i"].astype(numpy.int64)
+				offset += dtype.itemsize * count
+				continue
+				
+		count_size = numpy.dtype(count_type).itemsize
+		index_dtype = numpy.dtype(index_type)
+		polygons = []
+		for i in range(count):
+			n = int(numpy.frombuffer(body, count_type, 1, offset)[0])
+			offset += count_size
+			polygons.append(numpy.frombuffer(body, index_dtype, n, offset).tolist())
+			offset += index_dtype.itemsize * n
+		triangles = triangulate(polygons)
+		
+	return Mesh(vertices, triangles, os.path.splitext(os.path.basename(file_path))[0])
+	
+# heightmaps
+
+def unfilter_average(line, prev, bpp):
+
+	# every byte depends on the one a pixel to its left, so this goes along the row, over plain lists as numpy scalars are slower
+	
+	l = [(v + (b >> 1)) & 0xFF for v, b in zip(line[:bpp], prev[:bpp])]
+	for v, b in zip(line[bpp:], prev[bpp:]):
+		l.append((v + ((l[-bpp] + b) >> 1)) & 0xFF)
+	return l
+	
+def unfilter_paeth(line, prev, bpp):
+	l = [(v + b) & 0xFF for v, b in zip(line[:bpp], prev[:bpp])]
+	for v, b, c in zip(line[bpp:], prev[bpp:], prev):
+		a = l[-bpp]
+		pa, pb, pc = abs(b - c), abs(a - c), abs(a + b - 2 * c)
+		l.append((v + (a if pa <= pb and pa <= pc else (b if pb <= pc else c))) & 0xFF)
+	return l
+	
+def read_png(file_path):
+
+	# grayscale heights from an 8 or 16 bit non-interlaced PNG, normalized to [0, 1]; color images use the first channel
+	
+	with open(file_path, "rb") as f:
+		data = f.read()
+	if data[:8] != PNG_SIGNATURE:
+		raise ValueError(ERR_MSG_UNSUPPORTED_PNG + file_path)
+		
+	i = 8
+	header = None
+	idat = []
+	while i + 12 <= len(data):
+		length, chunk_type = struct.unpack(">I4s", data[i:i + 8])
+		chunk = data[i + 8:i + 8 + length]
+		if len(chunk) < length:
+			break
+		if chunk_type == b"IHDR" and length == 13:
+			header = struct.unpack(">IIBBBBB", chunk)
+		elif chunk_type == b"IDAT":
+			idat.append(chunk)
+		elif chunk_type == b"IEND":
+			break
+		i += 12 + length
+		
+	# without a header or with pixel data cut short, the file is not read any further
+	
+	if header is None:
+		raise ValueError(ERR_MSG_UNSUPPORTED_PNG + file_path)
+	width, height, depth, color_type, compression, filter_method, interlace = header
+	if depth not in (8, 16) or color_type not in PNG_CHANNELS or interlace:
+		raise ValueError(ERR_MSG_UNSUPPORTED_PNG + file_path)
+		
+	bpp = PNG_CHANNELS[color_type] * depth // 8
+	stride = width * bpp
+	try:
+		raw = zlib.decompress(b"".join(idat))
+	except zlib.error:
+		raise ValueError(ERR_MSG_UNSUPPORTED_PNG + file_path)
+	if len(raw) != height * (stride + 1):
+		raise ValueError(ERR_MSG_UNSUPPORTED_PNG + file_path)
+	raw = numpy.frombuffer(raw, numpy.uint8).reshape(height, stride + 1)
+	rows = numpy.zeros((height, stride), dtype=numpy.uint8)
+	prev = numpy.zeros(stride, dtype=numpy.int32)
+	
+	for y in range(height):
+		filter_type = raw[y, 0]
+		line = raw[y, 1:].astype(numpy.int32)
+		if filter_type == 1:
+			for k in range(bpp):
+				line[k::bpp] = numpy.cumsum(line[k::bpp]) & 0xFF
+		elif filter_type == 2:
+			line = (line + prev) & 0xFF
+		elif filter_type == 3:
+			line = numpy.array(unfilter_average(line.tolist(), prev.tolist(), bpp), dtype=numpy.int32)
+		elif filter_type == 4:
+			line = numpy.array(unfilter_paeth(line.tolist(), prev.tolist(), bpp), dtype=numpy.int32)
+		rows[y] = line
+		prev = line
+		
+	if depth == 16:
+		values = rows.view(">u2").reshape(height, width, -1)[:, :, 0]
+		return values.astype(numpy.float64) / 65535
+	return rows.reshape(height, width, -1)[:, :, 0].astype(numpy.float64) / 255
+	
+def read_raw(file_path, width=0, height=0, endian="<"):
+
+	# 16 bit unsigned heights; square unless width and height are given
+	
+	values = numpy.fromfile(file_path, endian + "u2")
+	if not width or not height:
+		width = height = int(round(len(values) ** 0.5))
+	if width * height != len(values):
+		raise ValueError(ERR_MSG_RAW_SIZE + file_path)
+	return values.reshape(height, width).astype(numpy.float64) / 65535
+	
+def get_heightmap_mesh(heights, scale=(1, 1, 1), name=""):
+
+	# a grid of two triangles per pixel quad, centered on the origin; image rows go from top to bottom
+	
+	h, w = heights.shape
+	x = (numpy.arange(w) - 0.5 * (w - 1)) * scale[0]
+	y = (0.5 * (h - 1) - numpy.arange(h)) * scale[1]
+	xx, yy = numpy.meshgrid(x, y)
+	vertices = numpy.stack((xx.ravel(), yy.ravel(), heights.ravel() * scale[2]), axis=1)
+	
+	i = numpy.arange(h * w).reshape(h, w)
+	a = i[1:, :-1].ravel()
+	b = i[1:, 1:].ravel()
+	c = i[:-1, 1:].ravel()
+	d = i[:-1, :-1].ravel()
+	triangles = numpy.concatenate((numpy.stack((a, b, c), axis=1), numpy.stack((a, c, d), axis=1)))
+	return Mesh(vertices, triangles, name)
+	
+def read_heightmap(file_path, scale=(1, 1, 1), width=0, height=0):
+	ext = os.path.splitext(file_path)[1].lower()
+	heights = read_png(file_path) if ext == ".png" else read_raw(file_path, width, height)
+	return get_heightmap_mesh(heights, scale, os.path.splitext(os.path.basename(file_path))[0])
+	
+def read(file_path, **kwargs):
+	ext = os.path.splitext(file_path)[1].lower()
+	if ext == ".obj":
+		return read_obj(file_path)
+	if ext == ".ply":
+		return read_ply(file_path)
+	if ext in HEIGHTMAP_EXTENSIONS:
+		return read_heightmap(file_path, **kwargs)
+	raise ValueError(ERR_MSG_UNSUPPORTED_FORMAT + file_path)
+	
\ No newline at end of file
@@ -0,0 +1,261 @@
+import numpy
+
+REMOVE_DOUBLES_THRESHOLD = 0.0001
+SPLIT_THRESHOLD = 0.000001
+DECIMATE_ITERATIONS = 16
+
+class Mesh:
+
+	# triangle mesh as numpy arrays: vertices (n x 3 float) and triangles (m x 3 int)
+	
+	def __init__(self, vertices, triangles, name=""):
+		self.name = name
+		self.vertices = numpy.asarray(vertices, dtype=numpy.float64).reshape(-1, 3)
+		self.triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+		
+	def __len__(self):
+		return len(self.triangles)
+		
+	def copy(self, name=None):
+		return Mesh(self.vertices.copy(), self.triangles.copy(), self.name if name is None else name)
+		
+	def translated(self, offset, name=None):
+		return Mesh(self.vertices + numpy.asarray(offset, dtype=numpy.float64), self.triangles.copy(), self.name if name is None else name)
+		
+	def bounds(self):
+		if not len(self.vertices):
+			return numpy.zeros(3), numpy.zeros(3)
+		return self.vertices.min(axis=0), self.vertices.max(axis=0)
+		
+	def dimensions(self):
+		bb_min, bb_max = self.bounds()
+		return bb_max - bb_min
+		
+def triangulate(polygons):
+
+	# fan triangulation of polygons given as index lists
+	
+	l = []
+	for poly in polygons:
+		for i in range(1, len(poly) - 1):
+			l.append((poly[0], poly[i], poly[i + 1]))
+	return l
+	
+def unique_rows(a):
+
+	# unique integer rows and the inverse mapping, without relying on numpy.unique(axis=...)
+	
+	if not len(a):
+		return a.copy(), numpy.zeros(0, dtype=numpy.int64)
+	order = numpy.lexsort(a.T[::-1])
+	s = a[order]
+	new = numpy.ones(len(s), dtype=bool)
+	new[1:] = numpy.any(s[1:] != s[:-1], axis=1)
+	ids = numpy.cumsum(new) - 1
+	inverse = numpy.empty(len(a), dtype=numpy.int64)
+	inverse[order] = ids
+	return s[new], inverse
+	
+def compact(vertices, triangles, name=""):
+
+	# drop unused vertices; returns the mesh and the original index of every kept vertex
+	
+	used = numpy.unique(triangles)
+	remap = numpy.full(len(vertices), -1, dtype=numpy.int64)
+	remap[used] = numpy.arange(len(used))
+	return Mesh(vertices[used], remap[triangles], name), used
+	
+def remove_degenerate(triangles):
+	t = triangles
+	keep = (t[:, 0] != t[:, 1]) & (t[:, 1] != t[:, 2]) & (t[:, 2] != t[:, 0])
+	return t[keep]
+	
+def remove_doubles(mesh, threshold=REMOVE_DOUBLES_THRESHOLD):
+	keys = numpy.floor(mesh.vertices / threshold + 0.5).astype(numpy.int64)
+	unique, inverse = unique_rows(keys)
+	vertices = numpy.zeros((len(unique), 3))
+	counts = numpy.bincount(inverse, minlength=len(unique)).reshape(-1, 1)
+	numpy.add.at(vertices, inverse, mesh.vertices)
+	vertices /= counts
+	return Mesh(vertices, remove_degenerate(inverse[mesh.triangles]), mesh.name)
+	
+def face_normals(mesh):
+
+	# area weighted, not normalized
+	
+	v = mesh.vertices[mesh.triangles]
+	return numpy.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+	
+def vertex_normals(mesh):
+	normals = numpy.zeros_like(mesh.vertices)
+	fn = face_normals(mesh)
+	for i in range(3):
+		numpy.add.at(normals, mesh.triangles[:, i], fn)
+	length = numpy.linalg.norm(normals, axis=1).reshape(-1, 1)
+	length[length == 0] = 1
+	return normals / length
+	
+def get_edges(triangles, num_vertices):
+
+	# undirected edges of all triangles as unique integer keys, with the number of triangles using each
+	
+	t = triangles
+	a = numpy.concatenate((t[:, 0], t[:, 1], t[:, 2]))
+	b = numpy.concatenate((t[:, 1], t[:, 2], t[:, 0]))
+	keys = numpy.minimum(a, b) * num_vertices + numpy.maximum(a, b)
+	return numpy.unique(keys, return_counts=True)
+	
+def boundary_vertices(mesh):
+
+	# mask of vertices on edges used by a single triangle, like region to loop on the whole mesh
+	
+	n = len(mesh.vertices)
+	mask = numpy.zeros(n, dtype=bool)
+	if not len(mesh.triangles):
+		return mask
+	keys, counts = get_edges(mesh.triangles, n)
+	border = keys[counts == 1]
+	mask[border // n] = True
+	mask[border % n] = True
+	return mask
+	
+def split(mesh, axis, offset, threshold=SPLIT_THRESHOLD):
+
+	# bisect all triangles crossing the plane at offset along axis; the cut edges are shared, not split apart
+	# vertices close to the plane are snapped onto it
+	
+	vertices = mesh.vertices.copy()
+	d = vertices[:, axis] - offset
+	near = numpy.abs(d) < threshold
+	vertices[near, axis] = offset
+	d[near] = 0
+	
+	t = mesh.triangles
+	s = numpy.sign(d)[t]
+	crossing = (s.max(axis=1) > 0) & (s.min(axis=1) < 0)
+	if not crossing.any():
+		return Mesh(vertices, t, mesh.name)
+		
+	keep = t[~crossing]
+	t = t[crossing]
+	s = s[crossing]
+	
+	# rotate every crossing triangle so its first vertex is the lone one: the one on the plane, or the one alone on its side
+	
+	zero = s == 0
+	lone = numpy.where(zero.any(axis=1), zero.argmax(axis=1), (s == -numpy.sign(s.sum(axis=1, keepdims=True))).argmax(axis=1))
+	idx = (lone.reshape(-1, 1) + numpy.arange(3)) % 3
+	t = t[numpy.arange(len(t)).reshape(-1, 1), idx]
+	a, b, c = t[:, 0], t[:, 1], t[:, 2]
+	on_plane = d[a] == 0
+	
+	# intersection vertices, one per cut edge
+	
+	n = len(vertices)
+	ea = numpy.concatenate((numpy.minimum(b, c)[on_plane], numpy.minimum(a, b)[~on_plane], numpy.minimum(a, c)[~on_plane]))
+	eb = numpy.concatenate((numpy.maximum(b, c)[on_plane], numpy.maximum(a, b)[~on_plane], numpy.maximum(a, c)[~on_plane]))
+	keys, inverse = numpy.unique(ea * n + eb, return_inverse=True)
+	ka, kb = keys // n, keys % n
+	f = (d[ka] / (d[ka] - d[kb])).reshape(-1, 1)
+	points = vertices[ka] + f * (vertices[kb] - vertices[ka])
+	points[:, axis] = offset
+	vertices = numpy.concatenate((vertices, points))
+	p = inverse + n
+	
+	m = on_plane.sum()
+	k = (~on_plane).sum()
+	p_bc = p[:m]
+	p_ab = p[m:m + k]
+	p_ac = p[m + k:]
+	
+	ap, bp, cp = a[on_plane], b[on_plane], c[on_plane]
+	aq, bq, cq = a[~on_plane], b[~on_plane], c[~on_plane]
+	triangles = numpy.concatenate((
+		keep,
+		numpy.stack((ap, bp, p_bc), axis=1),
+		numpy.stack((ap, p_bc, cp), axis=1),
+		numpy.stack((aq, p_ab, p_ac), axis=1),
+		numpy.stack((p_ab, bq, cq), axis=1),
+		numpy.stack((p_ab, cq, p_ac), axis=1),
+	))
+	return Mesh(vertices, triangles, mesh.name)
+	
+def multisect(mesh, lines_x, lines_y):
+	for x in lines_x:
+		mesh = split(mesh, 0, x)
+	for y in lines_y:
+		mesh = split(mesh, 1, y)
+	return mesh
+	
+def get_cells(mesh, number, size):
+
+	# grid cell index of every triangle by its center, -1 if out of bounds
+	
+	n_x, n_y = int(number[0]), int(number[1])
+	co = mesh.vertices[mesh.triangles].mean(axis=1)
+	i = numpy.floor(co[:, 0] / size[0] + 0.5 * n_x).astype(numpy.int64)
+	j = numpy.floor(co[:, 1] / size[1] + 0.5 * n_y).astype(numpy.int64)
+	inside = (i >= 0) & (i < n_x) & (j >= 0) & (j < n_y)
+	return numpy.where(inside, j * n_x + i, -1)
+	
+def separate(mesh, number, size):
+
+	# one compacted mesh per non-empty cell, with the original indices of its vertices
+	
+	cells = get_cells(mesh, number, size)
+	d = {}
+	order = numpy.argsort(cells, kind="mergesort")
+	sorted_cells = cells[order]
+	bounds = numpy.flatnonzero(numpy.diff(sorted_cells)) + 1
+	for l in numpy.split(order, bounds):
+		if not len(l) or cells[l[0]] < 0:
+			continue
+		d[int(cells[l[0]])] = compact(mesh.vertices, mesh.triangles[l])
+	return d
+	
+def cluster(mesh, locked, cell_size):
+
+	# vertex clustering: unlocked vertices falling in the same cell are merged into their mean
+	
+	n = len(mesh.vertices)
+	keys = numpy.zeros((n, 4), dtype=numpy.int64)
+	keys[:, :3] = numpy.floor(mesh.vertices / cell_size).astype(numpy.int64)
+	keys[locked, 3] = numpy.arange(1, locked.sum() + 1)
+	unique, inverse = unique_rows(keys)
+	vertices = numpy.zeros((len(unique), 3))
+	numpy.add.at(vertices, inverse, mesh.vertices)
+	vertices /= numpy.bincount(inverse, minlength=len(unique)).reshape(-1, 1)
+	vertices[inverse[locked]] = mesh.vertices[locked]
+	return vertices, remove_degenerate(inverse[mesh.triangles])
+	
+def decimate(mesh, ratio, locked=None, name=None):
+
+	# reduce to about ratio times the triangle count, keeping locked vertices in place
+	# the cluster size is found by bisection on the resulting triangle count
+	
+	name = mesh.name if name is None else name
+	if ratio >= 1 or not len(mesh.triangles):
+		return mesh.copy(name)
+	if ratio <= 0:
+		return Mesh([], [], name)
+	if locked is None:
+		locked = numpy.zeros(len(mesh.vertices), dtype=bool)
+		
+	target = ratio * len(mesh.triangles)
+	lo = 0.0
+	hi = float(numpy.linalg.norm(mesh.dimensions())) or 1.0
+	result = None
+	for i in range(DECIMATE_ITERATIONS):
+		c = 0.5 * (lo + hi)
+		vertices, triangles = cluster(mesh, locked, c)
+		if len(triangles) > target:
+			lo = c
+		else:
+			hi = c
+			result = vertices, triangles
+	if result is None:
+		result = cluster(mesh, locked, hi)
+	m, used = compact(result[0], result[1], name)
+	return m
+	
+	
\ No newline at end of file
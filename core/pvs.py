@@ -0,0 +1,71 @@
+import math
+
+PVS_EYE_HEIGHT = 2.0
+PVS_SAMPLES = 3
+PVS_MARGIN = 0.5
+
+def get_samples(point, size, samples, z):
+
+	# evenly spread over the cell, corners included
+	
+	if samples < 2:
+		return [(point[0], point[1], z)]
+	l = []
+	for j in range(samples):
+		y = point[1] + size[1] * (j / (samples - 1) - 0.5)
+		for i in range(samples):
+			x = point[0] + size[0] * (i / (samples - 1) - 0.5)
+			l.append((x, y, z))
+	return l
+	
+def is_visible(eyes, targets, id, ray_cast):
+
+	# visible when a ray reaches a target unblocked, or when the first thing it hits is the target section itself
+	
+	for e in eyes:
+		for t in targets:
+			d = [t[i] - e[i] for i in range(3)]
+			distance = math.sqrt(sum(f * f for f in d))
+			if not distance:
+				return True
+			hit = ray_cast(e, [f / distance for f in d], distance)
+			if hit is None or hit == id:
+				return True
+	return False
+	
+def get_pvs(points, number, size, heights, ray_cast, eye_height=PVS_EYE_HEIGHT, samples=PVS_SAMPLES, max_distance=None):
+
+	# potentially visible sections per section, by id
+	# heights: highest point per section id, sections without one are empty and skipped
+	# ray_cast: (origin, direction, distance) -> id of the first section hit or None
+	# eyes sit above the highest point of their section and targets on top of theirs, so the test errs on the visible side
+	# neighbours are always visible and every pair is tested both ways
+	
+	keys = list(points.keys())
+	n_x = int(number[0])
+	radius = 0.5 * math.hypot(size[0], size[1])
+	pvs = {id : {id} for id in keys if id in heights}
+	eyes = {id : get_samples(points[id], size, samples, heights[id] + eye_height) for id in pvs}
+	targets = {id : get_samples(points[id], size, samples, heights[id]) for id in pvs}
+	
+	for i, a in enumerate(keys):
+		if a not in pvs:
+			continue
+		for j in range(i + 1, len(keys)):
+			b = keys[j]
+			if b not in pvs:
+				continue
+			if abs(i % n_x - j % n_x) <= 1 and abs(i // n_x - j // n_x) <= 1:
+				visible = True
+			else:
+				pa, pb = points[a], points[b]
+				if max_distance is not None and math.hypot(pa[0] - pb[0], pa[1] - pb[1]) - radius > max_distance:
+					continue
+				visible = is_visible(eyes[a], targets[b], b, ray_cast) or is_visible(eyes[b], targets[a], a, ray_cast)
+			if visible:
+				pvs[a].add(b)
+				pvs[b].add(a)
+				
+	return {id : sorted(l) for id, l in pvs.items()}
+	
+	
\ No newline at end of file
@@ -0,0 +1,144 @@
+import math, random, zlib
+
+SCATTER_RESOLUTION = 8
+SCATTER_MIN_COUNT = 16
+SCATTER_TOLERANCE = 1e-4
+
+def get_seed(name):
+	return zlib.crc32(name.encode()) & 0xffffffff
+	
+def decompose(rows):
+
+	# location, uniform scale and rotation around z of a 4 x 4 matrix given as rows
+	
+	scale = sum(math.sqrt(sum(rows[i][j] ** 2 for i in range(3))) for j in range(3)) / 3
+	yaw = math.atan2(rows[1][0], rows[0][0])
+	return rows[0][3], rows[1][3], rows[2][3], scale, yaw
+	
+def is_scatterable(rows, tolerance=SCATTER_TOLERANCE):
+
+	# only a rotation around z with a uniform scale survives decompose, other transforms stay explicit instances
+	
+	scales = [math.sqrt(sum(rows[i][j] ** 2 for i in range(3))) for j in range(3)]
+	scale = sum(scales) / 3
+	if scale <= tolerance or max(scales) - min(scales) > tolerance * scale:
+		return False
+	return max(abs(rows[2][0]), abs(rows[2][1]), abs(rows[0][2]), abs(rows[1][2])) <= tolerance * scale
+	
+def get_cell(x, y, point, size, resolution):
+	i = int((x - point[0]) / size[0] * resolution + 0.5 * resolution)
+	j = int((y - point[1]) / size[1] * resolution + 0.5 * resolution)
+	return min(max(j, 0), resolution - 1) * resolution + min(max(i, 0), resolution - 1)
+	
+def get_height_map(point, size, resolution, height_at):
+
+	# heights at the corners of the cells, row by row
+	
+	l = []
+	for j in range(resolution + 1):
+		y = point[1] + size[1] * (j / resolution - 0.5)
+		for i in range(resolution + 1):
+			x = point[0] + size[0] * (i / resolution - 0.5)
+			l.append(height_at(x, y))
+	return l
+	
+def get_height(heights, x, y, point, size, resolution):
+
+	# bilinear interpolation of the height map
+	
+	u = min(max(((x - point[0]) / size[0] + 0.5) * resolution, 0), resolution)
+	v = min(max(((y - point[1]) / size[1] + 0.5) * resolution, 0), resolution)
+	i = min(int(u), resolution - 1)
+	j = min(int(v), resolution - 1)
+	u -= i
+	v -= j
+	n = resolution + 1
+	h0 = heights[j * n + i] * (1 - u) + heights[j * n + i + 1] * u
+	h1 = heights[(j + 1) * n + i] * (1 - u) + heights[(j + 1) * n + i + 1] * u
+	return h0 * (1 - v) + h1 * v
+	
+def get_rule(name, seed, transforms, point, size, resolution, heights):
+	density = [0] * resolution ** 2
+	scales = []
+	yaws = []
+	offsets = []
+	for rows in transforms:
+		x, y, z, scale, yaw = decompose(rows)
+		density[get_cell(x, y, point, size, resolution)] += 1
+		scales.append(scale)
+		yaws.append(yaw)
+		offsets.append(z - get_height(heights, x, y, point, size, resolution))
+	return {
+		"name" : name,
+		"seed" : seed,
+		"count" : len(transforms),
+		"density" : density,
+		"scale" : [min(scales), max(scales)],
+		"yaw" : [min(yaws), max(yaws)],
+		"offset" : [min(offsets), max(offsets)],
+	}
+	
+def get_transforms(rule, point, size, resolution, heights):
+
+	# the same rule always gives the same transforms in the same order; mirrored by the runtime
+	
+	rng = random.Random(rule["seed"])
+	cumulative = []
+	total = 0
+	for f in rule["density"]:
+		total += f
+		cumulative.append(total)
+		
+	def lerp(r):
+		return r[0] + (r[1] - r[0]) * rng.random()
+		
+	l = []
+	for k in range(rule["count"]):
+		f = rng.random() * total
+		i = 0
+		while i < len(cumulative) - 1 and cumulative[i] <= f:
+			i += 1
+		x = point[0] + size[0] * ((i % resolution + rng.random()) / resolution - 0.5)
+		y = point[1] + size[1] * ((i // resolution + rng.random()) / resolution - 0.5)
+		scale = lerp(rule["scale"])
+		yaw = lerp(rule["yaw"])
+		z = get_height(heights, x, y, point, size, resolution) + lerp(rule["offset"])
+		c = math.cos(yaw) * scale
+		s = math.sin(yaw) * scale
+		l.append([[c, -s, 0.0, x], [s, c, 0.0, y], [0.0, 0.0, scale, z], [0.0, 0.0, 0.0, 1.0]])
+	return l
+	
+def get_scatter(instances, points, size, height_at, resolution=SCATTER_RESOLUTION, min_count=SCATTER_MIN_COUNT):
+
+	# instances without properties and with only a rotation around z and a uniform scale,
+	# at least min_count of an object in a section, become scatter rules
+	# points: section center by section name
+	# returns the remaining instances and, by section name, the height map and the rules
+	
+	remaining = {}
+	scatter = {}
+	for sect_name, d in instances.items():
+		point = points[sect_name]
+		heights = None
+		rules = []
+		for n, nl in d.items():
+			transforms = [rows for rows, properties in nl if not properties and is_scatterable(rows)]
+			if len(transforms) < min_count:
+				remaining.setdefault(sect_name, {})[n] = nl
+				continue
+			if heights is None:
+				heights = get_height_map(point, size, resolution, height_at)
+			rules.append(get_rule(n, get_seed(sect_name + n), transforms, point, size, resolution, heights))
+			l = [e for e in nl if e[1] or not is_scatterable(e[0])]
+			if l:
+				remaining.setdefault(sect_name, {})[n] = l
+		if rules:
+			scatter[sect_name] = [heights, rules]
+	return remaining, scatter
+	
+def get_counts(scatter, sect_name):
+	if sect_name not in scatter:
+		return {}
+	return {rule["name"] : rule["count"] for rule in scatter[sect_name][1]}
+	
+	
\ No newline at end of file
@@ -0,0 +1,238 @@
+import os, sys, time, json, tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+	import resource
+except ImportError:
+	resource = None
+	
+TRACE_DIR = "BGE_TOOLS_TRACE"
+EXTENSION = ".json"
+
+OPERATORS = "operators"
+TRIANGLES = "triangles"
+
+def get_peak_rss():
+
+	# peak resident set size in bytes, if the platform reports it
+	
+	if resource is None:
+		return None
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return rss if sys.platform == "darwin" else rss * 1024
+	
+class Span:
+
+	def __init__(self, name, parent=None):
+		self.name = name
+		self.parent = parent
+		self.depth = parent.depth + 1 if parent else 0
+		self.wall = 0.0
+		self.cpu = 0.0
+		self.counters = OrderedDict()
+		self.args = OrderedDict()
+		
+class Tracer:
+
+	# hierarchical spans with wall and cpu time, counters and samplers
+	# samplers are callables returning a number; their deltas are recorded per span as counters
+	# with track_memory, peak rss and traced python allocations are recorded per span
+	
+	def __init__(self, name, samplers={}, track_memory=False):
+		self.name = name
+		self.samplers = OrderedDict(samplers)
+		self.track_memory = track_memory
+		self.__tracemalloc = False
+		self.start = time.perf_counter()
+		self.counters = OrderedDict()
+		self.spans = []
+		self.events = []
+		self.stack = []
+		self.__operator_call = None
+		
+	def __enter__(self):
+		self.hook_operators()
+		if self.track_memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+			self.__tracemalloc = True
+		return self
+		
+	def __exit__(self, *args):
+		self.unhook_operators()
+		if self.__tracemalloc:
+			tracemalloc.stop()
+			self.__tracemalloc = False
+			
+	def hours_minutes_seconds(self, seconds):
+		hours = seconds // 3600
+		seconds %= 3600
+		minutes = seconds // 60
+		seconds %= 60
+		return hours, minutes, seconds
+		
+	def delta_time(self):
+		return round(time.perf_counter() - self.start, 1)
+		
+	def timed(self, *args):
+		out = ""
+		for arg in args:
+			out += str(arg)
+		for i in range(60 - len(out)):
+			out += "."
+		hours, minutes, seconds = self.hours_minutes_seconds(self.delta_time())
+		out += str(int(hours)) + "h " + str(int(minutes)) + "m " + str(int(seconds)) + "s"
+		return out
+		
+	def timestamp(self):
+		return (time.perf_counter() - self.start) * 1000000
+		
+	def count(self, name, n=1):
+		self.counters[name] = self.counters.get(name, 0) + n
+		for span in self.stack:
+			span.counters[name] = span.counters.get(name, 0) + n
+			
+	def sample(self):
+		return {k: f() for k, f in self.samplers.items()}
+		
+	@contextmanager
+	def span(self, name, **args):
+		parent = self.stack[-1] if self.stack else None
+		span = Span(name, parent)
+		span.args.update(args)
+		self.stack.append(span)
+		samples = self.sample()
+		memory = self.track_memory and tracemalloc.is_tracing()
+		if memory:
+			if not parent and hasattr(tracemalloc, "reset_peak"):
+				tracemalloc.reset_peak()
+			allocated = tracemalloc.get_traced_memory()[0]
+		ts = self.timestamp()
+		wall = time.perf_counter()
+		cpu = time.process_time()
+		try:
+			yield span
+		finally:
+			span.wall = time.perf_counter() - wall
+			span.cpu = time.process_time() - cpu
+			if memory:
+				current, peak = tracemalloc.get_traced_memory()
+				span.args["py_alloc_delta"] = current - allocated
+				span.args["py_alloc_peak"] = peak
+				span.args["rss_peak"] = get_peak_rss()
+			for k, v in self.sample().items():
+				d = v - samples[k]
+				if d:
+					self.count(k, d)
+			self.stack.pop()
+			self.spans.append(span)
+			
+			args = OrderedDict(span.args)
+			args["cpu_ms"] = round(span.cpu * 1000, 3)
+			args.update(span.counters)
+			self.events.append({
+				"name" : name,
+				"cat" : self.name,
+				"ph" : "X",
+				"ts" : ts,
+				"dur" : span.wall * 1000000,
+				"pid" : os.getpid(),
+				"tid" : 0,
+				"args" : args,
+			})
+			if self.counters:
+				self.events.append({
+					"name" : "counters",
+					"ph" : "C",
+					"ts" : self.timestamp(),
+					"pid" : os.getpid(),
+					"tid" : 0,
+					"args" : dict(self.counters),
+				})
+				
+	def hook_operators(self):
+	
+		# count operator calls by wrapping the call of the operator proxy class, if there is one
+		
+		module = sys.modules.get("bpy.ops")
+		cls = getattr(module, "BPyOpsSubModOp", None)
+		if cls is None or self.__operator_call is not None:
+			return
+			
+		tracer = self
+		call = self.__operator_call = cls.__call__
+		
+		def counted_call(*args, **kwargs):
+			tracer.count(OPERATORS)
+			return call(*args, **kwargs)
+			
+		cls.__call__ = counted_call
+		
+	def unhook_operators(self):
+		if self.__operator_call is None:
+			return
+		module = sys.modules.get("bpy.ops")
+		module.BPyOpsSubModOp.__call__ = self.__operator_call
+		self.__operator_call = None
+		
+	def stages(self):
+		l = []
+		for span in self.spans:
+			if span.depth:
+				continue
+			d = OrderedDict()
+			d["name"] = span.name
+			d["wall"] = round(span.wall, 3)
+			d["cpu"] = round(span.cpu, 3)
+			d.update(span.counters)
+			for k in ("py_alloc_delta", "py_alloc_peak", "rss_peak"):
+				if k in span.args:
+					d[k] = span.args[k]
+			l.append(d)
+		return l
+		
+	def summary(self):
+		lines = []
+		for d in self.stages():
+			out = d["name"]
+			for i in range(40 - len(out)):
+				out += "."
+			out += " wall " + str(d["wall"]) + "s cpu " + str(d["cpu"]) + "s"
+			for k, v in d.items():
+				if k in ("name", "wall", "cpu"):
+					continue
+				if k in ("py_alloc_delta", "py_alloc_peak", "rss_peak") and v is not None:
+					v = str(round(v / 1048576, 1)) + "MB"
+				out += " " + k + " " + str(v)
+			lines.append(out)
+		return lines
+		
+	def to_chrome(self):
+		return {
+			"traceEvents" : sorted(self.events, key=lambda e: e["ts"]),
+			"displayTimeUnit" : "ms",
+			"otherData" : {"name" : self.name, "stages" : self.stages(), "counters" : dict(self.counters)},
+		}
+		
+	def export(self, dir, name):
+		if not os.path.exists(dir):
+			os.makedirs(dir)
+		file_path = os.path.join(dir, name + EXTENSION)
+		with open(file_path, "w") as f:
+			json.dump(self.to_chrome(), f)
+		return file_path
+		
+class NullTracer:
+
+	# stands in for a Tracer when nothing is traced
+	
+	@contextmanager
+	def span(self, name, **args):
+		yield None
+		
+	def count(self, name, n=1):
+		pass
+		
+	def timed(self, *args):
+		return "".join(str(arg) for arg in args)
+		
\ No newline at end of file
@@ -0,0 +1,71 @@
+import math
+from . import data
+
+WORLD_SUFFIX = "_WORLD"
+
+LOAD_DISTANCE = 512.0
+UNLOAD_MARGIN = 128.0
+
+NAME = "name"
+TILES = "tiles"
+BOUNDS = "bounds"
+LIBRARY = "library"
+LOAD_DISTANCE_KEY = "load_distance"
+UNLOAD_DISTANCE_KEY = "unload_distance"
+
+def get_bounds(corners):
+
+	# xy bounds of the given corners as [min x, min y, max x, max y]
+	
+	x = [co[0] for co in corners]
+	y = [co[1] for co in corners]
+	return [min(x), min(y), max(x), max(y)]
+	
+def get_grid_corners(sections_data):
+
+	# corners of the whole section grid in the local space of the terrain
+	
+	x = 0.5 * sections_data[data.NUMBER][0] * sections_data[data.SIZE][0]
+	y = 0.5 * sections_data[data.NUMBER][1] * sections_data[data.SIZE][1]
+	return [(-x, -y, 0), (x, -y, 0), (x, y, 0), (-x, y, 0)]
+	
+def get_tile(name, bounds, library):
+	return {NAME : name, BOUNDS : list(bounds), LIBRARY : library}
+	
+def get_manifest(name, tiles, load_distance=LOAD_DISTANCE, unload_margin=UNLOAD_MARGIN):
+	return {
+		NAME : name,
+		LOAD_DISTANCE_KEY : load_distance,
+		UNLOAD_DISTANCE_KEY : load_distance + unload_margin,
+		TILES : tiles,
+	}
+	
+def get_distance(bounds, co):
+
+	# distance in xy from a point to the bounds, 0 inside
+	
+	dx = max(bounds[0] - co[0], 0, co[0] - bounds[2])
+	dy = max(bounds[1] - co[1], 0, co[1] - bounds[3])
+	return math.hypot(dx, dy)
+	
+def get_tiles_in_range(manifest, co, loaded=()):
+
+	# tiles to be loaded: within the load distance, or within the larger unload distance if already loaded
+	
+	l = []
+	for tile in manifest[TILES]:
+		distance = manifest[UNLOAD_DISTANCE_KEY] if tile[NAME] in loaded else manifest[LOAD_DISTANCE_KEY]
+		if get_distance(tile[BOUNDS], co) <= distance:
+			l.append(tile[NAME])
+	return l
+	
+def get_overlaps(manifest):
+	tiles = manifest[TILES]
+	l = []
+	for i, a in enumerate(tiles):
+		for b in tiles[i + 1:]:
+			ba, bb = a[BOUNDS], b[BOUNDS]
+			if ba[0] < bb[2] and bb[0] < ba[2] and ba[1] < bb[3] and bb[1] < ba[3]:
+				l.append((a[NAME], b[NAME]))
+	return l
+	
\ No newline at end of file
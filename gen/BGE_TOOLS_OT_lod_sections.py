@@ -2,15 +2,51 @@ from bge import types, logic
 from collections import OrderedDict
 from mathutils import Matrix, Vector
 from errno import ENOENT
-import pickle
+from array import array
+import threading
+import bisect
+import heapq
+import struct
+import time
+import random
+import json
+import lzma
+import math
+import mmap
+import zlib
 import os
+import bge_tools_lib_new
+
+try:
+	import lz4.frame
+except ImportError:
+	lz4 = None
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 ERR_MSG_PROPERTY_NOT_FOUND = "Sections property not found: "
 ERR_MSG_NAME_NOT_FOUND = "Sections object not found: "
+ERR_MSG_INVALID_FILE = "Not a sections data file: "
+ERR_MSG_UNSUPPORTED_VERSION = "Unsupported sections data version: "
+ERR_MSG_UNSUPPORTED_CODEC = "Unsupported codec: "
 
 LOD_SECTIONS_PROP_NAME = "BGE_TOOLS_LOD_SECTIONS"
 LOD_PROGRESS_PROP_NAME = "BGE_TOOLS_LOD_PROGRESS"
 LOD_SIZE_PROP_NAME = "BGE_TOOLS_LOD_SIZE"
+LOD_BUDGET_PROP_NAME = "BGE_TOOLS_LOD_BUDGET"
+LOD_QUEUE_PROP_NAME = "BGE_TOOLS_LOD_QUEUE"
+LOD_DRAIN_PROP_NAME = "BGE_TOOLS_LOD_DRAIN"
+LOD_INTERVAL_PROP_NAME = "BGE_TOOLS_LOD_INTERVAL"
+LOD_BIAS_PROP_NAME = "BGE_TOOLS_LOD_BIAS"
+LOD_PHYSICS_MARGIN_PROP_NAME = "BGE_TOOLS_LOD_PHYSICS_MARGIN"
+LOD_INSTANCES_MARGIN_PROP_NAME = "BGE_TOOLS_LOD_INSTANCES_MARGIN"
+LOD_POOL_SIZE_PROP_NAME = "BGE_TOOLS_LOD_POOL_SIZE"
+LOD_POOL_PROP_NAME = "BGE_TOOLS_LOD_POOL"
+LOD_POOL_HITS_PROP_NAME = "BGE_TOOLS_LOD_POOL_HITS"
+LOD_MESHES_PROP_NAME = "BGE_TOOLS_LOD_MESHES"
 
 LIB_NEW_ID_PROP_NAME = "LIB_NEW_ID"
 
@@ -19,7 +55,7 @@ TERRAIN_CHILD_PROP_NAME = "_TERRAIN_CHILD"
 SECT_SUFFIX = "_SECT"
 PHYSICS_SUFFIX = "_PHYS"
 LOD_SUFFIX = "_LOD"
-EXTENSION = ".txt"
+EXTENSION = ".bin"
 
 NAME = "NAME"
 SIZE = "SIZE"
@@ -27,23 +63,204 @@ NUMBER = "NUMBER"
 DIMENSIONS = "DIMENSIONS"
 LOD_SIZE = "LOD_SIZE"
 POINTS = "POINTS"
-INSTANCES = "INSTANCES"
-NORMALS = "NORMALS"
+PROPERTIES = "PROPERTIES"
+PVS = "PVS"
+SCATTER = "SCATTER"
+SCATTER_RESOLUTION = "SCATTER_RESOLUTION"
+STREAMING = "STREAMING"
+LAZY_NORMALS = "LAZY_NORMALS"
+LOD_DISTANCES = "LOD_DISTANCES"
+LOD_SELECTOR = "LOD_SELECTOR"
+
+STREAM_SUFFIX = "_STREAM"
+LIBRARY_EXTENSION = ".blend"
+LOAD_DISTANCE = "load_distance"
+UNLOAD_DISTANCE = "unload_distance"
+
+MAGIC = b"BGESECT\x00"
+VERSION = 2
+HEADER = struct.Struct("<8sHHIIQ")
+
+CODEC_NONE = "none"
+CODEC_ZLIB = "zlib"
+CODEC_LZMA = "lzma"
+CODEC_LZ4 = "lz4"
+CODECS = (CODEC_NONE, CODEC_ZLIB, CODEC_LZMA, CODEC_LZ4)
+ENTRY = struct.Struct("<BcHH2xQQ")
+
+NORMAL_KEYS = 0
+NORMAL_VALUES = 1
+TRANSFORMS = 2
+PROPERTY_IDS = 3
+NORMAL_INDEX_IDS = 4
+ARRAY_LENGTHS = 5
 
-CHUNK_SIZE_MAX = 512
-PART_SIZE_MAX = 32
+OCTAHEDRAL_SCALE = 32767.5
+
+FRAME_BUDGET = 4.0
+COST_FACTOR = 0.25
+LEAVE_MARGIN = 8.0
+POOL_SIZE_MAX = 64
+POOL_POSITION = (0.0, 0.0, -100000.0)
+
+PHYSICAL = "PHYSICAL"
+VISUAL = "VISUAL"
+DECODED_SIZE_MAX = 64
+READ_SIZE = 1 << 20
+
+class Loader(threading.Thread):
+
+	# reads the sections data and decodes its meta and index off the logic thread, the load state polls it
+	
+	def __init__(self, file_path):
+		super().__init__(daemon=True)
+		self.file_path = file_path
+		self.progress = 0.0
+		self.buffer = None
+		self.header = None
+		self.data = None
+		self.entries = None
+		self.error = None
+		
+	def get_decompressor(self, codec):
+		if codec == CODEC_ZLIB:
+			return zlib.decompressobj()
+		if codec == CODEC_LZMA:
+			return lzma.LZMADecompressor()
+		if codec == CODEC_LZ4 and lz4 is not None:
+			return lz4.frame.LZ4FrameDecompressor()
+		raise ValueError(ERR_MSG_UNSUPPORTED_CODEC + codec)
+		
+	def read(self):
+	
+		# uncompressed, the file is only mapped, sections read their own pages when they need them
+		# compressed, it is decompressed in steps into memory, at the uncompressed offsets of the index
+		
+		with open(self.file_path, "rb") as f:
+			header = f.read(HEADER.size)
+			self.header = magic, version, codec_id, meta_size, num_entries, body_size = HEADER.unpack(header)
+			if magic != MAGIC:
+				raise ValueError(ERR_MSG_INVALID_FILE + self.file_path)
+			if version != VERSION:
+				raise ValueError(ERR_MSG_UNSUPPORTED_VERSION + str(version))
+				
+			codec = CODECS[codec_id]
+			if codec == CODEC_NONE:
+				self.buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+			else:
+				decompressor = self.get_decompressor(codec)
+				size = os.fstat(f.fileno()).st_size - HEADER.size
+				buffer = bytearray(HEADER.size)
+				offset = 0
+				while offset < size:
+					b = f.read(READ_SIZE)
+					if not b:
+						break
+					buffer.extend(decompressor.decompress(b))
+					offset += len(b)
+					self.progress = offset / size
+				self.buffer = memoryview(buffer)
+			
+	def decode(self):
+	
+		# progress goes on with the entries of the index once the body is read, or from the start when it is mapped
+		
+		magic, version, codec_id, meta_size, num_entries, body_size = self.header
+		offset = HEADER.size
+		self.data = json.loads(bytes(self.buffer[offset:offset + meta_size]).decode(), object_pairs_hook=OrderedDict)
+		offset += meta_size
+		
+		self.entries = {}
+		for i in range(num_entries):
+			kind, typecode, owner_size, name_size, array_offset, count = ENTRY.unpack_from(self.buffer, offset)
+			offset += ENTRY.size
+			owner = bytes(self.buffer[offset:offset + owner_size]).decode()
+			offset += owner_size
+			name = bytes(self.buffer[offset:offset + name_size]).decode()
+			offset += name_size
+			self.entries[kind, owner, name] = typecode.decode(), array_offset, count
+			self.progress = max(self.progress, (i + 1) / num_entries)
+		self.progress = 1.0
+			
+	def run(self):
+		try:
+			self.read()
+			self.decode()
+		except Exception as e:
+			self.error = e
+			
+class Scheduler:
 
+	# resumes a generator, one item of work per yield, until the frame budget would be used up;
+	# the cost of an item is averaged over the items done so far, so a frame does as many as fit
+	
+	def __init__(self, budget):
+		self.budget = budget / 1000
+		self.cost = 0.0
+		
+	def run(self, generator):
+		start = t = time.perf_counter()
+		while True:
+			try:
+				next(generator)
+			except StopIteration:
+				return False
+			now = time.perf_counter()
+			self.cost += (now - t - self.cost) * COST_FACTOR
+			t = now
+			if now - start + self.cost > self.budget:
+				return True
+				
 class LODSections(types.KX_GameObject):
 	
 	__points_keys = None
 	__points_values = None
 	__normals = None
-	__chunks = None
+	__buffer = None
+	__entries = None
+	__loader = None
 	__parts = None
-	__num_chunks = None
-	__num_parts = None
+	__stage = None
+	__scheduler = None
+	__spawner = None
+	__queue = []
+	__tasks = {}
+	__spawned = {}
+	__count = 0
+	__ring = set()
+	__ring_radius = None
+	__cell = None
+	__lod_selector = False
+	__lod_thresholds = None
+	__lod_interval = 1
+	__lod_tan = 1.0
+	__lod_sections = None
+	__lod_centers = None
+	__lod_levels = None
+	__lod_tick = 0
+	__lod_levels_by_name = {}
+	__lod_factor = 1.0
+	__physics_distance = None
+	__instances_distance = None
+	__pool = {}
+	__pool_size = POOL_SIZE_MAX
+	__pool_hits = 0
+	__pool_misses = 0
+	__finished = set()
+	__lib_new = None
+	__edited = set()
+	__shown = {}
+	__decoded = OrderedDict()
 	__lod_size = None
-	__index = 0
+	__pvs = None
+	__pvs_id = None
+	__scatter = None
+	__properties = []
+	__properties_ids = {}
+	__scatter_resolution = None
+	__streaming = None
+	__loading = {}
+	__libraries = {}
 	
 	size = Vector().to_2d()
 	number = Vector().to_2d()
@@ -52,11 +269,14 @@ class LODSections(types.KX_GameObject):
 	instances = {}
 	
 	sections = []
-	visual_sections = []
-	physical_sections = []
-	num_lib_news = {}
+	visual_sections = set()
+	physical_sections = set()
 	
 	loading_progress = 0.0
+	queue_length = 0
+	drain_time = 0.0
+	pool_length = 0
+	pool_hit_rate = 0.0
 	
 	def __init__(self, own):
 		if LOD_SECTIONS_PROP_NAME not in self:
@@ -64,6 +284,33 @@ class LODSections(types.KX_GameObject):
 		if self[LOD_SECTIONS_PROP_NAME] not in self.scene.objectsInactive:
 			raise NameError(ERR_MSG_NAME_NOT_FOUND + self[LOD_SECTIONS_PROP_NAME])
 			
+		# own containers, the class level ones would be shared by the tiles of a world
+		
+		self.size = Vector().to_2d()
+		self.number = Vector().to_2d()
+		self.dimensions = Vector().to_2d()
+		self.points = OrderedDict()
+		self.instances = {}
+		self.sections = []
+		self.visual_sections = set()
+		self.physical_sections = set()
+		self.__properties = []
+		self.__properties_ids = {}
+		self.__edited = set()
+		self.__shown = {}
+		self.__decoded = OrderedDict()
+		self.__loading = {}
+		self.__libraries = {}
+		self.__queue = []
+		self.__tasks = {}
+		self.__spawned = {}
+		self.__ring = set()
+		self.__lod_levels_by_name = {}
+		self.__pool = {}
+		self.__finished = set()
+		self.__lib_new = bge_tools_lib_new.get_manager()
+		self.__pool_size = int(self.get(LOD_POOL_SIZE_PROP_NAME, POOL_SIZE_MAX))
+			
 		self.visible = False
 		sections_parent = self.scene.objectsInactive[self[LOD_SECTIONS_PROP_NAME]]
 		self.reinstancePhysicsMesh(sections_parent, sections_parent.meshes[0])
@@ -76,6 +323,15 @@ class LODSections(types.KX_GameObject):
 						m = self.worldTransform * ob.worldTransform
 						self.add_instance(o, m, {n : ob[n] for n in ob.getPropertyNames()})
 				ob.endObject()
+				
+		dir_path = logic.expandPath("//" + LOD_SECTIONS_PROP_NAME)
+		if not os.path.exists(dir_path):
+			raise FileNotFoundError(ENOENT, os.strerror(ENOENT), dir_path)
+			
+		self.__loader = Loader(os.path.join(dir_path, self.name + EXTENSION))
+		self.__loader.start()
+		self.__scheduler = Scheduler(self.get(LOD_BUDGET_PROP_NAME, FRAME_BUDGET))
+		self.__spawner = Scheduler(self.get(LOD_BUDGET_PROP_NAME, FRAME_BUDGET))
 		self.state = logic.KX_STATE2
 		
 	def __update_progress(self, fac=1, step=1, num_steps=1):
@@ -83,108 +339,597 @@ class LODSections(types.KX_GameObject):
 		
 	def load(self):
 		
-		def get_data():
-			dir_path = logic.expandPath("//" + LOD_SECTIONS_PROP_NAME)
-			if not os.path.exists(dir_path):
-				raise FileNotFoundError(ENOENT, os.strerror(ENOENT), dir_path)
-				
-			file_path = os.path.join(dir_path, self.name + EXTENSION)
-			with open(file_path, "rb") as f:
-				data = pickle.load(f)
-				
-			return data
-		
 		def get_chunks():
-			nl = []
-			l = []
-			i = 0
-			for ob_name, ob_normals in self.__normals.items():
-				num_ob_normals = len(ob_normals)
-				if i + num_ob_normals > CHUNK_SIZE_MAX:
-					nl.append(l.copy())
-					l.clear()
-					i = 0
-				else:
-					i += num_ob_normals
-				l.append(ob_name)
-			if len(l):
-				nl.append(l)
-			return nl
+		
+			# only the sections around the camera are edited before play, the others when they show
+			
+			id = self.get_point_id(co.xy)
+			sect_names = {prefix + i for i in self.get_neighbours(id)} if id is not None else set()
+			
+			return [ob_name for ob_name in self.__normals if ob_name.split(LOD_SUFFIX)[0] in sect_names]
 			
 		def get_parts():
-			nl = []
-			l = [n for n in self.__normals if LOD_SUFFIX not in n]
-			n = len(l)
-			i = 0
-			while i + PART_SIZE_MAX < n:
-				j = i + PART_SIZE_MAX
-				nl.append(l[i:j])
-				i = j
-			nl.append(l[i:n])
-			return nl
+		
+			# with lod, only the ring of sections around the camera is added, the others as the camera changes cells
+			
+			if self.__ring_radius is not None:
+				self.__cell = self.get_cell(co.xy)
+				self.__ring = self.get_ring(self.__cell)
+				return [prefix + id for id in self.__points_keys if prefix + id in self.__ring]
+			return [n for n in self.__normals if LOD_SUFFIX not in n]
+			
+		def get_instances():
+			
+			# float32 transforms, 12 per instance, and int32 indices into the properties table, as views of the file,
+			# located through the index but read only when a section needs them
 			
-		data = get_data()
+			instances = {}
+			for kind, sect_name, n in self.__entries:
+				if kind == TRANSFORMS:
+					if sect_name not in instances:
+						instances[sect_name] = {}
+					instances[sect_name][n] = [self.get_array(TRANSFORMS, sect_name, n), self.get_array(PROPERTY_IDS, sect_name, n)]
+			return instances
+			
+		def get_normals_counts():
+		
+			# number of normals per object, in the order they were written
+			
+			d = OrderedDict()
+			for (kind, owner, name), (typecode, offset, count) in sorted(self.__entries.items(), key=lambda e: e[1][1]):
+				if kind == NORMAL_KEYS:
+					d[owner] = count // 2
+			return d
+			
+		# the loader thread reads and decodes, this only waits for it
+		
+		if self.__loader.is_alive():
+			self.__update_progress(self.__loader.progress, 1, 3)
+			return
+		if self.__loader.error is not None:
+			raise self.__loader.error
+			
+		data = self.__loader.data
+		self.__buffer = self.__loader.buffer
+		self.__entries = self.__loader.entries
+		self.__loader = None
 		
 		self.size.xy = data[SIZE]
 		self.number.xy = data[NUMBER]
 		self.dimensions.xy = data[DIMENSIONS]
 		self.__lod_size = data[LOD_SIZE]
 		self.points = OrderedDict(data[POINTS])
-		self.instances = data[INSTANCES]
+		self.instances = get_instances()
+		self.__properties = data[PROPERTIES]
+		self.__properties_ids = {tuple(sorted(d.items())) : i for i, d in enumerate(self.__properties)}
 		
 		self.__points_keys = list(self.points.keys())
 		self.__points_values = list(self.points.values())
-		self.__normals = data[NORMALS]
-		self.__chunks = get_chunks()
-		self.__parts = get_parts()
-		self.__num_chunks = len(self.__chunks)
-		self.__num_parts = len(self.__parts)
+		self.__normals = get_normals_counts()
+		
+		prefix = self[LOD_SECTIONS_PROP_NAME] + SECT_SUFFIX
+		self.__pvs = {id : {prefix + i for i in l} for id, l in data.get(PVS, {}).items()}
+		self.__scatter = data.get(SCATTER, {})
+		self.__scatter_resolution = data.get(SCATTER_RESOLUTION, 0)
+		self.__streaming = data.get(STREAMING)
+		
+		# beyond the last lod distance sections are empty, the ring reaches the farthest cell whose center can be within it
+		
+		lod_distances = data.get(LOD_DISTANCES)
+		if lod_distances and not self.__streaming:
+			self.__ring_radius = math.ceil(lod_distances[-1] / min(self.size.x, self.size.y) + 0.5)
+		co = self.worldTransform.inverted() * self.scene.active_camera.worldPosition
+		
+		# sections keep their physics and instances until the camera is a margin beyond the distance at which they were added
+		
+		if lod_distances:
+			self.__physics_distance = lod_distances[min(1, len(lod_distances) - 1)] + self.get(LOD_PHYSICS_MARGIN_PROP_NAME, LEAVE_MARGIN)
+			self.__instances_distance = lod_distances[min(self.__lod_size, len(lod_distances) - 1)] + self.get(LOD_INSTANCES_MARGIN_PROP_NAME, LEAVE_MARGIN)
+		
+		# the runtime selects the lod levels when the bake left none to the engine, relative to the zoom of the camera at start
+		
+		if data.get(LOD_SELECTOR) and lod_distances:
+			self.__lod_selector = True
+			self.__lod_thresholds = lod_distances[1:]
+			self.__lod_interval = max(int(self.get(LOD_INTERVAL_PROP_NAME, 1)), 1)
+			self.__lod_tan = math.tan(math.radians(self.scene.active_camera.fov) / 2)
+			
+		# streamed sections are added as their library is loaded, their normals copied as they show;
+		# with lazy normals nothing is copied before play and the edit state is skipped
+		
+		chunks = get_chunks() if not self.__streaming and not data.get(LAZY_NORMALS) else []
+		self.__parts = get_parts() if not self.__streaming else []
 		self.__update_progress(1, 1, 3)
 		
-		self.state = logic.KX_STATE3
+		if chunks:
+			self.__stage = self.copy_normals(chunks)
+			self.state = logic.KX_STATE3
+		else:
+			self.__stage = self.add_sections(self.__parts)
+			self.state = logic.KX_STATE4
+			
+	def copy_normals(self, ob_names):
+		for i, ob_name in enumerate(ob_names):
+			self.copy_custom_normals(ob_name)
+			self.__update_progress((i + 1) / len(ob_names), 2, 3)
+			yield
+			
+	def add_sections(self, sect_names):
+		for i, sect_name in enumerate(sect_names):
+			self.add_section(sect_name)
+			self.__update_progress((i + 1) / len(sect_names), 3, 3)
+			yield
+			
+	# the edit and add states resume their stage within the frame budget until it is done
 		
 	def edit(self):
-		
-		def copy_custom_normals(l):
-			for ob_name in l:
-				ob_normals = self.__normals[ob_name]
-				ob = self.scene.objectsInactive[ob_name]
-				mesh = ob.meshes[0]
-				
-				for mat_id in range(mesh.numMaterials):
-					for vert_id in range(mesh.getVertexArrayLength(mat_id)):
-						vert = mesh.getVertex(mat_id, vert_id)
-						id = str([round(f) for f in vert.XYZ.xy])
-						if id in ob_normals:
-							vert.normal = ob_normals[id]
-							
-		if self.__index == self.__num_chunks:
-			self.__index = 0
+		if not self.__scheduler.run(self.__stage):
+			self.__stage = self.add_sections(self.__parts)
 			self.state = logic.KX_STATE4
-		else:
-			copy_custom_normals(self.__chunks[self.__index])
-			self.__index += 1
-			self.__update_progress(self.__index / self.__num_chunks, 2, 3)
 
 	def add(self):
+		if not self.__scheduler.run(self.__stage):
+			self.__stage = None
+			self.__parts = None
+			self.state = logic.KX_STATE5
 		
-		def add_section(l):
-			for ob_name in l:
-				inst = self.scene.addObject(ob_name)
-				inst.setParent(self, False, False)
-				inst.worldTransform = self.worldTransform * inst.worldTransform
-				self.sections.append(inst)
-				self.num_lib_news[ob_name] = {}
+	def add_section(self, ob_name):
+		inst = self.scene.addObject(ob_name)
+		inst.setParent(self, False, False)
+		inst.worldTransform = self.worldTransform * inst.worldTransform
+		self.sections.append(inst)
+		self.__pvs_id = None
+		self.__lod_centers = None
 				
-		if self.__index == self.__num_parts:
-			self.__index = 0
-			self.state = logic.KX_STATE5
+	def end_section(self, sect):
+	
+		# what was added for the section ends with it, its pooled physics proxy too as no other section can take it
+		
+		self.visual_sections.discard(sect)
+		self.physical_sections.discard(sect)
+		self.__tasks.pop((VISUAL, sect), None)
+		self.__tasks.pop((PHYSICAL, sect), None)
+		self.remove_instances(sect)
+		self.remove_physics(sect)
+		for ob in self.__pool.pop(sect + PHYSICS_SUFFIX, []):
+			ob.endObject()
+		ob = self.scene.objects[sect]
+		self.sections.remove(ob)
+		ob.endObject()
+		self.__shown.pop(sect, None)
+		self.__lod_levels_by_name.pop(sect, None)
+		self.__lod_centers = None
+		
+	def get_cell(self, co):
+		return math.floor(co[0] / self.size.x + 0.5 * self.number.x), math.floor(co[1] / self.size.y + 0.5 * self.number.y)
+		
+	def get_ring(self, cell):
+	
+		# cells without geometry were not baked into a section and are left out
+		
+		n_x = int(self.number.x)
+		n_y = int(self.number.y)
+		r = self.__ring_radius
+		prefix = self[LOD_SECTIONS_PROP_NAME] + SECT_SUFFIX
+		inactive = self.scene.objectsInactive
+		x, y = cell
+		ring = {prefix + self.__points_keys[j * n_x + i] for j in range(max(y - r, 0), min(y + r + 1, n_y)) for i in range(max(x - r, 0), min(x + r + 1, n_x))}
+		return {sect for sect in ring if sect in inactive}
+		
+	def update_ring(self):
+	
+		# sections are only added and ended as the camera changes cells
+		
+		if self.__ring_radius is None:
+			return
+			
+		co = self.worldTransform.inverted() * self.scene.active_camera.worldPosition
+		cell = self.get_cell(co.xy)
+		if cell == self.__cell:
+			return
+			
+		self.__cell = cell
+		ring = self.get_ring(cell)
+		for sect in self.__ring - ring:
+			self.end_section(sect)
+		for sect in ring - self.__ring:
+			self.add_section(sect)
+		self.__ring = ring
+		
+	def load_section(self, sect):
+		library = logic.expandPath("//" + LOD_SECTIONS_PROP_NAME + "/" + self.name + STREAM_SUFFIX + "/" + sect + LIBRARY_EXTENSION)
+		self.__loading[sect] = logic.LibLoad(library, "Scene", **{"async" : True})
+		
+	def free_section(self, sect):
+	
+		# the section ends before its library goes, the normals are copied again on the next load
+		
+		self.end_section(sect)
+		self.__edited = {n for n in self.__edited if n.split(LOD_SUFFIX)[0] != sect}
+		logic.LibFree(self.__libraries.pop(sect))
+		
+	def update_streaming(self):
+	
+		# within the load distance sections are loaded, beyond the larger unload distance freed
+		
+		if not self.__streaming:
+			return
+			
+		for sect, status in list(self.__loading.items()):
+			if status.finished:
+				del self.__loading[sect]
+				self.__libraries[sect] = status.libraryName
+				self.add_section(sect)
+				
+		co = self.worldTransform.inverted() * self.scene.active_camera.worldPosition
+		prefix = self[LOD_SECTIONS_PROP_NAME] + SECT_SUFFIX
+		for id, point in self.points.items():
+			sect = prefix + id
+			dx = max(abs(co.x - point[0]) - 0.5 * self.size.x, 0)
+			dy = max(abs(co.y - point[1]) - 0.5 * self.size.y, 0)
+			distance = math.hypot(dx, dy)
+			if sect in self.__libraries:
+				if distance > self.__streaming[UNLOAD_DISTANCE]:
+					self.free_section(sect)
+			elif sect not in self.__loading and distance <= self.__streaming[LOAD_DISTANCE]:
+				self.load_section(sect)
+			
+	def get_array(self, kind, owner, name=""):
+		typecode, offset, count = self.__entries[kind, owner, name]
+		return self.__buffer[offset:offset + struct.calcsize(typecode) * count].cast(typecode)
+		
+	def get_normal(self, values, i):
+		if values.format != "H":
+			return values[3 * i:3 * i + 3].tolist()
+		
+		# octahedral
+		
+		x = values[2 * i] / OCTAHEDRAL_SCALE - 1
+		y = values[2 * i + 1] / OCTAHEDRAL_SCALE - 1
+		z = 1 - abs(x) - abs(y)
+		if z < 0:
+			x, y = x - math.copysign(-z, x), y - math.copysign(-z, y)
+		f = 1 / math.sqrt(x * x + y * y + z * z)
+		return [x * f, y * f, z * f]
+			
+	def get_normals(self, ob_name):
+		keys = self.get_array(NORMAL_KEYS, ob_name)
+		values = self.get_array(NORMAL_VALUES, ob_name)
+		return {(keys[2 * i], keys[2 * i + 1]) : self.get_normal(values, i) for i in range(len(keys) // 2)}
+		
+	def copy_indexed_normals(self, ob_name, mesh):
+	
+		# only the vertices exported by index, each checked against its key; False if the vertex arrays are not as predicted,
+		# down to their lengths, as a vertex split more often than predicted would be left out
+		
+		if (ARRAY_LENGTHS, ob_name, "") not in self.__entries:
+			return False
+		keys = self.get_array(NORMAL_KEYS, ob_name)
+		values = self.get_array(NORMAL_VALUES, ob_name)
+		ids = self.get_array(NORMAL_INDEX_IDS, ob_name)
+		lengths = [mesh.getVertexArrayLength(mat_id) for mat_id in range(mesh.numMaterials)]
+		if not len(ids) or self.get_array(ARRAY_LENGTHS, ob_name).tolist() != lengths:
+			return False
+			
+		l = []
+		for i in range(0, len(ids), 3):
+			mat_id, vert_id, k = ids[i], ids[i + 1], ids[i + 2]
+			if mat_id >= len(lengths) or vert_id >= lengths[mat_id]:
+				return False
+			vert = mesh.getVertex(mat_id, vert_id)
+			if round(vert.XYZ.x) != keys[2 * k] or round(vert.XYZ.y) != keys[2 * k + 1]:
+				return False
+			l.append((vert, k))
+			
+		for vert, k in l:
+			vert.normal = self.get_normal(values, k)
+		return True
+			
+	def copy_custom_normals(self, ob_name):
+	
+		# the mesh is shared by every section showing it, so its normals are decoded and copied once
+		
+		ob = self.scene.objectsInactive[ob_name]
+		mesh = ob.meshes[0]
+		
+		if (NORMAL_INDEX_IDS, ob_name, "") in self.__entries and self.copy_indexed_normals(ob_name, mesh):
+			self.__edited.add(ob_name)
+			return
+			
+		# otherwise every vertex is looked up by its key
+		
+		ob_normals = self.get_normals(ob_name)
+		
+		for mat_id in range(mesh.numMaterials):
+			for vert_id in range(mesh.getVertexArrayLength(mat_id)):
+				vert = mesh.getVertex(mat_id, vert_id)
+				id = (round(vert.XYZ.x), round(vert.XYZ.y))
+				if id in ob_normals:
+					vert.normal = ob_normals[id]
+					
+		self.__edited.add(ob_name)
+		
+	def get_lod_name(self, sect, lod_level):
+	
+		# lod levels 0 and 1 show the section itself, the others its decimated copies
+		
+		if lod_level < 2:
+			return sect
+		return sect + LOD_SUFFIX + "_" + str(lod_level - 1)
+		
+	def get_lod_level(self, sect):
+		if self.__lod_selector:
+			return self.__lod_levels_by_name.get(sect.name, 0)
+		return sect.currentLodLevel
+		
+	def is_within(self, sect, distance):
+	
+		# the distance lod levels are selected by, scaled like the selector does
+		
+		return distance is not None and self.scene.active_camera.getDistanceTo(sect) * self.__lod_factor <= distance
+		
+	def update_lod(self):
+	
+		# levels of all sections at once from their distance to the camera, scaled by the bias and the zoom of the camera;
+		# only the sections whose level changed get their mesh replaced
+		
+		if not self.__lod_selector:
+			return
+			
+		self.__lod_tick += 1
+		if self.__lod_tick < self.__lod_interval and self.__lod_centers is not None:
+			return
+		self.__lod_tick = 0
+		
+		if self.__lod_centers is None:
+			self.__lod_sections = list(self.sections)
+			centers = [list(sect.worldPosition) for sect in self.__lod_sections]
+			levels = [self.__lod_levels_by_name.get(sect.name, 0) for sect in self.__lod_sections]
+			if numpy is not None:
+				self.__lod_centers = numpy.array(centers, dtype=numpy.float64).reshape(-1, 3)
+				self.__lod_levels = numpy.array(levels, dtype=numpy.int64)
+			else:
+				self.__lod_centers = [Vector(co) for co in centers]
+				self.__lod_levels = levels
+				
+		camera = self.scene.active_camera
+		self.__lod_factor = f = self.get(LOD_BIAS_PROP_NAME, 1.0) * math.tan(math.radians(camera.fov) / 2) / self.__lod_tan
+		
+		if numpy is not None:
+			d = numpy.sqrt(((self.__lod_centers - numpy.array(camera.worldPosition)) ** 2).sum(axis=1)) * f
+			levels = numpy.searchsorted(self.__lod_thresholds, d, side="right") + 1
+			changed = numpy.flatnonzero(levels != self.__lod_levels).tolist()
 		else:
-			add_section(self.__parts[self.__index])
-			self.__index += 1
-			self.__update_progress(self.__index / self.__num_parts, 3, 3)
+			levels = [bisect.bisect_right(self.__lod_thresholds, (co - camera.worldPosition).length * f) + 1 for co in self.__lod_centers]
+			changed = [i for i, lod_level in enumerate(levels) if lod_level != self.__lod_levels[i]]
+		self.__lod_levels = levels
+		
+		for i in changed:
+			sect = self.__lod_sections[i]
+			lod_level = int(levels[i])
+			mesh = self.scene.objectsInactive[self.get_lod_name(sect.name, lod_level)].meshes[0]
+			sect.replaceMesh(mesh, True, False)
+			self.__lod_levels_by_name[sect.name] = lod_level
 			
-	def update(self):
+	def get_neighbours(self, id):
+		n_x = int(self.number.x)
+		n_y = int(self.number.y)
+		i = self.__points_keys.index(id)
+		x = i % n_x
+		y = i // n_x
+		return [self.__points_keys[j * n_x + k] for j in range(max(y - 1, 0), min(y + 2, n_y)) for k in range(max(x - 1, 0), min(x + 2, n_x))]
+			
+	def get_point_id(self, co):
+		i = math.floor(co[0] / self.size.x + 0.5 * self.number.x)
+		j = math.floor(co[1] / self.size.y + 0.5 * self.number.y)
+		if 0 <= i < self.number.x and 0 <= j < self.number.y:
+			return self.__points_keys[int(j * self.number.x + i)]
+		return None
+		
+	def get_height(self, heights, point, x, y):
+		r = self.__scatter_resolution
+		u = min(max(((x - point[0]) / self.size.x + 0.5) * r, 0), r)
+		v = min(max(((y - point[1]) / self.size.y + 0.5) * r, 0), r)
+		i = min(int(u), r - 1)
+		j = min(int(v), r - 1)
+		u -= i
+		v -= j
+		n = r + 1
+		h0 = heights[j * n + i] * (1 - u) + heights[j * n + i + 1] * u
+		h1 = heights[(j + 1) * n + i] * (1 - u) + heights[(j + 1) * n + i + 1] * u
+		return h0 * (1 - v) + h1 * v
+		
+	def get_scatter_transforms(self, rule, heights, point):
+		
+		# same sequence of random numbers as the bake, so the same transforms on every run
+		
+		r = self.__scatter_resolution
+		rng = random.Random(rule["seed"])
+		cumulative = []
+		total = 0
+		for f in rule["density"]:
+			total += f
+			cumulative.append(total)
+			
+		def lerp(l):
+			return l[0] + (l[1] - l[0]) * rng.random()
+			
+		for k in range(rule["count"]):
+			f = rng.random() * total
+			i = 0
+			while i < len(cumulative) - 1 and cumulative[i] <= f:
+				i += 1
+			x = point[0] + self.size.x * ((i % r + rng.random()) / r - 0.5)
+			y = point[1] + self.size.y * ((i // r + rng.random()) / r - 0.5)
+			scale = lerp(rule["scale"])
+			yaw = lerp(rule["yaw"])
+			z = self.get_height(heights, point, x, y) + lerp(rule["offset"])
+			c = math.cos(yaw) * scale
+			s = math.sin(yaw) * scale
+			m = Matrix()
+			m[:] = [[c, -s, 0.0, x], [s, c, 0.0, y], [0.0, 0.0, scale, z], [0.0, 0.0, 0.0, 1.0]]
+			yield m
+			
+	def get_instances(self, sect):
+		
+		# records of the sections used last stay decoded, the others are decoded again when needed
+		
+		if sect in self.__decoded:
+			self.__decoded.move_to_end(sect)
+			return self.__decoded[sect]
+			
+		l = list(self.decode_instances(sect))
+		self.__decoded[sect] = l
+		if len(self.__decoded) > DECODED_SIZE_MAX:
+			self.__decoded.popitem(last=False)
+		return l
+		
+	def decode_instances(self, sect):
+		
+		# stored instances first, then the ones generated from scatter rules
+		
+		for n, (transforms, properties) in self.instances.get(sect, {}).items():
+			for k, p in enumerate(properties):
+				i = 12 * k
+				m = Matrix((transforms[i:i + 4], transforms[i + 4:i + 8], transforms[i + 8:i + 12], (0, 0, 0, 1)))
+				yield n, m, self.__properties[p]
+				
+		if sect in self.__scatter:
+			heights, rules = self.__scatter[sect]
+			point = self.points[sect.split(SECT_SUFFIX)[1]]
+			for rule in rules:
+				for m in self.get_scatter_transforms(rule, heights, point):
+					yield rule["name"], m, {}
+					
+	def update_visibility(self):
+	
+		# hide the sections outside the potentially visible set of the section the camera is in
+		
+		if not self.__pvs:
+			return
+			
+		co = self.worldTransform.inverted() * self.scene.active_camera.worldPosition
+		id = self.get_point_id(co.xy)
+		if id == self.__pvs_id:
+			return
+			
+		self.__pvs_id = id
+		visible = self.__pvs.get(id)
+		for sect in self.sections:
+			sect.visible = visible is None or sect.name in visible
+			
+	def update_normals(self):
+	
+		# normals of a lod level are copied the first time a section shows it,
+		# so only sections that became visible or changed level since the last frame are looked at
+		
+		for sect in self.sections:
+			if not sect.visible:
+				continue
+			lod_level = self.get_lod_level(sect)
+			if self.__shown.get(sect.name) == lod_level:
+				continue
+			self.__shown[sect.name] = lod_level
+			ob_name = self.get_lod_name(sect.name, lod_level)
+			if ob_name not in self.__edited and ob_name in self.__normals:
+				self.copy_custom_normals(ob_name)
+				
+	def queue(self, key, task):
+	
+		# a newer task for the same sections object replaces the one queued before, which is then skipped
+		
+		sect = self.scene.objects[key[1]]
+		distance = self.scene.active_camera.getDistanceTo(sect)
+		self.__tasks[key] = task
+		self.__count += 1
+		heapq.heappush(self.__queue, (distance, self.__count, key, task))
+		
+	def drain_queue(self):
+	
+		# the nearest task first, resumed one instance at a time
+		
+		while self.__queue:
+			distance, i, key, task = self.__queue[0]
+			if self.__tasks.get(key) is not task:
+				heapq.heappop(self.__queue)
+				continue
+			try:
+				next(task)
+			except StopIteration:
+				heapq.heappop(self.__queue)
+				del self.__tasks[key]
+				continue
+			yield
+			
+	def despawn(self, remove, sect):
+		remove(sect)
+		yield
+		
+	def despawn_instances(self, sect):
+	
+		# one instance at a time, like they were spawned
+		
+		l = self.__spawned.get((VISUAL, sect), [])
+		while l:
+			self.remove_instance(l.pop())
+			yield
+		if self.__spawned.get((VISUAL, sect)) is l:
+			del self.__spawned[VISUAL, sect]
+		
+	def take(self, name):
+	
+		# a suspended object of the same source, back where the source is, or None
+		
+		l = self.__pool.get(name)
+		if not l:
+			self.__pool_misses += 1
+			return None
+		self.__pool_hits += 1
+		ob = l.pop()
+		source = self.scene.objectsInactive[name]
+		ob.worldTransform = source.worldTransform
+		ob.restoreDynamics()
+		ob.setVisible(source.visible, True)
+		return ob
+		
+	def release(self, name, ob):
+	
+		# hidden, suspended and out of the way under the sections, or ended once the pool of its source is full
+		
+		l = self.__pool.setdefault(name, [])
+		if len(l) >= self.__pool_size:
+			ob.endObject()
+			return
+		ob.setParent(self, False, False)
+		ob.suspendDynamics()
+		ob.setVisible(False, True)
+		ob.worldPosition = POOL_POSITION
+		l.append(ob)
+		
+	def spawn_physics(self, sect):
+	
+		# what is left of an unfinished spawn goes first, a whole proxy with its children is reused at once
+		
+		self.remove_physics(sect)
+		inst = self.take(sect + PHYSICS_SUFFIX)
+		if inst is not None:
+			inst.removeParent()
+			self.__spawned[PHYSICAL, sect] = inst
+			self.__finished.add((PHYSICAL, sect))
+			return
+		inst = self.scene.addObject(sect + PHYSICS_SUFFIX)
+		self.__spawned[PHYSICAL, sect] = inst
+		yield
+		for n, m, properties in self.get_instances(sect):
+			if n + PHYSICS_SUFFIX not in self.scene.objectsInactive:
+				continue
+			o = self.scene.addObject(n + PHYSICS_SUFFIX)
+			o.setParent(inst, False, False)
+			o.worldTransform = self.worldTransform * m
+			yield
+		self.__finished.add((PHYSICAL, sect))
+			
+	def spawn_instances(self, sect):
 		
 		def get_group_parents(inst):
 			if inst.groupMembers is None:
@@ -195,82 +940,118 @@ class LODSections(types.KX_GameObject):
 					l.append(ob)
 			return l
 			
-		def get_id(o, suffix=".", num_digits=3):
-			s = suffix
-			d = str(o)
-			n = len(d)
-			if n < num_digits:
-				for i in range(num_digits - n):
-					s += "0"
-			s += d
-			return s
-			
-		physical_sections = [sect.name for sect in self.sections if sect.currentLodLevel == 1]
-		for sect in list(self.physical_sections):
-			if sect not in physical_sections:
-				self.physical_sections.remove(sect)
-				self.scene.objects[sect + PHYSICS_SUFFIX].endObject()
-				
-		for sect in physical_sections:
-			if sect not in self.physical_sections:
-				self.physical_sections.append(sect)
-				inst = self.scene.addObject(sect + PHYSICS_SUFFIX)
-				if sect not in self.instances:
-					continue
-				for n, nl in self.instances[sect].items():
-					if n + PHYSICS_SUFFIX not in self.scene.objectsInactive:
-						continue
-					for l in nl:
-						o = self.scene.addObject(n + PHYSICS_SUFFIX)
-						m = Matrix()
-						m[:] = l[0]
-						o.setParent(inst, False, False)
-						o.worldTransform = self.worldTransform * m
-						
-		visual_sections = [sect.name for sect in self.sections if sect.name in self.instances and 0 < sect.currentLodLevel <= self.__lod_size]
-		for sect in list(self.visual_sections):
-			if sect not in visual_sections:
-				self.visual_sections.remove(sect)
-				for inst in self.scene.objects[sect].children:
-					lib_new_name = None
-					if LIB_NEW_ID_PROP_NAME in inst:
-						sect_id = sect.split(SECT_SUFFIX)[1]
-						lib_new_id = inst[LIB_NEW_ID_PROP_NAME]
-						lib_new_name = SECT_SUFFIX + sect_id + lib_new_id
-					inst.endObject()
-					if lib_new_name is not None:
-						logic.LibFree(lib_new_name)
-				self.num_lib_news[sect].clear()
-				
-		for sect in visual_sections:
-			if sect not in self.visual_sections:
-				self.visual_sections.append(sect)
-				for n, nl in self.instances[sect].items():
-					for l in nl:
-						inst = self.scene.addObject(n)
-						inst.setParent(self.scene.objects[sect], True, False)
-						m = Matrix()
-						m[:] = l[0]
-						gpl = get_group_parents(inst)
-						if gpl is not None:
-							for gp in gpl:
-								gp.worldTransform = self.worldTransform * m
-						else:
-							inst.worldTransform = self.worldTransform * m
-						for k, v in l[1].items():
-							inst[k] = v
-						if LIB_NEW_ID_PROP_NAME in inst:
-							lib_new_id = inst[LIB_NEW_ID_PROP_NAME]
-							if not lib_new_id:
-								d = self.num_lib_news[sect]
-								if n not in d:
-									d[n] = 0
-								inst[LIB_NEW_ID_PROP_NAME] = lib_new_id = n + get_id(d[n])
-								d[n] += 1
-							sect_id = sect.split(SECT_SUFFIX)[1]
-							lib_new_name = SECT_SUFFIX + sect_id + lib_new_id
-							new_mesh = logic.LibNew(lib_new_name, "Mesh", [inst.meshes[0].name])[0]
-							inst.replaceMesh(new_mesh, True, True)
+		self.remove_instances(sect)
+		l = self.__spawned[VISUAL, sect] = []
+		for n, m, properties in self.get_instances(sect):
+			inst = self.take(n)
+			if inst is None:
+				inst = self.scene.addObject(n)
+			l.append(inst)
+			inst.setParent(self.scene.objects[sect], True, False)
+			gpl = get_group_parents(inst)
+			if gpl is not None:
+				for gp in gpl:
+					gp.worldTransform = self.worldTransform * m
+			else:
+				inst.worldTransform = self.worldTransform * m
+			for k, v in properties.items():
+				inst[k] = v
+			if LIB_NEW_ID_PROP_NAME in inst:
+				inst[LIB_NEW_ID_PROP_NAME], new_mesh = self.__lib_new.get_mesh(inst)
+				inst.replaceMesh(new_mesh, True, True)
+			yield
+			
+	def update_queue(self):
+		start = time.perf_counter()
+		self.__spawner.run(self.drain_queue())
+		self[LOD_DRAIN_PROP_NAME] = self.drain_time = (time.perf_counter() - start) * 1000
+		self[LOD_QUEUE_PROP_NAME] = self.queue_length = len(self.__tasks)
+		self[LOD_POOL_PROP_NAME] = self.pool_length = sum(len(l) for l in self.__pool.values())
+		self[LOD_POOL_HITS_PROP_NAME] = self.pool_hit_rate = self.__pool_hits / max(self.__pool_hits + self.__pool_misses, 1)
+		self.__lib_new.collect()
+		self[LOD_MESHES_PROP_NAME] = self.__lib_new.get_live_count()
+		
+	def update(self):
+		self.update_streaming()
+		self.update_ring()
+		self.update_lod()
+		self.update_visibility()
+		self.update_normals()
+		
+		# sections changing state only queue their spawn or despawn, the queue is drained within the frame budget
+		
+		physical_sections = {sect.name for sect in self.sections if self.get_lod_level(sect) == 1 or (sect.name in self.physical_sections and self.is_within(sect, self.__physics_distance))}
+		for sect in self.physical_sections - physical_sections:
+			self.queue((PHYSICAL, sect), self.despawn(self.remove_physics, sect))
+		for sect in physical_sections - self.physical_sections:
+			self.queue((PHYSICAL, sect), self.spawn_physics(sect))
+		self.physical_sections = physical_sections
+		
+		visual_sections = {sect.name for sect in self.sections if (sect.name in self.instances or sect.name in self.__scatter) and sect.visible and (0 < self.get_lod_level(sect) <= self.__lod_size or (sect.name in self.visual_sections and self.is_within(sect, self.__instances_distance)))}
+		for sect in self.visual_sections - visual_sections:
+			self.queue((VISUAL, sect), self.despawn_instances(sect))
+		for sect in visual_sections - self.visual_sections:
+			self.queue((VISUAL, sect), self.spawn_instances(sect))
+		self.visual_sections = visual_sections
+		
+		self.update_queue()
+		
+	def remove_physics(self, sect):
+	
+		# only a proxy with all its children goes to the pool
+		
+		inst = self.__spawned.pop((PHYSICAL, sect), None)
+		if inst is None:
+			return
+		if (PHYSICAL, sect) in self.__finished:
+			self.__finished.discard((PHYSICAL, sect))
+			self.release(sect + PHYSICS_SUFFIX, inst)
+		else:
+			inst.endObject()
+							
+	def remove_instance(self, inst):
+	
+		# instances with group members are not pooled, those with a mesh of their own give it back to the mesh pool
+		
+		if LIB_NEW_ID_PROP_NAME in inst:
+			lib_name = inst[LIB_NEW_ID_PROP_NAME]
+			inst.endObject()
+			self.__lib_new.release(lib_name)
+		elif inst.groupMembers is not None:
+			inst.endObject()
+		else:
+			self.release(inst.name, inst)
+			
+	def remove_instances(self, sect):
+		for inst in self.__spawned.pop((VISUAL, sect), []):
+			self.remove_instance(inst)
+		
+	def end(self):
+		
+		# ends everything added for the sections, before the library they were loaded from is freed
+		
+		for kind, sect in list(self.__spawned):
+			if kind == PHYSICAL:
+				self.remove_physics(sect)
+			else:
+				self.remove_instances(sect)
+		for l in self.__pool.values():
+			for ob in l:
+				ob.endObject()
+		for sect in self.sections:
+			sect.endObject()
+		for library in self.__libraries.values():
+			logic.LibFree(library)
+		self.visual_sections.clear()
+		self.physical_sections.clear()
+		self.sections.clear()
+		self.__ring.clear()
+		self.__queue.clear()
+		self.__tasks.clear()
+		self.__pool.clear()
+		self.__finished.clear()
+		self.__libraries.clear()
+		self.endObject()
 							
 	def add_instance(self, ob, transform, properties={}):
 		
@@ -295,8 +1076,18 @@ class LODSections(types.KX_GameObject):
 		d = self.instances[sect_name]
 		inst_name = ob.name
 		if inst_name not in d:
-			d[inst_name] = []
-		d[inst_name].append([[list(v) for v in transform.row], properties])
+			d[inst_name] = [array("f"), array("i")]
+		elif not isinstance(d[inst_name][0], array):
+			d[inst_name] = [array("f", d[inst_name][0]), array("i", d[inst_name][1])]
+		key = tuple(sorted(properties.items()))
+		if key not in self.__properties_ids:
+			self.__properties_ids[key] = len(self.__properties)
+			self.__properties.append(properties)
+		transforms, l = d[inst_name]
+		self.__decoded.pop(sect_name, None)
+		for i in range(3):
+			transforms.extend(transform.row[i])
+		l.append(self.__properties_ids[key])
 		
 def init(cont):
 	LODSections(cont.owner)
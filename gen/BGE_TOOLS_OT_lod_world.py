@@ -0,0 +1,96 @@
+from bge import types, logic
+from errno import ENOENT
+import json
+import math
+import os
+
+ERR_MSG_PROPERTY_NOT_FOUND = "World property not found: "
+
+LOD_WORLD_PROP_NAME = "BGE_TOOLS_LOD_WORLD"
+LOD_SECTIONS_PROP_NAME = "BGE_TOOLS_LOD_SECTIONS"
+
+WORLD_SUFFIX = "_WORLD"
+EXTENSION = ".json"
+
+NAME = "name"
+TILES = "tiles"
+BOUNDS = "bounds"
+LIBRARY = "library"
+LOAD_DISTANCE = "load_distance"
+UNLOAD_DISTANCE = "unload_distance"
+
+class LODWorld(types.KX_GameObject):
+
+	manifest = None
+	tiles = {}
+	loading = {}
+	loaded = {}
+	
+	def __init__(self, own):
+		if LOD_WORLD_PROP_NAME not in self:
+			raise KeyError(ERR_MSG_PROPERTY_NOT_FOUND + LOD_WORLD_PROP_NAME)
+			
+		dir_path = logic.expandPath("//" + LOD_SECTIONS_PROP_NAME)
+		file_path = os.path.join(dir_path, self.name + WORLD_SUFFIX + EXTENSION)
+		if not os.path.exists(file_path):
+			raise FileNotFoundError(ENOENT, os.strerror(ENOENT), file_path)
+			
+		with open(file_path, "r") as f:
+			self.manifest = json.load(f)
+			
+		self.tiles = {tile[NAME] : tile for tile in self.manifest[TILES]}
+		self.loading = {}
+		self.loaded = {}
+		self.state = logic.KX_STATE2
+		
+	def get_tiles_in_range(self, co):
+	
+		# within the load distance, or within the larger unload distance if already loaded
+		
+		l = []
+		for name, tile in self.tiles.items():
+			distance = self.manifest[UNLOAD_DISTANCE] if name in self.loaded else self.manifest[LOAD_DISTANCE]
+			b = tile[BOUNDS]
+			dx = max(b[0] - co[0], 0, co[0] - b[2])
+			dy = max(b[1] - co[1], 0, co[1] - b[3])
+			if math.hypot(dx, dy) <= distance:
+				l.append(name)
+		return l
+		
+	def load_tile(self, name):
+		library = logic.expandPath(self.tiles[name][LIBRARY])
+		self.loading[name] = logic.LibLoad(library, "Scene", **{"async" : True})
+		
+	def free_tile(self, name):
+	
+		# the sections of the tile end what they added themselves, then the library goes
+		
+		ob = self.scene.objects.get(name)
+		if ob is not None and hasattr(ob, "end"):
+			ob.end()
+		logic.LibFree(self.loaded.pop(name))
+		
+	def update(self):
+		for name, status in list(self.loading.items()):
+			if status.finished:
+				del self.loading[name]
+				self.loaded[name] = status.libraryName
+				
+		names = self.get_tiles_in_range(self.scene.active_camera.worldPosition)
+		
+		# tiles still loading are freed once they are done
+		
+		for name in list(self.loaded):
+			if name not in names:
+				self.free_tile(name)
+				
+		for name in names:
+			if name not in self.loaded and name not in self.loading:
+				self.load_tile(name)
+				
+def init(cont):
+	LODWorld(cont.owner)
+	
+def update(cont):
+	cont.owner.update()
+	
\ No newline at end of file
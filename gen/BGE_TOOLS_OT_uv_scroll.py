@@ -1,5 +1,6 @@
 from bge import logic
 from mathutils import Vector, Matrix
+import bge_tools_lib_new
 
 ERR_MSG_SEQUENCE_EMPTY = "UV Scroll Sequence is empty"
 ERR_MSG_SEQUENCE_INVALID = "UV Scroll Sequence is not valid at: "
@@ -10,7 +11,7 @@ class UVScroll:
 	def __init__(self, cont):
 		
 		# expose a reference to the owner
-		# get the mesh; create a new mesh with an indexed name if not in an active layer
+		# get the mesh; take a copy from the shared mesh pool if not in an active layer, scrolled back to the first sprite when given back
 		# store material id; if the identifier is not found, all materials on the mesh will be affected
 		# expose sprite count, size
 		# expose sequence as an array of valid id's
@@ -30,7 +31,6 @@ class UVScroll:
 		PROP_NAME_LINKED = "LINKED"
 		
 		MAT_IDENTIFIER = "_UVScroll_"
-		LIBS_INDEX_LENGTH = 3
 		
 		def get_sprite_data(self):
 			sprite_count = [self.own[PROP_NAME_SPRITES_X], self.own[PROP_NAME_SPRITES_Y]]
@@ -47,25 +47,12 @@ class UVScroll:
 			pingpong = self.own[PROP_NAME_PINGPONG]
 			return sequence, loop, pingpong
 		
-		def get_id(i, prefix=".", length=LIBS_INDEX_LENGTH):
-			dgts = str(i)
-			max_length = len(dgts)
-			num_zeros = max(length, max_length) - max_length
-			return prefix + num_zeros * "0" + dgts
-			
 		def get_mesh(obj):
 			mesh = obj.meshes[0]
 			if obj.name not in obj.scene.objectsInactive and obj[PROP_NAME_LINKED]:
 				return mesh
-			if not hasattr(logic, "libnews"):
-				logic.libnews = {}
-			mesh_name = mesh.name
-			if mesh_name not in logic.libnews:
-				logic.libnews[mesh_name] = 0
-			id = get_id(logic.libnews[mesh_name])
-			new_mesh = logic.LibNew((mesh_name + id), "Mesh", [mesh_name])[0]
+			lib_name, new_mesh = bge_tools_lib_new.get_manager().get_mesh(obj, reset=self.unscroll)
 			obj.replaceMesh(new_mesh)
-			logic.libnews[mesh_name] += 1
 			return new_mesh
 			
 		def get_mat_id(mesh, identifier=MAT_IDENTIFIER):
@@ -154,6 +141,14 @@ class UVScroll:
 		self.own.meshes[0].transformUV(self.__mat_id, offset, 0)
 		self.__id = id
 		
+	def unscroll(self, mesh):
+	
+		# back to the first sprite, as a new copy would be
+		
+		offset = Matrix.Translation(self.sprite_coords[0] - self.sprite_coords[self.__id])
+		mesh.transformUV(self.__mat_id, offset, 0)
+		self.__id = 0
+		
 	def scroll_sequence(self, seq_id):
 		
 		# if for any reason the sequence is empty, do nothing
@@ -200,6 +195,7 @@ def update(cont):
 	if not cont.sensors[0].positive:
 		return
 	own = cont.owner
+	bge_tools_lib_new.get_manager().collect()
 	if "uv_scroll" not in own:
 		own["uv_scroll"] = UVScroll(cont)
 	own["uv_scroll"].update()
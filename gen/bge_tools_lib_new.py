@@ -0,0 +1,84 @@
+from bge import logic
+import time
+
+IDLE_SIZE_MAX = 16
+COLLECT_INTERVAL = 0.5
+INDEX_LENGTH = 3
+
+class LibNewManager:
+
+	# unique copies of meshes made with LibNew, shared by the runtime scripts:
+	# a copy belongs to its owner until released or until the owner ends, then waits in the pool of its source for the next owner,
+	# beyond the idle limit of a source it is freed
+	
+	def __init__(self, idle_size=IDLE_SIZE_MAX):
+		self.idle_size = idle_size
+		self.idle = {}
+		self.owners = {}
+		self.counts = {}
+		self.collected = 0.0
+		
+	def get_id(self, i, prefix=".", length=INDEX_LENGTH):
+		dgts = str(i)
+		return prefix + max(length - len(dgts), 0) * "0" + dgts
+		
+	def get_mesh(self, owner, source_name=None, reset=None):
+	
+		# reset: called with the copy when it is released, to leave it as the next owner expects it
+		# returns the library name of the copy, to release it with, and the copy;
+		# a copy keeps the name of its source, only its library name is unique
+		
+		if source_name is None:
+			source_name = owner.meshes[0].name
+		l = self.idle.get(source_name)
+		if l:
+			lib_name, mesh = l.pop()
+		else:
+			i = self.counts.get(source_name, 0)
+			self.counts[source_name] = i + 1
+			lib_name = source_name + self.get_id(i)
+			mesh = logic.LibNew(lib_name, "Mesh", [source_name])[0]
+		self.owners[lib_name] = owner, source_name, mesh, reset
+		return lib_name, mesh
+		
+	def release(self, lib_name):
+		if lib_name not in self.owners:
+			return
+		owner, source_name, mesh, reset = self.owners.pop(lib_name)
+		if reset is not None:
+			reset(mesh)
+		l = self.idle.setdefault(source_name, [])
+		if len(l) < self.idle_size:
+			l.append((lib_name, mesh))
+		else:
+			logic.LibFree(lib_name)
+			
+	def collect(self):
+	
+		# copies of owners that ended are released, at most every COLLECT_INTERVAL seconds however many scripts ask
+		
+		t = time.monotonic()
+		if t - self.collected < COLLECT_INTERVAL:
+			return
+		self.collected = t
+		for lib_name, (owner, source_name, mesh, reset) in list(self.owners.items()):
+			if owner.invalid:
+				self.release(lib_name)
+				
+	def free(self):
+		for l in self.idle.values():
+			for lib_name, mesh in l:
+				logic.LibFree(lib_name)
+		self.idle.clear()
+		
+	def get_live_count(self):
+		return len(self.owners)
+		
+	def get_idle_count(self):
+		return sum(len(l) for l in self.idle.values())
+		
+def get_manager():
+	if not hasattr(logic, "lib_new_manager"):
+		logic.lib_new_manager = LibNewManager()
+	return logic.lib_new_manager
+	
@@ -1,7 +1,8 @@
 from . import (
 	uv_scroll,
 	uv_transform,
-	lod_sections
+	lod_sections,
+	lod_world
 )
 
-modules = [uv_scroll, uv_transform, lod_sections]
+modules = [uv_scroll, uv_transform, lod_sections, lod_world]
@@ -0,0 +1,97 @@
+import bpy
+from collections import OrderedDict
+
+COLLECTIONS = ("objects", "meshes", "materials")
+SINGULAR = {"objects" : "object", "meshes" : "mesh", "materials" : "material"}
+
+class Registry:
+
+	# records every object, mesh and material created while active, by pointer
+	# on exit everything that was not kept is removed; on error everything that was created is removed
+	
+	def __init__(self, collections=COLLECTIONS):
+		self.collections = collections
+		self.existing = set()
+		self.created = OrderedDict()
+		self.kept = set()
+		self.leaked = []
+		self.orphaned = []
+		
+	def __enter__(self):
+		self.existing.clear()
+		self.created.clear()
+		self.kept.clear()
+		for c in self.collections:
+			self.existing.update(id.as_pointer() for id in getattr(bpy.data, c))
+		return self
+		
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.cleanup(exc_type is not None)
+		return False
+		
+	def get_ids(self, c):
+		return {id.as_pointer(): id for id in getattr(bpy.data, c)}
+		
+	def collect(self):
+		for c in self.collections:
+			for ptr, id in self.get_ids(c).items():
+				if ptr not in self.existing and ptr not in self.created:
+					self.created[ptr] = (c, id.name)
+					
+	def keep(self, *objects):
+		for ob in objects:
+			self.kept.add(ob.as_pointer())
+			if isinstance(ob, bpy.types.Object) and ob.data is not None:
+				self.kept.add(ob.data.as_pointer())
+			me = ob.data if isinstance(ob, bpy.types.Object) else ob
+			if isinstance(me, bpy.types.Mesh):
+				self.kept.update(mat.as_pointer() for mat in me.materials if mat is not None)
+				
+	def keep_recursive(self, ob):
+		self.keep(ob)
+		for child in ob.children:
+			self.keep_recursive(child)
+			
+	def cleanup(self, failed=False):
+	
+		# objects first, so their data loses its users; then data without users, or all created data on failure
+		
+		self.collect()
+		
+		objects = self.get_ids("objects")
+		for ptr, (c, name) in self.created.items():
+			if c != "objects" or ptr not in objects:
+				continue
+			if failed or ptr not in self.kept:
+				bpy.data.objects.remove(objects[ptr], do_unlink=True)
+				
+		for c in self.collections:
+			if c == "objects":
+				continue
+			ids = self.get_ids(c)
+			for ptr, (cc, name) in self.created.items():
+				if cc != c or ptr not in ids:
+					continue
+				if failed or (ptr not in self.kept and not ids[ptr].users):
+					getattr(bpy.data, c).remove(ids[ptr], do_unlink=True)
+					
+		self.leaked.clear()
+		self.orphaned.clear()
+		for c in self.collections:
+			ids = self.get_ids(c)
+			for ptr, (cc, name) in self.created.items():
+				if cc != c or ptr not in ids:
+					continue
+				if ptr not in self.kept:
+					self.leaked.append((c, ids[ptr].name))
+				elif not ids[ptr].users:
+					self.orphaned.append((c, ids[ptr].name))
+					
+	def report(self):
+		lines = []
+		for c, name in self.leaked:
+			lines.append("leaked " + SINGULAR[c] + ": " + name)
+		for c, name in self.orphaned:
+			lines.append("orphaned " + SINGULAR[c] + ": " + name)
+		return lines
+		
\ No newline at end of file
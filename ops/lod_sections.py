@@ -1,7 +1,9 @@
-import bpy, bmesh, math
+import bpy, bmesh, math, numpy, os, shutil
 from mathutils import Vector
 from collections import OrderedDict
 from . import utils as ut
+from . import datablocks
+from ..core import trace, grid, estimate, data, pvs, scatter
 
 ERR_MSG_SELECTED_NO_MESH_DATA = "Selected object(s) not containing mesh data"
 ERR_MSG_ACTIVE_NO_MESH_DATA = "Active object not containing mesh data"
@@ -9,6 +11,9 @@ ERR_MSG_SELECTED_INACTIVE_LAYER = "Selected object(s) not in active layer"
 ERR_MSG_ACTIVE_INACTIVE_LAYER = "Active object not in active layer"
 ERR_MSG_NO_ACTIVE_OR_SELECTED = "No active or selected object"
 ERR_MSG_OBJECT_NOT_FOUND = "Object not found"
+ERR_MSG_NO_FACES = "No faces to divide into sections"
+
+WARN_MSG_AUTO_SIZE_BUDGET = "Auto size: budget of {} triangles per section not met at the smallest size {}"
 
 PREF = "_"
 PART = "_PART"
@@ -20,23 +25,97 @@ PHYS = "_PHYS"
 NUMB = ".000"
 BOUNDS = "_BOUNDS"
 
-SIZE = "SIZE"
-NUMBER = "NUMBER"
-DIMENSIONS = "DIMENSIONS"
-LOD_SIZE = "LOD_SIZE"
-POINTS = "POINTS"
-INSTANCES = "INSTANCES"
-NORMALS = "NORMALS"
-
 TERRAIN_CHILD_PROP = "_TERRAIN_CHILD"
 SECT_PROP = "BGE_TOOLS_LOD_SECTIONS"
 PROG_PROP = "BGE_TOOLS_LOD_PROGRESS"
+BUDG_PROP = "BGE_TOOLS_LOD_BUDGET"
+QUEU_PROP = "BGE_TOOLS_LOD_QUEUE"
+DRAI_PROP = "BGE_TOOLS_LOD_DRAIN"
+INTV_PROP = "BGE_TOOLS_LOD_INTERVAL"
+BIAS_PROP = "BGE_TOOLS_LOD_BIAS"
+PMAR_PROP = "BGE_TOOLS_LOD_PHYSICS_MARGIN"
+IMAR_PROP = "BGE_TOOLS_LOD_INSTANCES_MARGIN"
+PSIZ_PROP = "BGE_TOOLS_LOD_POOL_SIZE"
+POOL_PROP = "BGE_TOOLS_LOD_POOL"
+HITS_PROP = "BGE_TOOLS_LOD_POOL_HITS"
+MESH_PROP = "BGE_TOOLS_LOD_MESHES"
 
 TOOL_NAME = "bge_tools_lod_sections"
+REPORT = "_REPORT"
 
 PHYS_COLLAPSE_RATIO = 0.25
 REMOVE_DOUBLES_THRESHOLD = 0.0001
+FRAME_BUDGET = 4.0
+LEAVE_MARGIN = 8.0
+POOL_SIZE_MAX = 64
 
+def get_selected_and_children(active_object, selected_objects):
+	selected_and_children = set()
+	selected_and_children.update(selected_objects)
+	selected_and_children.discard(active_object)
+	selected_and_children.difference_update(active_object.children)
+	for child in active_object.children:
+		if TERRAIN_CHILD_PROP in child.game.properties:
+			selected_and_children.add(child)
+			selected_and_children.union(ut.get_children_recursive(child))
+	return selected_and_children
+	
+def get_estimate_data(scene, active_object, objects):
+	
+	# triangle centers and counts, instance locations, in the local space of the active object
+	
+	matrix_inv = active_object.matrix_world.inverted()
+	centers = []
+	triangles = []
+	instances = []
+	bb_min = Vector((math.inf, math.inf))
+	bb_max = Vector((-math.inf, -math.inf))
+	
+	def add_triangles(co, n):
+		centers.append(co.xy)
+		triangles.append(n)
+		
+	for ob in objects:
+		
+		pl = ut.get_dupli_parents(ob)
+		if pl:
+			co = (matrix_inv * ob.matrix_world).translation
+			instances.extend(co.xy for p in pl)
+			continue
+			
+		m = matrix_inv * ob.matrix_world
+		me = ob.to_mesh(scene, True, "RENDER")
+		for v in me.vertices:
+			co = m * v.co
+			bb_min.x = min(bb_min.x, co.x)
+			bb_min.y = min(bb_min.y, co.y)
+			bb_max.x = max(bb_max.x, co.x)
+			bb_max.y = max(bb_max.y, co.y)
+		for poly in me.polygons:
+			add_triangles(m * poly.center, len(poly.vertices) - 2)
+		bpy.data.meshes.remove(me)
+		
+		for mod in ob.modifiers:
+			if mod.type != "PARTICLE_SYSTEM" or not mod.show_render:
+				continue
+			settings = mod.particle_system.settings
+			dupli_object = settings.dupli_object
+			if not dupli_object or not isinstance(dupli_object.data, bpy.types.Mesh):
+				continue
+			n = sum(len(poly.vertices) - 2 for poly in dupli_object.data.polygons)
+			for particle in mod.particle_system.particles:
+				if particle.alive_state != "ALIVE":
+					continue
+				co = matrix_inv * particle.location
+				if dupli_object.lod_levels:
+					instances.append(co.xy)
+				else:
+					add_triangles(co, n)
+					
+	dimensions = bb_max - bb_min if centers else Vector().to_2d()
+	
+	return numpy.array(centers).reshape(-1, 2), numpy.array(triangles), numpy.array(instances).reshape(-1, 2), dimensions
+	
 class LODSections(bpy.types.Operator):
 	
 	bl_description = "Generates sections with level of detail"
@@ -88,6 +167,22 @@ class LODSections(bpy.types.Operator):
 		description="Mode for numbering",
 		default="use_even_numbers"
 	)
+	prop_use_auto_size = bpy.props.BoolProperty(
+		name="Auto Size",
+		description="Pick the section size by a target number of triangles per section",
+		default=False
+	)
+	prop_auto_size_budget = bpy.props.IntProperty(
+		name="",
+		description="Target number of triangles per section",
+		default=20000,
+		min=1
+	)
+	prop_estimate = bpy.props.BoolProperty(
+		name="Estimate",
+		description="Only estimate the cost of generating the sections",
+		default=False
+	)
 	prop_use_decimate_dissolve = bpy.props.BoolProperty(
 		name="Decimate Dissolve",
 		description="Apply planar decimation",
@@ -141,11 +236,122 @@ class LODSections(bpy.types.Operator):
 		soft_max=1.0,
 		subtype="FACTOR"
 	)
+	prop_use_lod_selector = bpy.props.BoolProperty(
+		name="Runtime Selection",
+		description="Select lod levels of all sections at once in the runtime instead of per object in the engine",
+		default=False
+	)
+	prop_lod_interval = bpy.props.IntProperty(
+		name="Interval",
+		description="Logic ticks between two lod selections",
+		default=1,
+		min=1,
+		soft_max=30
+	)
+	prop_lod_bias = bpy.props.FloatProperty(
+		name="Bias",
+		description="Factor on the distance of sections to the camera, above 1 coarser and below 1 finer lod levels",
+		default=1.0,
+		min=0.01,
+		soft_max=4.0
+	)
 	prop_lod_use_physics = bpy.props.BoolProperty(
 		name="Physics",
 		description="Use physics",
 		default=True
 	)
+	prop_physics_margin = bpy.props.FloatProperty(
+		name="Physics Margin",
+		description="Distance beyond the first lod distance at which the physics of a section ends",
+		default=LEAVE_MARGIN,
+		min=0,
+		subtype="DISTANCE"
+	)
+	prop_instances_margin = bpy.props.FloatProperty(
+		name="Instances Margin",
+		description="Distance beyond the last lod distance at which the instances of a section end",
+		default=LEAVE_MARGIN,
+		min=0,
+		subtype="DISTANCE"
+	)
+	prop_use_pvs = bpy.props.BoolProperty(
+		name="Occlusion",
+		description="Precompute which sections are potentially visible from each section, to cull the others at runtime",
+		default=False
+	)
+	prop_pvs_eye_height = bpy.props.FloatProperty(
+		name="Eye Height",
+		description="Height of the camera above the highest point of its section",
+		default=pvs.PVS_EYE_HEIGHT,
+		min=0,
+		subtype="DISTANCE"
+	)
+	prop_pvs_margin = bpy.props.FloatProperty(
+		name="Margin",
+		description="Distance by which occluders are lowered, to make up for decimation",
+		default=pvs.PVS_MARGIN,
+		min=0,
+		subtype="DISTANCE"
+	)
+	prop_pvs_samples = bpy.props.IntProperty(
+		name="Samples",
+		description="Number of samples per section side",
+		default=pvs.PVS_SAMPLES,
+		min=1,
+		soft_max=5,
+		max=16
+	)
+	prop_use_scatter = bpy.props.BoolProperty(
+		name="Scatter",
+		description="Store instances without properties as scatter rules, regenerated at runtime",
+		default=False
+	)
+	prop_scatter_resolution = bpy.props.IntProperty(
+		name="Resolution",
+		description="Number of density and height cells per section side",
+		default=scatter.SCATTER_RESOLUTION,
+		min=1,
+		soft_max=32,
+		max=256
+	)
+	prop_scatter_min_count = bpy.props.IntProperty(
+		name="Minimum",
+		description="Minimum number of instances of an object in a section to make a rule",
+		default=scatter.SCATTER_MIN_COUNT,
+		min=1
+	)
+	prop_use_streaming = bpy.props.BoolProperty(
+		name="Streaming",
+		description="Write the meshes of every section to a library of its own, loaded and freed around the camera at runtime",
+		default=False
+	)
+	prop_stream_distance = bpy.props.FloatProperty(
+		name="Load Distance",
+		description="Distance from the camera to a section within which its library is loaded",
+		default=data.STREAM_DISTANCE,
+		min=0,
+		subtype="DISTANCE"
+	)
+	prop_stream_margin = bpy.props.FloatProperty(
+		name="Unload Margin",
+		description="Distance beyond the load distance at which a loaded section is freed",
+		default=data.STREAM_MARGIN,
+		min=0,
+		subtype="DISTANCE"
+	)
+	prop_pool_size = bpy.props.IntProperty(
+		name="Pool Size",
+		description="Ended instances and physics proxies kept per source object for reuse, 0 to end them",
+		default=POOL_SIZE_MAX,
+		min=0
+	)
+	prop_frame_budget = bpy.props.FloatProperty(
+		name="Frame Budget",
+		description="Milliseconds per frame spent copying normals and adding sections while loading, and spawning instances while playing",
+		default=FRAME_BUDGET,
+		min=0.1,
+		soft_max=16
+	)
 	prop_use_approx = bpy.props.BoolProperty(
 		name="Approximate",
 		description="Use approximation",
@@ -160,6 +366,56 @@ class LODSections(bpy.types.Operator):
 		soft_max=5,
 		max=15
 	)
+	prop_use_octahedral = bpy.props.BoolProperty(
+		name="Octahedral Normals",
+		description="Encode exported normals in 2 x 16 bits, at most 0.004 degrees off; only saves size, the keys stay and decoding is slower",
+		default=False
+	)
+	prop_use_lazy_normals = bpy.props.BoolProperty(
+		name="Lazy Normals",
+		description="Copy exported normals the first time a section or lod level shows instead of before play",
+		default=False
+	)
+	prop_codec = bpy.props.EnumProperty(
+		items=[(codec, codec.upper() if codec != data.CODEC_NONE else "None", "") for codec in data.get_codecs()],
+		name="Compression",
+		description="Compression of the exported sections data, uncompressed data is memory mapped at runtime",
+		default=data.CODEC_NONE
+	)
+	prop_use_report = bpy.props.BoolProperty(
+		name="Report",
+		description="Export a runtime budget report per section and lod level",
+		default=False
+	)
+	prop_report_triangles = bpy.props.IntProperty(
+		name="Triangles",
+		description="Triangle budget per section and lod level",
+		default=20000,
+		min=0
+	)
+	prop_report_draw_calls = bpy.props.IntProperty(
+		name="Draw Calls",
+		description="Draw call budget per section and lod level",
+		default=8,
+		min=0
+	)
+	prop_report_instances = bpy.props.IntProperty(
+		name="Instances",
+		description="Instance budget per section",
+		default=256,
+		min=0
+	)
+	prop_report_normals_size = bpy.props.IntProperty(
+		name="Normals",
+		description="Budget in bytes of exported normals per section",
+		default=65536,
+		min=0
+	)
+	prop_use_trace = bpy.props.BoolProperty(
+		name="Trace",
+		description="Export a trace of the generation, with memory use, to be opened in a trace viewer (slower)",
+		default=False
+	)
 	prop_use_custom_prefix = bpy.props.BoolProperty(
 		name="Prefix",
 		description="Use custom prefix",
@@ -174,7 +430,7 @@ class LODSections(bpy.types.Operator):
 	err_msg = ""
 	log_msg = ""
 
-	def invoke(self, context, event):
+	def init(self, context):
 		self.scene = context.scene
 		self.active_object = self.scene.objects.active
 		self.selected_objects = []
@@ -209,6 +465,9 @@ class LODSections(bpy.types.Operator):
 		else:
 			self.err_msg = ERR_MSG_NO_ACTIVE_OR_SELECTED
 			
+	def invoke(self, context, event):
+		self.init(context)
+		
 		system_dpi = bpy.context.user_preferences.system.dpi
 		
 		return context.window_manager.invoke_props_dialog(self, width=system_dpi*5)
@@ -244,6 +503,18 @@ class LODSections(bpy.types.Operator):
 		else:
 			col_numb.active = False
 			
+		row = box().row
+		col = row().column
+		col().prop(self, "prop_use_auto_size")
+		col_auto = col()
+		col_auto.prop(self, "prop_auto_size_budget")
+		if not self.prop_use_auto_size:
+			col_auto.active = False
+			
+		col = row().column
+		col().prop(self, "prop_estimate", toggle=True)
+		col().prop(self, "prop_use_trace", toggle=True)
+		
 		row = box().row
 		col = row().column
 		col().prop(self, "prop_use_decimate_dissolve")
@@ -272,18 +543,76 @@ class LODSections(bpy.types.Operator):
 		if not self.prop_lod_use_custom_profile:
 			col_dist.active = False
 			
+		row_sel = row()
+		col = row_sel.column
+		col().prop(self, "prop_use_lod_selector", toggle=True)
+		col_sel = col()
+		col_sel.prop(self, "prop_lod_interval")
+		col_sel.prop(self, "prop_lod_bias")
+		if not self.prop_use_lod_selector:
+			col_sel.active = False
+			
+		row_marg = row()
+		col = row_marg.column
+		col().prop(self, "prop_physics_margin")
+		col = row_marg.column
+		col().prop(self, "prop_instances_margin")
+		
 		if not self.prop_use_lod:
 			col_lod.active = False
 			row_prof.active = False
 			row_lod.active = False
+			row_sel.active = False
+			row_marg.active = False
+			
+		row = box().row
+		col = row().column
+		col().prop(self, "prop_use_pvs")
+		row_pvs = row()
+		col = row_pvs.column
+		col().prop(self, "prop_pvs_eye_height")
+		col().prop(self, "prop_pvs_margin")
+		col = row_pvs.column
+		col().prop(self, "prop_pvs_samples")
+		if not self.prop_use_pvs:
+			row_pvs.active = False
+			
+		row = box().row
+		col = row().column
+		col().prop(self, "prop_use_scatter")
+		row_scat = row()
+		col = row_scat.column
+		col().prop(self, "prop_scatter_resolution")
+		col = row_scat.column
+		col().prop(self, "prop_scatter_min_count")
+		if not self.prop_use_scatter:
+			row_scat.active = False
+			
+		row = box().row
+		col = row().column
+		col().prop(self, "prop_use_streaming")
+		row_stream = row()
+		col = row_stream.column
+		col().prop(self, "prop_stream_distance")
+		col = row_stream.column
+		col().prop(self, "prop_stream_margin")
+		if not self.prop_use_streaming:
+			row_stream.active = False
+			
+		row = box().row
+		row().prop(self, "prop_frame_budget")
+		row().prop(self, "prop_pool_size")
 			
 		row = box().row
 		col = row().column
 		col().prop(self, "prop_use_approx")
 		col_ndig = col()
 		col_ndig.prop(self, "prop_approx_num_digits")
-		if not self.prop_use_approx:
+		if not self.prop_use_approx or self.prop_use_octahedral:
 			col_ndig.active = False
+		col().prop(self, "prop_use_octahedral")
+		col().prop(self, "prop_use_lazy_normals")
+		col().prop(self, "prop_codec")
 			
 		col = row().column
 		col().prop(self, "prop_use_custom_prefix", toggle=True)
@@ -292,6 +621,19 @@ class LODSections(bpy.types.Operator):
 		if not self.prop_use_custom_prefix:
 			col_pref.active = False
 			
+		row = box().row
+		col = row().column
+		col().prop(self, "prop_use_report", toggle=True)
+		row_budg = row()
+		col = row_budg.column
+		col().prop(self, "prop_report_triangles")
+		col().prop(self, "prop_report_draw_calls")
+		col = row_budg.column
+		col().prop(self, "prop_report_instances")
+		col().prop(self, "prop_report_normals_size")
+		if not self.prop_use_report:
+			row_budg.active = False
+			
 	def check(self, context):
 		if self.err_msg:
 			return False
@@ -301,7 +643,7 @@ class LODSections(bpy.types.Operator):
 		
 		def store_initial_state():
 			
-			print(self.profiler.timed("Storing initial state"))
+			print(self.tracer.timed("Storing initial state"))
 			
 			bpy.ops.object.mode_set(mode="OBJECT")
 			
@@ -319,16 +661,36 @@ class LODSections(bpy.types.Operator):
 			bpy.ops.object.editmode_toggle()
 			bpy.context.scene.tool_settings.mesh_select_mode = False, False, True
 			
+		def estimate_cost():
+			
+			print(self.tracer.timed("Estimating"))
+			
+			objects = [self.active_object]
+			objects.extend(get_selected_and_children(self.active_object, self.selected_objects))
+			centers, triangles, instances, dimensions = get_estimate_data(self.scene, self.active_object, objects)
+			if not len(centers):
+				return None
+			
+			# the active object is moved to the origin before the grid is calculated
+			
+			location = Vector().to_2d()
+			
+			if self.prop_use_auto_size:
+				s, fits = estimate.get_auto_size(centers, triangles, dimensions, location, self.prop_number_mode, self.prop_auto_size_budget)
+				self.prop_number_or_size = "generate_by_size"
+				self.prop_size = s, s
+				if not fits:
+					msg = WARN_MSG_AUTO_SIZE_BUDGET.format(self.prop_auto_size_budget, round(s, 3))
+					print(msg)
+					self.report({"WARNING"}, msg)
+				
+			number, size = grid.get_grid(dimensions, location, self.prop_number_or_size, self.prop_number, self.prop_size, self.prop_number_mode)
+			
+			return estimate.get_estimate(centers, triangles, instances, number, size, self.prop_use_lod, self.prop_lod_number, self.prop_lod_decimate_factor)
+			
 		def create_bases():
-			selected_and_children = set()
-			selected_and_children.update(self.selected_objects)
-			selected_and_children.remove(self.active_object)
-			selected_and_children.difference_update(self.active_object.children)
-			for child in self.active_object.children:
-				if TERRAIN_CHILD_PROP in child.game.properties:
-					selected_and_children.add(child)
-					selected_and_children.union(ut.get_children_recursive(child))
-
+			selected_and_children = get_selected_and_children(self.active_object, self.selected_objects)
+			
 			bpy.ops.object.select_all(action="DESELECT")
 			
 			self.active_object.matrix_world.identity()
@@ -347,7 +709,7 @@ class LODSections(bpy.types.Operator):
 				else:
 					self.objects.append(ob)
 
-			print(self.profiler.timed("Creating bases"))
+			print(self.tracer.timed("Creating bases"))
 			
 			for ob in self.objects:
 				self.scene.objects.active = ob
@@ -366,7 +728,7 @@ class LODSections(bpy.types.Operator):
 						bpy.ops.object.modifier_remove(modifier=mod.name)
 						continue
 						
-					print(self.profiler.timed("Applying ", mod.name))
+					print(self.tracer.timed("Applying ", mod.name))
 					
 					bpy.ops.object.modifier_apply(apply_as="DATA", modifier=mod.name)
 					
@@ -382,7 +744,7 @@ class LODSections(bpy.types.Operator):
 				
 				base.select = False
 				
-			print(self.profiler.timed("Cleaning up bases"))
+			print(self.tracer.timed("Cleaning up bases"))
 			
 			for base in self.bases:
 				self.scene.objects.active = base
@@ -397,6 +759,8 @@ class LODSections(bpy.types.Operator):
 				bpy.ops.mesh.select_all(action="DESELECT")
 				bpy.ops.object.editmode_toggle()
 				#bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY")
+				
+				self.tracer.count(trace.TRIANGLES, ut.get_triangle_count(base.data))
 
 				base.select = False
 				
@@ -407,7 +771,7 @@ class LODSections(bpy.types.Operator):
 				
 				if self.prop_use_decimate_dissolve:
 					
-					print(self.profiler.timed("Decimating base:", base.name))
+					print(self.tracer.timed("Decimating base:", base.name))
 
 					bpy.ops.object.editmode_toggle()
 					bpy.ops.mesh.select_all(action="SELECT")
@@ -427,49 +791,24 @@ class LODSections(bpy.types.Operator):
 				
 		def collect_data():
 			
-			print(self.profiler.timed("Collecting data"))
+			print(self.tracer.timed("Collecting data"))
 			
 			for base in self.bases:
 				self.materials.update(set(base.data.materials))
 				
 			self.dimensions.xy = ut.dimensions(*self.bases, include_transform=True).xy
 			
-			if self.prop_number_or_size == "generate_by_number":
-				self.number.x = self.prop_number[0]
-				self.number.y = self.prop_number[1]
-				self.size.x = self.dimensions.x / self.number.x
-				self.size.y = self.dimensions.y / self.number.y
-			else:
-				self.size.x = self.prop_size[0]
-				self.size.y = self.prop_size[1]
-				n_x = math.ceil(abs(self.active_object.location.x) + self.dimensions.x / self.size.x)
-				n_y = math.ceil(abs(self.active_object.location.y) + self.dimensions.y / self.size.y)
-				
-				if self.prop_number_mode == "use_automatic_numbering":
-					self.number.x = n_x
-					self.number.y = n_y
-				else:
-					i = 0 if self.prop_number_mode == "use_even_numbers" else 1
-					self.number.x = n_x + 1 - i if n_x % 2 else n_x + i
-					self.number.y = n_y + 1 - i if n_y % 2 else n_y + i
-					
-			self.ndigits = len(str(int(self.number.x * self.number.y)))
-			
-			n = 1
-			for j in range(int(self.number.y)):
-				y = 0.5 * self.size.y * (2 * j + 1 - self.number.y)
-				for i in range(int(self.number.x)):
-					x = 0.5 * self.size.x * (2 * i + 1 - self.number.x)
-					id = ut.get_id(n, "", self.ndigits)
-					self.points[id] = [x, y]
-					n += 1
-					
+			number, size = grid.get_grid(self.dimensions, self.active_object.location, self.prop_number_or_size, self.prop_number, self.prop_size, self.prop_number_mode)
+			self.number.xy = number
+			self.size.xy = size
+			
+			self.ndigits = grid.get_num_digits(self.number)
+			self.points = grid.get_points(self.number, self.size)
 			self.points_keys = list(self.points.keys())
-			self.points_values = list(self.points.values())
 			
 		def generate_sections():
 			
-			print(self.profiler.timed("Multisecting bases"))
+			print(self.tracer.timed("Multisecting bases"))
 			
 			bpy.ops.mesh.primitive_plane_add()
 			self.sections = self.scene.objects.active
@@ -498,20 +837,20 @@ class LODSections(bpy.types.Operator):
 				bpy.ops.object.editmode_toggle()
 				bm = bmesh.from_edit_mesh(tmp_base.data)
 				
-				for i in range(int(self.number.x) + 1):
+				for x in grid.get_lines(self.number, self.size, 0):
 					try:
 						l = bm.verts[:] + bm.edges[:] + bm.faces[:]
-						co = ((i - 0.5 * self.number.x) * self.size.x, 0, 0)
+						co = (x, 0, 0)
 						no = (1, 0, 0)
 						d = bmesh.ops.bisect_plane(bm, geom=l, plane_co=co, plane_no=no)
 						bmesh.ops.split_edges(bm, edges=[e for e in d["geom_cut"] if isinstance(e, bmesh.types.BMEdge)])
 					except RuntimeError:
 						continue
 						
-				for i in range(int(self.number.y) + 1):
+				for y in grid.get_lines(self.number, self.size, 1):
 					try:
 						l = bm.verts[:] + bm.edges[:] + bm.faces[:]
-						co = (0, (i - 0.5 * self.number.y) * self.size.y, 0)
+						co = (0, y, 0)
 						no = (0, 1, 0)
 						d = bmesh.ops.bisect_plane(bm, geom=l, plane_co=co, plane_no=no)
 						bmesh.ops.split_edges(bm, edges=[e for e in d["geom_cut"] if isinstance(e, bmesh.types.BMEdge)])
@@ -541,7 +880,7 @@ class LODSections(bpy.types.Operator):
 				bpy.ops.object.join()
 			self.base.select = False
 			
-			print(self.profiler.timed("Separating into sections"))
+			print(self.tracer.timed("Separating into sections"))
 			
 			tmps_data = {id : [] for id in self.points_keys}
 			
@@ -570,14 +909,12 @@ class LODSections(bpy.types.Operator):
 					bpy.ops.object.editmode_toggle()
 					bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY")
 					
-					l = ut.get_grid_point(tmp.location.xy, self.size)
-					try:
-						id = self.points_keys[self.points_values.index(l)]
+					id = grid.get_point_id(tmp.location.xy, self.number, self.size)
+					if id is None:
+						ut.remove(tmp)
+					else:
 						tmps_data[id].append(tmp)
 						tmp.select = False
-					except ValueError:
-						ut.remove(tmp)
-						
 						
 			for id, l in tmps_data.items():
 				if not l:
@@ -611,6 +948,7 @@ class LODSections(bpy.types.Operator):
 				sect.select = False
 				
 				self.data[id] = sect
+				self.tracer.count(trace.TRIANGLES, ut.get_triangle_count(sect.data))
 				
 			for m in meshes_to_be_removed:
 				ut.remove(m)
@@ -622,17 +960,19 @@ class LODSections(bpy.types.Operator):
 				
 			lod = {id: [sect] for id, sect in self.data.items()}
 			
-			id = ut.get_id(0, "", self.ndigits)
-			lod_id = ut.get_id(self.prop_lod_number, "_", 1)
+			id = grid.get_id(0, "", self.ndigits)
+			lod_id = grid.get_id(self.prop_lod_number, "_", 1)
 			me_name = self.sections.name + SECT + id + LOD + lod_id
 			sect_lod_me_linked = bpy.data.meshes.new(me_name)
 			sect_lod_me_linked.name = self.sections.name + SECT + id + LOD + lod_id
 			
+			ratios = grid.get_lod_ratios(self.prop_lod_number, self.prop_lod_decimate_factor)
+			
 			for i in range(1, self.prop_lod_number + 1):
 				
-				print(self.profiler.timed("Generating LOD ", i, " of ", self.prop_lod_number))
+				print(self.tracer.timed("Generating LOD ", i, " of ", self.prop_lod_number))
 				
-				lod_id = ut.get_id(i, "_", 1)
+				lod_id = grid.get_id(i, "_", 1)
 				
 				for id, sect in self.data.items():
 					sect_lod_name = sect.name + LOD + lod_id
@@ -656,10 +996,11 @@ class LODSections(bpy.types.Operator):
 						
 						mod_decimate_collapse = sect_lod.modifiers.new("Decimate Collapse", "DECIMATE")
 						mod_decimate_collapse.decimate_type = "COLLAPSE"
-						mod_decimate_collapse.ratio = self.prop_lod_decimate_factor / i
+						mod_decimate_collapse.ratio = ratios[i - 1]
 						mod_decimate_collapse.vertex_group = BOUNDS
 						mod_decimate_collapse.invert_vertex_group = True
 						bpy.ops.object.modifier_apply(apply_as="DATA", modifier="Decimate Collapse")
+						self.tracer.count(trace.TRIANGLES, ut.get_triangle_count(sect_lod.data))
 						
 					sect_lod.location = sect.location
 					sect_lod.select = False
@@ -667,15 +1008,17 @@ class LODSections(bpy.types.Operator):
 					
 					lod[id].append(sect_lod)
 					
-			print(self.profiler.timed("Configuring LOD"))
+			print(self.tracer.timed("Configuring LOD"))
 			
-			if self.prop_lod_use_custom_profile:
-				lod_dist_init = self.prop_lod_distance_initial
-				lod_dist_fact = self.prop_lod_distance_factor
-			else:
-				lod_dist_init = max(self.size.x, self.size.y)
-				lod_dist_fact = 0.5
-			d = ut.get_table_incremented(lod_dist_init, lod_dist_fact, self.prop_lod_number + 1)
+			d = grid.get_lod_distances(
+				self.prop_lod_number,
+				self.size,
+				self.prop_lod_use_custom_profile,
+				self.prop_lod_distance_initial,
+				self.prop_lod_distance_factor
+			)
+			
+			self.lod_distances = d
 			
 			for id, l in lod.items():
 				sect = self.data[id]
@@ -684,7 +1027,7 @@ class LODSections(bpy.types.Operator):
 				for i, sect_lod in enumerate(l):
 					bpy.ops.object.lod_add()
 					lod_level = sect.lod_levels[i + 1]
-					lod_level.distance = d[i] - lod_dist_init
+					lod_level.distance = d[i]
 					lod_level.use_material = True
 					lod_level.object = sect_lod
 				sect.select = False
@@ -714,7 +1057,7 @@ class LODSections(bpy.types.Operator):
 				particles = {}
 				for psm in psml:
 					
-					print(self.profiler.timed("Converting ", psm.name))
+					print(self.tracer.timed("Converting ", psm.name))
 					
 					psm.show_viewport = True
 					psm.show_render = True
@@ -751,19 +1094,18 @@ class LODSections(bpy.types.Operator):
 					
 					bpy.ops.object.make_single_user(type="SELECTED_OBJECTS", obdata=True)
 					m = o.matrix_world
-					l = ut.get_grid_point(m.translation.xy, self.size)
+					id = grid.get_point_id(m.translation.xy, self.number, self.size)
 					
-					try:
-						id = self.points_keys[self.points_values.index(l)]
-						if id not in particles:
-							particles[id] = []
-						particles[id].append(o)
-						o.matrix_world = m
-						self.materials.update(settings.dupli_object.data.materials)
-						
-					except ValueError:
+					if id is None:
 						ut.remove(o)
+						continue
 						
+					if id not in particles:
+						particles[id] = []
+					particles[id].append(o)
+					o.matrix_world = m
+					self.materials.update(settings.dupli_object.data.materials)
+					
 					o.select = False
 							
 				for id, objects in particles.items():
@@ -818,7 +1160,7 @@ class LODSections(bpy.types.Operator):
 						
 						mod_decimate_collapse = part_lod.modifiers.new("Decimate Collapse", "DECIMATE")
 						mod_decimate_collapse.decimate_type = "COLLAPSE"
-						mod_decimate_collapse.ratio = self.prop_lod_decimate_factor / (i + 1)
+						mod_decimate_collapse.ratio = grid.get_lod_ratios(self.prop_lod_number, self.prop_lod_decimate_factor)[i]
 						bpy.ops.object.modifier_apply(apply_as="DATA", modifier="Decimate Collapse")
 						
 						self.scene.objects.active = sect_lod
@@ -844,19 +1186,45 @@ class LODSections(bpy.types.Operator):
 			for n, nl in self.lod_tmps.copy().items():
 				for l in nl:
 					m, pl = l
-					gp = ut.get_grid_point(m.translation.xy, self.size)
-					try:
-						id = self.points_keys[self.points_values.index(gp)]
-						sect_name = self.sections.name + SECT + id
-						if sect_name not in self.lod_instances:
-							self.lod_instances[sect_name] = {}
-						if n not in self.lod_instances[sect_name]:
-							self.lod_instances[sect_name][n] = []
-						d = self.lod_instances[sect_name]
-						d[n].append([[list(v) for v in m.row], pl])
-					except ValueError:
+					id = grid.get_point_id(m.translation.xy, self.number, self.size)
+					if id is None:
 						print("warning:", n, "at", list(m.translation), "not within bounds")
-						
+						continue
+					data.add_instance(self.lod_instances, self.sections.name + SECT + id, n, m.row, pl)
+					
+		def scatter_lod_objects():
+			
+			if not (self.prop_use_scatter and self.lod_instances):
+				return
+				
+			print(self.tracer.timed("Generating scatter rules"))
+			
+			# heights are taken from the joined bases, before particles are part of the sections
+			
+			bvh, owners = ut.get_bvh_tree([self.base])
+			top = max(v.co.z for v in self.base.data.vertices) + 1
+			
+			def height_at(x, y):
+				location, normal, index, d = bvh.ray_cast(Vector((x, y, top)), Vector((0, 0, -1)))
+				if index is None:
+					location = bvh.find_nearest(Vector((x, y, top)))[0]
+				return location.z
+				
+			points = {self.sections.name + SECT + id : p for id, p in self.points.items()}
+			num_instances = sum(len(nl) for d in self.lod_instances.values() for nl in d.values())
+			
+			self.lod_instances, self.scatter = scatter.get_scatter(
+				self.lod_instances,
+				points,
+				self.size,
+				height_at,
+				self.prop_scatter_resolution,
+				self.prop_scatter_min_count
+			)
+			
+			num_stored = sum(len(nl) for d in self.lod_instances.values() for nl in d.values())
+			print("Scattered:", num_instances - num_stored, "of", num_instances, "instances")
+					
 		def generate_lod_physics():
 			for n in self.lod_tmps:
 				
@@ -868,7 +1236,7 @@ class LODSections(bpy.types.Operator):
 					
 				if n + PHYS not in self.scene.objects:
 					
-					print(self.profiler.timed("Generating physics for ", n))
+					print(self.tracer.timed("Generating physics for ", n))
 					
 					lod_ob = self.scene.objects[n]
 					self.scene.objects.active = lod_ob_physics = ut.copy(self.scene, lod_ob, False, PHYS)
@@ -888,9 +1256,11 @@ class LODSections(bpy.types.Operator):
 					lod_ob_physics.game.collision_bounds_type = "TRIANGLE_MESH"
 					lod_ob_physics.select = False
 					
+					self.registry.keep(lod_ob_physics)
+					
 		def copy_normals():
 			
-			print(self.profiler.timed("Copying custom normals"))
+			print(self.tracer.timed("Copying custom normals"))
 			
 			objects = []
 			for sect in self.data.values():
@@ -914,6 +1284,7 @@ class LODSections(bpy.types.Operator):
 				mod_copy_cust_norm.vertex_group = BOUNDS
 				
 				bpy.ops.object.modifier_apply(apply_as="DATA", modifier="Copy Custom Normals")
+				self.tracer.count(trace.TRIANGLES, ut.get_triangle_count(ob.data))
 				
 				ob.select = False
 				
@@ -936,7 +1307,7 @@ class LODSections(bpy.types.Operator):
 			if self.prop_lod_number == 1:
 				return
 				
-			print(self.profiler.timed("Generating lod materials"))
+			print(self.tracer.timed("Generating lod materials"))
 			
 			materials_lod = {}
 			for mat in self.materials:
@@ -955,21 +1326,57 @@ class LODSections(bpy.types.Operator):
 						sect_lod.active_material_index = j
 						sect_lod.active_material = materials_lod[mat.name]
 						
+		def generate_pvs():
+		
+			if not self.prop_use_pvs:
+				return
+				
+			print(self.tracer.timed("Generating potentially visible sets"))
+			
+			# the coarsest lod levels, lowered by the margin, are the occluders
+			
+			self.scene.update()
+			
+			ids = list(self.data.keys())
+			occluders = []
+			heights = {}
+			
+			for id, sect in self.data.items():
+				m = sect.matrix_world
+				heights[id] = max((m * v.co).z for v in sect.data.vertices)
+				occluders.append(sect.lod_levels[-2].object if self.prop_use_lod else sect)
+				
+			bvh, owners = ut.get_bvh_tree(occluders, Vector((0, 0, -self.prop_pvs_margin)))
+			
+			def ray_cast(origin, direction, distance):
+				location, normal, index, d = bvh.ray_cast(Vector(origin), Vector(direction), distance)
+				return None if index is None else ids[owners[index]]
+				
+			# beyond the last lod distance sections are empty anyway
+			
+			max_distance = self.lod_distances[-1] if self.prop_use_lod else None
+			
+			self.pvs = pvs.get_pvs(
+				self.points,
+				self.number,
+				self.size,
+				heights,
+				ray_cast,
+				self.prop_pvs_eye_height,
+				self.prop_pvs_samples,
+				max_distance
+			)
+			
+			num_visible = sum(len(l) for l in self.pvs.values())
+			print("Potentially visible:", num_visible, "of", len(self.pvs) ** 2, "section pairs")
+			
 		def export_data():
 			
-			print(self.profiler.timed("Exporting data"))
+			print(self.tracer.timed("Exporting data"))
 			
 			normals = {}
-			
-			data = {
-				SIZE : list(self.size),
-				NUMBER : list(self.number),
-				DIMENSIONS : list(self.dimensions),
-				LOD_SIZE : self.prop_lod_number,
-				POINTS : self.points,
-				INSTANCES : self.lod_instances,
-				NORMALS : normals,
-			}
+			normal_indices = {}
+			vertex_array_lengths = {}
 			
 			objects = []
 			
@@ -980,7 +1387,7 @@ class LODSections(bpy.types.Operator):
 				for lod_level in sect.lod_levels[2:-1]:
 					objects.append(lod_level.object)
 					
-			approx_ndigits = self.prop_approx_num_digits if self.prop_use_approx else -1
+			approx_ndigits = self.prop_approx_num_digits if self.prop_use_approx and not self.prop_use_octahedral else -1
 			for ob in objects:
 				self.scene.objects.active = ob
 				ob.select = True
@@ -991,6 +1398,7 @@ class LODSections(bpy.types.Operator):
 				bpy.ops.object.editmode_toggle()
 				
 				normals[ob.name] = ut.get_custom_normals(ob, approx_ndigits, True)
+				normal_indices[ob.name], vertex_array_lengths[ob.name] = ut.get_normal_indices(ob, normals[ob.name], True)
 				
 				bpy.ops.object.editmode_toggle()
 				bpy.ops.mesh.select_all(action="DESELECT")
@@ -1000,14 +1408,37 @@ class LODSections(bpy.types.Operator):
 					
 				ob.select = False
 				
-			ut.save_txt(data, SECT_PROP, self.active_object.name)
+			self.normals = normals
+			self.normal_indices = normal_indices
+			
+			sections_data = data.get_data(
+				self.size,
+				self.number,
+				self.dimensions,
+				self.prop_lod_number,
+				self.points,
+				self.lod_instances,
+				normals,
+				self.pvs,
+				self.scatter,
+				self.prop_scatter_resolution,
+				self.prop_use_octahedral,
+				data.get_streaming(self.prop_stream_distance, self.prop_stream_margin) if self.prop_use_streaming else None,
+				normal_indices,
+				self.prop_use_lazy_normals,
+				self.lod_distances if self.prop_use_lod else None,
+				self.prop_use_lod and self.prop_use_lod_selector,
+				vertex_array_lengths
+			)
+			
+			ut.save_data(sections_data, SECT_PROP, self.active_object.name, codec=self.prop_codec)
 			
 		def generate_physics():
 			
 			if not (self.prop_use_lod and self.prop_lod_use_physics):
 				return
 				
-			print(self.profiler.timed("Generating Physics"))
+			print(self.tracer.timed("Generating Physics"))
 			
 			for sect in self.data.values():
 				sect_physics = ut.copy(self.scene, sect, True, PHYS)
@@ -1018,9 +1449,89 @@ class LODSections(bpy.types.Operator):
 				
 				sect_physics.parent = self.sections
 				
+		def export_report():
+			
+			if not self.prop_use_report:
+				return
+				
+			print(self.tracer.timed("Exporting report"))
+			
+			budgets = {
+				"triangles" : self.prop_report_triangles,
+				"draw_calls" : self.prop_report_draw_calls,
+				"instances" : self.prop_report_instances,
+				"normals_size" : self.prop_report_normals_size,
+			}
+			
+			sections = []
+			outliers = []
+			
+			def check_budget(sect_name, lod_level, key, value):
+				if value > budgets[key]:
+					outliers.append({"section" : sect_name, "lod_level" : lod_level, "key" : key, "value" : value, "budget" : budgets[key]})
+					
+			for id, sect in self.data.items():
+				
+				objects = [sect]
+				if self.prop_use_lod:
+					objects.extend(lod_level.object for lod_level in sect.lod_levels[2:])
+					
+				lod_levels = []
+				for i, ob in enumerate(objects):
+					d = ut.get_mesh_stats(ob.data)
+					d["object"] = ob.name
+					d["normals_size"] = data.get_normals_size(self.normals[ob.name], self.prop_use_octahedral, self.normal_indices.get(ob.name)) if ob.name in self.normals else 0
+					lod_levels.append(d)
+					check_budget(sect.name, i, "triangles", d["triangles"])
+					check_budget(sect.name, i, "draw_calls", d["draw_calls"])
+					
+				instances = {}
+				physics_instance_triangles = 0
+				counts = scatter.get_counts(self.scatter, sect.name)
+				for n, nl in self.lod_instances.get(sect.name, {}).items():
+					counts[n] = counts.get(n, 0) + len(nl)
+				for n, num in counts.items():
+					instances[n] = num
+					if n + PHYS in self.scene.objects:
+						physics_instance_triangles += ut.get_mesh_stats(self.scene.objects[n + PHYS].data)["triangles"] * num
+						
+				sect_phys_name = sect.name + PHYS
+				physics_triangles = ut.get_mesh_stats(self.scene.objects[sect_phys_name].data)["triangles"] if sect_phys_name in self.scene.objects else 0
+				num_instances = sum(instances.values())
+				normals_size = sum(d["normals_size"] for d in lod_levels)
+				check_budget(sect.name, None, "instances", num_instances)
+				check_budget(sect.name, None, "normals_size", normals_size)
+				
+				sections.append({
+					"section" : sect.name,
+					"center" : list(self.points[id]),
+					"lod_levels" : lod_levels,
+					"physics_triangles" : physics_triangles,
+					"physics_instance_triangles" : physics_instance_triangles,
+					"instances" : num_instances,
+					"instances_per_object" : instances,
+					"normals_size" : normals_size,
+					"visible_sections" : len(self.pvs.get(id, self.data)),
+				})
+				
+			report = {
+				"name" : self.active_object.name,
+				"size" : list(self.size),
+				"number" : list(self.number),
+				"budgets" : budgets,
+				"sections" : sections,
+				"outliers" : outliers,
+			}
+			
+			self.num_outliers = len(outliers)
+			for d in outliers:
+				print("warning:", d["section"], "lod level", d["lod_level"], "exceeds", d["key"], "budget:", d["value"], ">", d["budget"])
+				
+			ut.save_json(report, SECT_PROP, self.active_object.name + REPORT)
+			
 		def finalize():
 			
-			print(self.profiler.timed("Finalizing sections"))
+			print(self.tracer.timed("Finalizing sections"))
 			
 			sections = self.data.values()
 			for ob in self.sections.children:
@@ -1030,6 +1541,15 @@ class LODSections(bpy.types.Operator):
 					ob.hide_render = True
 					ob.hide = True
 					
+			# the runtime replaces the meshes itself, the lod levels were only needed to bake
+			
+			if self.prop_use_lod and self.prop_use_lod_selector:
+				active_object = self.scene.objects.active
+				for sect in sections:
+					self.scene.objects.active = sect
+					bpy.ops.object.lod_clear_all()
+				self.scene.objects.active = active_object
+					
 			self.sections.matrix_world = self.matrix_world
 			bpy.ops.transform.translate()
 			self.sections.select = False
@@ -1038,16 +1558,54 @@ class LODSections(bpy.types.Operator):
 				ob.layers = layer_twenty
 			self.sections.layers = layer_twenty
 			
+			self.registry.keep_recursive(self.sections)
+			
+		def export_libraries():
+			
+			if not self.prop_use_streaming:
+				return
+				
+			print(self.tracer.timed("Exporting section libraries"))
+			
+			# the section objects only live in a scene of their own, so the game scene does not convert them
+			
+			holder_name = self.sections.name + data.STREAM_SUFFIX
+			holder = bpy.data.scenes.new(holder_name)
+			holder.layers = self.scene.layers
+			
+			for sect in self.data.values():
+				objects = [ob for ob in self.sections.children if ob.name == sect.name or ob.name == sect.name + PHYS or ob.name.startswith(sect.name + LOD)]
+				
+				# one library per section, all on the inactive layer
+				
+				ut.write_library(data.get_library_path(self.active_object.name, sect.name), sect.name, objects, [True] + [False for i in range(19)])
+				
+				for ob in objects:
+					holder.objects.link(ob)
+					self.scene.objects.unlink(ob)
+					
 		def generate_game_logic():
 			
-			print(self.profiler.timed("Generating game logic"))
+			print(self.tracer.timed("Generating game logic"))
 			
 			self.scene.objects.active = self.active_object
 			self.active_object.select = True
 			
 			ut.add_game_property(self.active_object, SECT_PROP, self.sections.name)
 			ut.add_game_property(self.active_object, PROG_PROP, 0.0, True)
+			ut.add_game_property(self.active_object, BUDG_PROP, self.prop_frame_budget)
+			ut.add_game_property(self.active_object, QUEU_PROP, 0, True)
+			ut.add_game_property(self.active_object, DRAI_PROP, 0.0, True)
+			ut.add_game_property(self.active_object, INTV_PROP, self.prop_lod_interval)
+			ut.add_game_property(self.active_object, BIAS_PROP, self.prop_lod_bias)
+			ut.add_game_property(self.active_object, PMAR_PROP, self.prop_physics_margin)
+			ut.add_game_property(self.active_object, IMAR_PROP, self.prop_instances_margin)
+			ut.add_game_property(self.active_object, PSIZ_PROP, self.prop_pool_size)
+			ut.add_game_property(self.active_object, POOL_PROP, 0, True)
+			ut.add_game_property(self.active_object, HITS_PROP, 0.0, True)
+			ut.add_game_property(self.active_object, MESH_PROP, 0, True)
 			ut.add_text(self.bl_idname, True, TOOL_NAME)
+			ut.add_lib_new_text()
 			ut.add_logic_python(self.active_object, TOOL_NAME, "init", False, 1)
 			ut.add_logic_python(self.active_object, TOOL_NAME, "load", False, 2)
 			ut.add_logic_python(self.active_object, TOOL_NAME, "edit", True, 3)
@@ -1058,7 +1616,7 @@ class LODSections(bpy.types.Operator):
 			
 		def restore_initial_state():
 			
-			print(self.profiler.timed("Restoring initial state"))
+			print(self.tracer.timed("Restoring initial state"))
 			
 			bpy.ops.object.editmode_toggle()
 			bpy.context.scene.tool_settings.mesh_select_mode = self.mesh_select_mode
@@ -1069,18 +1627,100 @@ class LODSections(bpy.types.Operator):
 			self.scene.cursor_location = self.cursor_location
 			context.user_preferences.edit.use_global_undo = self.undo
 			
+		def clear():
+			ut.remove_game_properties(self.active_object, [SECT_PROP, PROG_PROP, BUDG_PROP, QUEU_PROP, DRAI_PROP, INTV_PROP, BIAS_PROP, PMAR_PROP, IMAR_PROP, PSIZ_PROP, POOL_PROP, HITS_PROP, MESH_PROP])
+			ut.remove_logic(self.active_object, TOOL_NAME)
+			ut.remove_text(TOOL_NAME)
+			ut.remove_lib_new_text()
+			
+			sections = self.scene.objects[sections_name]
+			
+			meshes = set()
+			materials = set()
+			
+			for ob in sections.children:
+				meshes.add(ob.data)
+				ut.remove(ob, False)
+				
+			for me in meshes:
+				for mat in me.materials:
+					
+					if not mat.name.startswith(self.prefix):
+						continue
+						
+					materials.add(mat)
+				ut.remove(me)
+				
+			for mat in materials:
+				ut.remove(mat)
+				
+			ut.remove(sections, False)
+			
+			holder_name = sections_name + data.STREAM_SUFFIX
+			if holder_name in bpy.data.scenes:
+				bpy.data.scenes.remove(bpy.data.scenes[holder_name], do_unlink=True)
+				
+			dir = bpy.path.abspath(os.path.dirname(data.get_library_path(self.active_object.name, "")))
+			if os.path.exists(dir):
+				shutil.rmtree(dir)
+			
+		def restore_after_error():
+			
+			if context.object and context.object.mode != "OBJECT":
+				bpy.ops.object.mode_set(mode="OBJECT")
+				
+			if self.undo is not None:
+				context.user_preferences.edit.use_global_undo = self.undo
+			if self.physics_type is not None:
+				self.active_object.game.physics_type = self.physics_type
+				self.active_object.matrix_world = self.matrix_world
+			if self.cursor_location is not None:
+				self.scene.cursor_location = self.cursor_location
+				
+		def report_datablocks():
+			
+			lines = self.registry.report()
+			for line in lines:
+				print("warning:", line)
+				
+			if lines:
+				self.log_msg += " (" + str(len(lines)) + " leaked or orphaned data-blocks)"
+				
+		def export_trace():
+			
+			for line in self.tracer.summary():
+				print(line)
+				
+			if not self.prop_use_trace:
+				return
+				
+			file_path = self.tracer.export(os.path.join(bpy.path.abspath("//"), trace.TRACE_DIR), self.active_object.name)
+			print("Trace exported to", file_path)
+			
 		def update_log_msg():
 			
-			self.log_msg = self.profiler.timed("Finished generating ", len(self.data), " (", round(self.size.x, 1), " X ", round(self.size.y, 1), ") sections in")
+			self.log_msg = self.tracer.timed("Finished generating ", len(self.data), " (", round(self.size.x, 1), " X ", round(self.size.y, 1), ") sections in")
+			if self.num_outliers:
+				self.log_msg += " (" + str(self.num_outliers) + " over budget)"
 			
 			print(self.log_msg)
 			
+		# called from a script, without a dialog
+		
+		if not hasattr(self, "active_object"):
+			self.init(context)
+			
 		if self.err_msg:
 			return {"CANCELLED"}
 			
 		print("\nLOD Sections\n------------\n")
 		
-		self.profiler = ut.Profiler()
+		self.tracer = trace.Tracer(TOOL_NAME, {
+			"objects" : lambda: len(bpy.data.objects),
+			"meshes" : lambda: len(bpy.data.meshes),
+			"materials" : lambda: len(bpy.data.materials),
+		}, self.prop_use_trace)
+		self.registry = datablocks.Registry()
 		self.prefix = self.prop_custom_prefix if self.prop_use_custom_prefix else PREF
 		
 		if SECT_PROP in self.active_object.game.properties:
@@ -1092,34 +1732,10 @@ class LODSections(bpy.types.Operator):
 			sections_name = self.active_object.game.properties[SECT_PROP].value
 			
 			try:
-				ut.remove_game_properties(self.active_object, [SECT_PROP, PROG_PROP])
-				ut.remove_logic(self.active_object, TOOL_NAME)
-				ut.remove_text(TOOL_NAME)
-				
-				sections = self.scene.objects[sections_name]
-				
-				meshes = set()
-				materials = set()
-				
-				for ob in sections.children:
-					meshes.add(ob.data)
-					ut.remove(ob, False)
-					
-				for me in meshes:
-					for mat in me.materials:
-						
-						if not mat.name.startswith(self.prefix):
-							continue
-							
-						materials.add(mat)
-					ut.remove(me)
+				with self.tracer, self.tracer.span("clear"):
+					clear()
 					
-				for mat in materials:
-					ut.remove(mat)
-					
-				ut.remove(sections, False)
-				
-				print(self.profiler.timed("Finished clearing existing lod sections in "))
+				print(self.tracer.timed("Finished clearing existing lod sections in "))
 				
 				if self.prop_update_or_clear == "clear":
 					return {"FINISHED"}
@@ -1129,6 +1745,28 @@ class LODSections(bpy.types.Operator):
 				
 				return {"CANCELLED"}
 				
+		if self.prop_estimate or self.prop_use_auto_size:
+			
+			with self.tracer, self.tracer.span("estimate"):
+				d = estimate_cost()
+				
+			if d is None:
+				self.err_msg = ERR_MSG_NO_FACES
+				print(self.err_msg)
+				self.report({"ERROR"}, self.err_msg)
+				return {"CANCELLED"}
+				
+			for k, v in d.items():
+				print(k.replace("_", " ").capitalize() + ":", v)
+				
+			if self.prop_estimate:
+				self.log_msg = "Estimated {} ({} X {}) sections, {} triangles, {} instances, {:.1f} MB in {:.1f}s".format(
+					d["sections"], d["size"][0], d["size"][1], d["triangles_per_lod_level"][0], d["instances"], d["memory"] / 1048576, d["bake_time"]
+				)
+				print(self.log_msg)
+				export_trace()
+				return {"FINISHED"}
+				
 		self.undo = None
 		self.physics_type = None
 		self.mesh_select_mode = None
@@ -1140,7 +1778,6 @@ class LODSections(bpy.types.Operator):
 		self.number = Vector().to_2d()
 		self.dimensions = Vector().to_2d()
 		self.points = OrderedDict()
-		self.points_values = []
 		self.points_keys = []
 		self.objects = []
 		self.bases = []
@@ -1150,26 +1787,62 @@ class LODSections(bpy.types.Operator):
 		self.particles = {}
 		self.lod_tmps = {}
 		self.data = {}
+		self.normals = {}
+		self.normal_indices = {}
+		self.lod_distances = []
+		self.pvs = {}
+		self.scatter = {}
+		self.num_outliers = 0
+		
+		stages = [
+			store_initial_state,
+			create_bases,
+			dissolve_bases,
+			collect_data,
+			generate_sections,
+			generate_lod,
+			collect_particles,
+			join_particles,
+			map_lod_objects,
+			scatter_lod_objects,
+			adjust_materials,
+			generate_lod_physics,
+			copy_normals,
+			generate_lod_materials,
+			generate_pvs,
+			export_data,
+			generate_physics,
+			export_report,
+			finalize,
+			export_libraries,
+			generate_game_logic,
+			restore_initial_state,
+		]
 		
-		store_initial_state()
-		create_bases()
-		dissolve_bases()
-		collect_data()
-		generate_sections()
-		generate_lod()
-		collect_particles()
-		join_particles()
-		map_lod_objects()
-		adjust_materials()
-		generate_lod_physics()
-		copy_normals()
-		generate_lod_materials()
-		export_data()
-		generate_physics()
-		finalize()
-		generate_game_logic()
-		restore_initial_state()
+		try:
+			with self.tracer, self.registry:
+				try:
+					for stage in stages:
+						with self.tracer.span(stage.__name__):
+							stage()
+						self.registry.collect()
+						
+				except Exception:
+					restore_after_error()
+					raise
+					
+		except Exception as e:
+			report_datablocks()
+			export_trace()
+			self.err_msg = self.tracer.timed("Failed generating sections: ", e)
+			print(self.err_msg)
+			self.report({"ERROR"}, str(e))
+			
+			return {"CANCELLED"}
+			
 		update_log_msg()
+		report_datablocks()
+		export_trace()
 		
 		return {"FINISHED"}
 		
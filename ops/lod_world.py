@@ -0,0 +1,253 @@
+import bpy, os
+from mathutils import Vector
+from . import utils as ut
+from ..core import trace, data, world
+
+ERR_MSG_NO_ACTIVE_OBJECT = "No active object"
+ERR_MSG_NO_TILES = "No selected object(s) with LOD sections"
+ERR_MSG_UNSAVED = "Blend file not saved"
+ERR_MSG_OVERLAPPING_TILES = "Overlapping tiles: "
+
+WORLD_PROP = "BGE_TOOLS_LOD_WORLD"
+SECT_PROP = "BGE_TOOLS_LOD_SECTIONS"
+
+TOOL_NAME = "bge_tools_lod_world"
+SECT_TOOL_NAME = "bge_tools_lod_sections"
+SECT_TEXT_NAME = "BGE_TOOLS_OT_lod_sections"
+
+def get_hierarchy(ob):
+	l = [ob]
+	for child in ob.children:
+		l.extend(get_hierarchy(child))
+	return l
+	
+def get_tile_objects(tile):
+
+	# the terrain object and the sections generated for it, with all their children
+	
+	l = get_hierarchy(tile)
+	sections = bpy.data.objects.get(tile.game.properties[SECT_PROP].value)
+	if sections is not None:
+		l.extend(get_hierarchy(sections))
+	return l
+	
+class LODWorld(bpy.types.Operator):
+
+	bl_description = "Streams terrain tiles, each baked with LOD Sections, in and out around the camera"
+	bl_idname = "bge_tools.lod_world"
+	bl_label = "BGE-Tools: LOD World"
+	bl_options = {"REGISTER", "UNDO"}
+	
+	prop_update_or_clear = bpy.props.EnumProperty(
+		items=[
+			("update", "Update", ""),
+			("clear", "Clear", "")
+		],
+		name="",
+		description="Update or clear",
+		default="update"
+	)
+	prop_load_distance = bpy.props.FloatProperty(
+		name="Load Distance",
+		description="Distance from the camera to the bounds of a tile within which it is loaded",
+		default=world.LOAD_DISTANCE,
+		min=0,
+		subtype="DISTANCE"
+	)
+	prop_unload_margin = bpy.props.FloatProperty(
+		name="Unload Margin",
+		description="Distance beyond the load distance at which a loaded tile is freed",
+		default=world.UNLOAD_MARGIN,
+		min=0,
+		subtype="DISTANCE"
+	)
+	
+	err_msg = ""
+	log_msg = ""
+	
+	def invoke(self, context, event):
+		self.scene = context.scene
+		self.active_object = self.scene.objects.active
+		self.tiles = []
+		
+		if not bpy.data.filepath:
+			self.err_msg = ERR_MSG_UNSAVED
+			
+		elif not self.active_object:
+			self.err_msg = ERR_MSG_NO_ACTIVE_OBJECT
+			
+		else:
+			if WORLD_PROP in self.active_object.game.properties:
+				holder_name = self.active_object.game.properties[WORLD_PROP].value
+				if holder_name in bpy.data.scenes:
+					self.tiles = [ob for ob in bpy.data.scenes[holder_name].objects if SECT_PROP in ob.game.properties]
+			for ob in context.selected_editable_objects:
+				if ob != self.active_object and ob not in self.tiles and SECT_PROP in ob.game.properties:
+					self.tiles.append(ob)
+			if not self.tiles and WORLD_PROP not in self.active_object.game.properties:
+				self.err_msg = ERR_MSG_NO_TILES
+				
+		system_dpi = bpy.context.user_preferences.system.dpi
+		
+		return context.window_manager.invoke_props_dialog(self, width=system_dpi*4)
+		
+	def draw(self, context):
+		layout = self.layout
+		box = layout.box
+		row = box().row
+		
+		if self.log_msg:
+			row().label(self.log_msg, icon="INFO")
+			return
+			
+		if self.err_msg:
+			row().label(self.err_msg, icon="CANCEL")
+			return
+			
+		if WORLD_PROP in self.active_object.game.properties:
+			row().prop(self, "prop_update_or_clear")
+			if self.prop_update_or_clear == "clear":
+				return
+				
+		row = box().row
+		col = row().column
+		col().prop(self, "prop_load_distance")
+		col().prop(self, "prop_unload_margin")
+		
+	def check(self, context):
+		if self.err_msg:
+			return False
+		return True
+		
+	def execute(self, context):
+	
+		def move_tiles():
+		
+			# tiles are kept in a scene of their own, so they are not part of the world scene but can still be edited
+			
+			if self.holder_name in bpy.data.scenes:
+				self.holder = bpy.data.scenes[self.holder_name]
+			else:
+				self.holder = bpy.data.scenes.new(self.holder_name)
+				self.holder.layers = self.scene.layers
+				
+			for tile in self.tiles:
+				for ob in get_tile_objects(tile):
+					if ob.name not in self.holder.objects:
+						self.holder.objects.link(ob)
+					if ob.name in self.scene.objects:
+						self.scene.objects.unlink(ob)
+						
+		def collect_tiles():
+		
+			print(self.tracer.timed("Collecting tiles"))
+			
+			for tile in self.tiles:
+				sections_data = ut.load_data(SECT_PROP, tile.name)
+				corners = [tile.matrix_world * Vector(co) for co in world.get_grid_corners(sections_data)]
+				library = data.get_library_path(self.active_object.name, tile.name, world.WORLD_SUFFIX)
+				self.manifest_tiles.append(world.get_tile(tile.name, world.get_bounds(corners), library))
+				
+		def export_tiles():
+		
+			# one library per tile, on the layers of the tiles scene
+			
+			for tile, manifest_tile in zip(self.tiles, self.manifest_tiles):
+			
+				print(self.tracer.timed("Exporting tile ", tile.name))
+				
+				ut.write_library(manifest_tile[world.LIBRARY], tile.name, get_tile_objects(tile), self.holder.layers)
+				
+		def export_manifest():
+		
+			print(self.tracer.timed("Exporting manifest"))
+			
+			manifest = world.get_manifest(self.active_object.name, self.manifest_tiles, self.prop_load_distance, self.prop_unload_margin)
+			overlaps = world.get_overlaps(manifest)
+			if overlaps:
+				raise ValueError(ERR_MSG_OVERLAPPING_TILES + ", ".join(a + " / " + b for a, b in overlaps))
+				
+			ut.save_json(manifest, SECT_PROP, self.active_object.name + world.WORLD_SUFFIX)
+			
+		def generate_game_logic():
+		
+			print(self.tracer.timed("Generating game logic"))
+			
+			self.scene.objects.active = self.active_object
+			self.active_object.select = True
+			
+			# tiles import the sections runtime from the world file
+			
+			ut.add_text(SECT_TEXT_NAME, True, SECT_TOOL_NAME)
+			ut.add_lib_new_text()
+			
+			ut.add_game_property(self.active_object, WORLD_PROP, self.holder_name)
+			ut.add_text(self.bl_idname, True, TOOL_NAME)
+			ut.add_logic_python(self.active_object, TOOL_NAME, "init", False, 1)
+			ut.add_logic_python(self.active_object, TOOL_NAME, "update", True, 2)
+			
+			self.active_object.game.use_all_states = True
+			
+		def clear():
+		
+			print(self.tracer.timed("Clearing world"))
+			
+			if self.holder_name in bpy.data.scenes:
+				holder = bpy.data.scenes[self.holder_name]
+				for ob in list(holder.objects):
+					if ob.name not in self.scene.objects:
+						self.scene.objects.link(ob)
+				bpy.data.scenes.remove(holder, do_unlink=True)
+				
+			ut.remove_game_properties(self.active_object, [WORLD_PROP])
+			ut.remove_logic(self.active_object, TOOL_NAME)
+			ut.remove_text(TOOL_NAME)
+			
+		if self.err_msg:
+			return {"CANCELLED"}
+			
+		print("\nLOD World\n---------\n")
+		
+		self.tracer = trace.Tracer(TOOL_NAME)
+		self.holder_name = self.active_object.name + world.WORLD_SUFFIX
+		self.holder = None
+		self.manifest_tiles = []
+		
+		if WORLD_PROP in self.active_object.game.properties and self.prop_update_or_clear == "clear":
+			stages = [clear]
+		else:
+			stages = [move_tiles, collect_tiles, export_tiles, export_manifest, generate_game_logic]
+			
+		try:
+			with self.tracer:
+				for stage in stages:
+					with self.tracer.span(stage.__name__):
+						stage()
+						
+		except Exception as e:
+			self.err_msg = self.tracer.timed("Failed generating world: ", e)
+			print(self.err_msg)
+			self.report({"ERROR"}, str(e))
+			
+			return {"CANCELLED"}
+			
+		for line in self.tracer.summary():
+			print(line)
+			
+		if bpy.app.debug:
+			self.tracer.export(os.path.join(bpy.path.abspath("//"), trace.TRACE_DIR), TOOL_NAME + "_" + self.active_object.name)
+			
+		self.log_msg = self.tracer.timed("Finished generating world of ", len(self.manifest_tiles), " tiles in")
+		print(self.log_msg)
+		
+		return {"FINISHED"}
+		
+def register():
+	bpy.utils.register_class(LODWorld)
+	
+def unregister():
+	bpy.utils.unregister_class(LODWorld)
+	
+if __name__ == "__main__":
+	register()
+	
\ No newline at end of file
@@ -1,6 +1,7 @@
-import bpy, os, time, math, numpy, pickle
+import bpy, os, math, numpy, json
 from mathutils import Vector
-from collections import OrderedDict
+from mathutils.bvhtree import BVHTree
+from ..core import data
 
 # path constants
 
@@ -8,33 +9,11 @@ ADDONS_PATHS = bpy.utils.script_paths("addons")
 GEN_PATH = os.path.join("bge-tools", "gen")
 BGE_TOOLS_OT = "BGE_TOOLS_OT_"
 
-# profiling utils
+# the mesh copy manager is imported by these runtime scripts
+
+LIB_NEW_TEXT_NAME = "bge_tools_lib_new"
+LIB_NEW_USER_NAMES = ("bge_tools_uv_scroll", "bge_tools_lod_sections")
 
-class Profiler:
-	
-	def __init__(self):
-		self.start = time.clock()
-		
-	def hours_minutes_seconds(self, seconds):
-		hours = seconds // 3600
-		seconds %= 3600
-		minutes = seconds // 60
-		seconds %= 60
-		return hours, minutes, seconds
-		
-	def delta_time(self):
-		return round(time.clock() - self.start, 1)
-		
-	def timed(self, *args):
-		out = ""
-		for arg in args:
-			out += str(arg)
-		for i in range(60 - len(out)):
-			out += "."
-		hours, minutes, seconds = self.hours_minutes_seconds(self.delta_time())
-		out += str(int(hours)) + "h " + str(int(minutes)) + "m " + str(int(seconds)) + "s"
-		return out
-		
 # string utils
 
 def get_id(o, suffix=".", num_digits=4):
@@ -68,19 +47,6 @@ def point_inside_rectangle(pnt, rect):
 	crn = Vector((cen.x - dim.x * 0.5, cen.y - dim.y * 0.5))
 	return (crn.x <= pnt.x <= crn.x + dim.x and crn.y <= pnt.y <= crn.y + dim.y)
 	
-def get_floor_factor(f, n):
-	if n == 0:
-		return 0
-	return f // n * n
-	
-def get_grid_point(v, size, axis_range="XYZ"):
-	l = list(v)
-	axis = "XYZ"[:len(l)]
-	for i, a in enumerate(axis):
-		if a in axis_range:
-			l[i] = get_floor_factor(l[i], size[i]) + size[i] // 2
-	return l
-	
 def approximated(l, num_digits):
 	return [round(l[0], num_digits), round(l[1], num_digits), round(l[2], num_digits)]
 	
@@ -96,14 +62,6 @@ def remap(i_min, i_max, o_min, o_max, v):
 def non_zero_natural(v):
 	return max(abs(v), 0.00001)
 
-def get_table_incremented(v, f, n):
-	x = v / (f + 1)
-	y = 2 * f
-	l = [x * i + math.sqrt(y * x) * pow(y * i, 2) for i in range(1, n + 1)]
-	z = l[0] / v
-	l = [round(l[i] / z) for i in range(n)]
-	return l
-	
 # text utils
 
 def add_text(name, intern=True, new_name="", ext=".py"):
@@ -133,6 +91,14 @@ def remove_text(name, all_users=False, ext=".py"):
 	bpy.data.texts.remove(bpy.data.texts[text_name], do_unlink=True)
 	return True
 	
+def add_lib_new_text():
+	return add_text(LIB_NEW_TEXT_NAME)
+	
+def remove_lib_new_text(ext=".py"):
+	if any(name + ext in bpy.data.texts for name in LIB_NEW_USER_NAMES):
+		return False
+	return remove_text(LIB_NEW_TEXT_NAME, True)
+	
 # object utils
 
 def add_logic_python(ob, script_name, module_name="", use_pulse_true_level=False, state=1, tick_skip=0, use_priority=False):
@@ -236,6 +202,37 @@ def dimensions(*objects, include_transform=False):
 	dim_z = max(bb_crns[i][2] for i in range(n)) - min(bb_crns[i][2] for i in range(n))
 	return Vector((dim_x, dim_y, dim_z))
 	
+def get_triangle_count(me):
+	loop_totals = numpy.zeros(len(me.polygons), dtype=numpy.int32)
+	me.polygons.foreach_get("loop_total", loop_totals)
+	return int(loop_totals.sum() - 2 * len(loop_totals))
+	
+def get_mesh_stats(me):
+	material_indices = numpy.zeros(len(me.polygons), dtype=numpy.int32)
+	me.polygons.foreach_get("material_index", material_indices)
+	return {
+		"triangles" : get_triangle_count(me),
+		"vertices" : len(me.vertices),
+		"materials" : len(me.materials),
+		"draw_calls" : len(numpy.unique(material_indices)),
+	}
+	
+def get_bvh_tree(objects, offset=Vector()):
+	
+	# tree of all polygons in world space, with the index of the object each polygon belongs to
+	
+	vertices = []
+	polygons = []
+	owners = []
+	for i, ob in enumerate(objects):
+		m = ob.matrix_world
+		n = len(vertices)
+		vertices.extend(m * v.co + offset for v in ob.data.vertices)
+		for poly in ob.data.polygons:
+			polygons.append([n + j for j in poly.vertices])
+			owners.append(i)
+	return BVHTree.FromPolygons(vertices, polygons), owners
+	
 def get_custom_normals(ob, approx_ndigits=-1, from_selected=False):
 	
 	def triform(loop_indices):
@@ -265,11 +262,47 @@ def get_custom_normals(ob, approx_ndigits=-1, from_selected=False):
 			if approx_ndigits != -1:
 				vert_normal = [round(f, approx_ndigits) for f in vert_normal]
 				
-			id = str([round(f) for f in vert.co.xy])
+			id = (round(vert.co.x), round(vert.co.y))
 			normals[id] = vert_normal
 			
 	return normals
 	
+def get_normal_indices(ob, normals, from_selected=False):
+
+	# (material id, vertex id, normal key) as the game engine will lay out the vertex arrays, and the length of every array:
+	# one array per used material in order of first use, a vertex added once per uv and smooth group as faces first use it
+	
+	mesh = ob.data
+	mesh.calc_tessface()
+	uv_layer = mesh.tessface_uv_textures.active
+	
+	mat_ids = {}
+	vert_ids = []
+	l = []
+	
+	for face in mesh.tessfaces:
+		if face.material_index not in mat_ids:
+			mat_ids[face.material_index] = len(mat_ids)
+			vert_ids.append({})
+		mat_id = mat_ids[face.material_index]
+		ids = vert_ids[mat_id]
+		
+		for i, vi in enumerate(face.vertices):
+			uv = tuple(round(f, 6) for f in uv_layer.data[face.index].uv[i]) if uv_layer else None
+			id = (vi, uv, True if face.use_smooth else face.index)
+			if id in ids:
+				continue
+			ids[id] = len(ids)
+			
+			vert = mesh.vertices[vi]
+			if from_selected and not vert.select:
+				continue
+			key = (round(vert.co.x), round(vert.co.y))
+			if key in normals:
+				l.append((mat_id, ids[id], key))
+				
+	return l, [len(ids) for ids in vert_ids]
+	
 def get_dupli_parents(inst):
 	l = []
 	if inst.dupli_group is not None:
@@ -294,22 +327,43 @@ def get_children_recursive(*objects):
 
 # file utils
 
-def load_txt(*args):
-	data = OrderedDict()
+def load_data(*args):
 	dir = os.path.join(bpy.path.abspath("//"), *args[:-1])
 	if not os.path.exists(dir):
 		os.mkdir(dir)
-	file_path = os.path.join(dir, args[-1] + ".txt")
-	with open(file_path, "rb") as f:
-		return pickle.load(f)
-		
-def save_txt(data, *args):
+	return data.load(os.path.join(dir, args[-1] + data.EXTENSION))
+	
+def save_data(d, *args, codec=data.CODEC_NONE):
 	dir = os.path.join(bpy.path.abspath("//"), *args[:-1])
 	if not os.path.exists(dir):
 		os.mkdir(dir)
-	file_path = os.path.join(dir, args[-1] + ".txt")
-	with open(file_path, "wb") as f:
-		pickle.dump(data, f)
+	data.save(d, os.path.join(dir, args[-1] + data.EXTENSION), codec)
+	
+def save_json(data, *args):
+	dir = os.path.join(bpy.path.abspath("//"), *args[:-1])
+	if not os.path.exists(dir):
+		os.mkdir(dir)
+	file_path = os.path.join(dir, args[-1] + ".json")
+	with open(file_path, "w") as f:
+		json.dump(data, f, indent="\t")
+	return file_path
+	
+def write_library(file_path, scene_name, objects, layers):
+
+	# one library with a scene of its own holding the objects, so it can be loaded as a whole
+	
+	file_path = bpy.path.abspath(file_path)
+	dir = os.path.dirname(file_path)
+	if not os.path.exists(dir):
+		os.makedirs(dir)
+	sc = bpy.data.scenes.new(scene_name)
+	sc.layers = layers
+	for ob in objects:
+		sc.objects.link(ob)
+	try:
+		bpy.data.libraries.write(file_path, {sc}, relative_remap=True)
+	finally:
+		bpy.data.scenes.remove(sc, do_unlink=True)
 		
 # system utils
 
@@ -1,5 +1,6 @@
-import bpy
+import bpy, os
 from . import utils as ut
+from ..core import trace
 
 TOOL_NAME = "bge_tools_uv_scroll"
 LABEL_UV_MAP = "UV Map:"
@@ -135,6 +136,7 @@ class UVScroll(bpy.types.Operator):
 			ut.add_game_property(context.object, PROP_NAME_LINKED, self.prop_linked)
 			ut.remove_logic(context.object, TOOL_NAME)
 			ut.add_text(self.bl_idname, True, TOOL_NAME)
+			ut.add_lib_new_text()
 			ut.add_logic_python(context.object, TOOL_NAME, "update", True, tick_skip=self.prop_skip)
 			
 		def update_uv_texture():
@@ -162,8 +164,18 @@ class UVScroll(bpy.types.Operator):
 			bpy.ops.mesh.select_all(action="DESELECT")
 			bpy.ops.object.mode_set(mode="OBJECT")
 			
-		generate_game_logic()
-		update_uv_texture()
+		tracer = trace.Tracer(TOOL_NAME)
+		
+		with tracer:
+			for stage in [generate_game_logic, update_uv_texture]:
+				with tracer.span(stage.__name__):
+					stage()
+					
+		for line in tracer.summary():
+			print(line)
+			
+		if bpy.app.debug:
+			tracer.export(os.path.join(bpy.path.abspath("//"), trace.TRACE_DIR), TOOL_NAME + "_" + context.object.name)
 		
 		return {"PASS_THROUGH"}
 		
@@ -186,6 +198,7 @@ class UVScrollClear(bpy.types.Operator):
 		ut.remove_game_properties(context.object, prop_names)
 		ut.remove_logic(context.object, TOOL_NAME)
 		ut.remove_text(TOOL_NAME)
+		ut.remove_lib_new_text()
 		
 		return {"FINISHED"}
 		
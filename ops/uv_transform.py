@@ -1,5 +1,6 @@
 import bpy
 from os.path import join as j
+from ..core import trace
 
 TOOL_NAME = "bge_tools_uv_transform"
 SCRIPT_NAME = TOOL_NAME + ".py"
@@ -158,10 +159,18 @@ class UVTransform(bpy.types.Operator):
 				url = j(addons_paths[1], SCRIPT_PATH)
 				bpy.ops.text.open(filepath=url, internal=True)
 				
-		add_properties()
-		set_properties()
-		add_logic()
-		add_script_internal()
+		tracer = trace.Tracer(TOOL_NAME)
+		
+		with tracer:
+			for stage in [add_properties, set_properties, add_logic, add_script_internal]:
+				with tracer.span(stage.__name__):
+					stage()
+					
+		for line in tracer.summary():
+			print(line)
+			
+		if bpy.app.debug:
+			tracer.export(j(bpy.path.abspath("//"), trace.TRACE_DIR), TOOL_NAME + "_" + context.object.name)
 		
 		return {"PASS_THROUGH"}
 		